@@ -0,0 +1,116 @@
+# api/analise_portfolio.py - Agregados de exposição a riscos de um portfólio de obras
+"""
+Agregação incremental de um portfólio: cada projeto contribui apenas com a
+máscara de bits da sua seleção, o grupo (força) e o investimento. Projetos
+com a mesma seleção no mesmo grupo são somados em um único acumulador, então
+a memória cresce com o número de seleções distintas, e não com o número de
+projetos. As distribuições (nível, fase, responsável, categoria, matriz
+5×5) e a exposição são expandidas no final a partir do CatalogoColunar.
+
+Exposição de um risco = nivel_risco (probabilidade × impacto, 1 a 25). A
+exposição ponderada pelo investimento soma, por projeto, investimento ×
+nivel_risco / 25: o valor investido ponderado pela severidade relativa.
+"""
+from catalogo_colunar import contar_bits
+
+DIMENSOES = ('nivel', 'fase', 'responsavel', 'categoria')
+NIVEL_MAXIMO = 25
+
+
+class AgregadorPortfolio:
+    """Acumula seleções de projetos e produz os agregados do portfólio."""
+
+    def __init__(self, colunar):
+        self.colunar = colunar
+        self._acumulado = {}
+        self.projetos = 0
+        self.erros = 0
+        self.sem_investimento = 0
+
+    def adicionar(self, grupo, mascara, investimento=None):
+        """Registra um projeto: seu grupo, a máscara selecionada e o investimento (ou None)."""
+        self.projetos += 1
+        if investimento is None:
+            self.sem_investimento += 1
+        entrada = self._acumulado.get((grupo, mascara))
+        if entrada is None:
+            entrada = self._acumulado[(grupo, mascara)] = [0, 0.0]
+        entrada[0] += 1
+        entrada[1] += investimento or 0.0
+
+    def registrar_erro(self):
+        self.erros += 1
+
+    def _novo_bloco(self):
+        return {
+            "projetos": 0,
+            "investimento": 0.0,
+            "riscos_abertos": 0,
+            "exposicao": 0,
+            "exposicao_ponderada_investimento": 0.0,
+            **{f"por_{dimensao}": {} for dimensao in DIMENSOES},
+            "exposicao_por_responsavel": {},
+            "exposicao_por_fase": {},
+            "matriz_probabilidade_impacto": [[0] * 5 for _ in range(5)]
+        }
+
+    def _somar(self, bloco, mascara, projetos, investimento):
+        colunar = self.colunar
+        bloco["projetos"] += projetos
+        bloco["investimento"] += investimento
+        bloco["riscos_abertos"] += contar_bits(mascara) * projetos
+
+        for dimensao in DIMENSOES:
+            destino = bloco[f"por_{dimensao}"]
+            for rotulo, quantidade in colunar.distribuicao(dimensao, mascara).items():
+                destino[rotulo] = destino.get(rotulo, 0) + quantidade * projetos
+
+        for dimensao in ('responsavel', 'fase'):
+            destino = bloco[f"exposicao_por_{dimensao}"]
+            for rotulo, pontos in colunar.soma('nivel_risco', dimensao, mascara).items():
+                atual = destino.setdefault(rotulo, {"pontos": 0, "ponderada_investimento": 0.0})
+                atual["pontos"] += pontos * projetos
+                atual["ponderada_investimento"] += investimento * pontos / NIVEL_MAXIMO
+
+        pontos = sum(colunar.soma('nivel_risco', 'nivel', mascara).values())
+        bloco["exposicao"] += pontos * projetos
+        bloco["exposicao_ponderada_investimento"] += investimento * pontos / NIVEL_MAXIMO
+
+        matriz = bloco["matriz_probabilidade_impacto"]
+        for (probabilidade, impacto), quantidade in colunar.distribuicao('celula_matriz', mascara).items():
+            if 1 <= probabilidade <= 5 and 1 <= impacto <= 5:
+                matriz[probabilidade - 1][impacto - 1] += quantidade * projetos
+
+    def resultado(self):
+        """Agregados do portfólio inteiro e por grupo."""
+        total = self._novo_bloco()
+        por_grupo = {}
+        for (grupo, mascara), (projetos, investimento) in self._acumulado.items():
+            self._somar(total, mascara, projetos, investimento)
+            if grupo not in por_grupo:
+                por_grupo[grupo] = self._novo_bloco()
+            self._somar(por_grupo[grupo], mascara, projetos, investimento)
+
+        for bloco in [total, *por_grupo.values()]:
+            for dimensao in ('responsavel', 'fase'):
+                exposicao = bloco[f"exposicao_por_{dimensao}"]
+                bloco[f"exposicao_por_{dimensao}"] = dict(
+                    sorted(exposicao.items(), key=lambda item: -item[1]["pontos"])
+                )
+                for valores in exposicao.values():
+                    valores["ponderada_investimento"] = round(valores["ponderada_investimento"], 2)
+            bloco["investimento"] = round(bloco["investimento"], 2)
+            bloco["exposicao_ponderada_investimento"] = round(bloco["exposicao_ponderada_investimento"], 2)
+
+        return {
+            "projetos_analisados": self.projetos,
+            "projetos_com_erro": self.erros,
+            "projetos_sem_investimento": self.sem_investimento,
+            "selecoes_distintas": len({mascara for _, mascara in self._acumulado}),
+            "matriz_probabilidade_impacto_eixos": {
+                "linhas": "probabilidade 1 a 5",
+                "colunas": "impacto 1 a 5"
+            },
+            "total": total,
+            "por_forca": por_grupo
+        }
@@ -0,0 +1,282 @@
+# api/asgi.py - Modo de serviço ASGI da mesma aplicação
+"""
+Serve as rotas de index.py (a mesma aplicação Flask, com os mesmos ganchos
+de métricas e rastreamento) atrás de um laço de eventos, sem dependências
+além da biblioteca padrão. Cada requisição é classificada pela rota:
+
+- no laço: endpoints JSON que só leem estruturas em memória (seleção,
+  catálogo, busca, similaridade, metadados, métricas) são executados direto
+  no laço de eventos, sem troca de thread; HEAD segue a classificação do GET
+  correspondente;
+- PDF: geração de PDFs, lotes e figuras da matriz vão para um executor de
+  threads limitado (RISCOS_ASGI_THREADS_PDF). Além das threads, no máximo
+  RISCOS_ASGI_FILA_PDF pedidos esperam; acima disso a resposta é 503 com
+  Retry-After, em vez de uma fila sem fim. Com RISCOS_PDF_EM_PROCESSO=1 a
+  renderização em si roda no pool de processos de index.py e a thread só
+  espera, sem disputar o GIL com o laço;
+- bloqueante: o restante (lotes NDJSON, análise de portfólio, saúde, que
+  varre a fila em SQLite, e toda a fila de PDFs) vai para um executor de
+  threads geral (RISCOS_ASGI_THREADS).
+
+Nas rotas do laço o corpo (JSON pequeno) é lido inteiro antes da chamada.
+Nas rotas dos executores ele é transmitido: a thread lê o wsgi.input sob
+demanda e cada leitura busca a próxima parte no laço (receive), então lotes
+NDJSON e CSV são processados à medida que chegam, sem ficar inteiros na
+memória.
+
+Um PDF em renderização ocupa só uma thread do executor: o worker continua
+atendendo /api/project-risks e as demais rotas JSON.
+
+Requer um servidor ASGI, dependência opcional em requirements-asgi.txt
+(fora de requirements.txt, usado na implantação serverless):
+    pip install -r api/requirements-asgi.txt
+    uvicorn asgi:app --app-dir api --workers 2
+    gunicorn --chdir api -k uvicorn.workers.UvicornWorker -w 2 asgi:app
+"""
+import asyncio
+import contextvars
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.exceptions import ClientDisconnected
+
+# Módulos auxiliares da API ficam ao lado deste arquivo
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+import index
+
+THREADS_PDF = int(os.environ.get("RISCOS_ASGI_THREADS_PDF", 2))
+FILA_PDF_MAXIMA = int(os.environ.get("RISCOS_ASGI_FILA_PDF", 32))
+THREADS_BLOQUEANTES = int(os.environ.get("RISCOS_ASGI_THREADS", 8))
+
+EXECUTOR_PDF = ThreadPoolExecutor(max_workers=THREADS_PDF, thread_name_prefix='asgi-pdf')
+EXECUTOR_BLOQUEANTE = ThreadPoolExecutor(max_workers=THREADS_BLOQUEANTES, thread_name_prefix='asgi')
+
+# Rotas atendidas no próprio laço: respostas montadas a partir da memória
+# (sem disco, SQLite ou ReportLab)
+ROTAS_NO_LACO = {
+    ('GET', '/api/metrics'),
+    ('GET', '/api/risk-metadata'),
+    ('POST', '/api/project-risks'),
+    ('GET', '/api/all-risks'),
+    ('GET', '/api/risks/search'),
+    ('POST', '/api/risks/similar'),
+    ('GET', '/api/cea-insights'),
+    ('GET', '/api/statistics'),
+}
+ROTAS_PDF = {
+    ('POST', '/api/generate-pdf'),
+    ('POST', '/api/generate-pdf/batch'),
+}
+
+# Pedidos de PDF em renderização ou na fila (só alterado no laço de eventos)
+_pdf_em_andamento = 0
+
+
+def classificar(metodo, caminho, consulta):
+    """'laco', 'pdf' ou 'bloqueante', conforme onde a rota deve ser executada."""
+    if metodo == 'HEAD':
+        # Mesmo trabalho do GET; só o corpo é descartado
+        metodo = 'GET'
+    if metodo == 'OPTIONS' or (metodo, caminho) in ROTAS_NO_LACO:
+        return 'laco'
+    if (metodo, caminho) in ROTAS_PDF:
+        return 'pdf'
+    if metodo == 'GET' and caminho == '/api/risk-matrix':
+        # JSON vem dos bitmaps; SVG/PNG passam pelo ReportLab
+        formato = parse_qs(consulta).get('format', ['json'])[0]
+        return 'laco' if formato == 'json' else 'pdf'
+    if metodo == 'GET' and caminho.startswith('/api/risks/') and caminho.endswith('/similar'):
+        return 'laco'
+    return 'bloqueante'
+
+
+class CorpoEmFluxo(io.RawIOBase):
+    """
+    Corpo da requisição lido sob demanda por uma thread do executor: cada
+    leitura que esgota a parte atual espera a próxima mensagem de receive()
+    no laço de eventos. Não pode ser lido no próprio laço.
+    """
+
+    def __init__(self, receive, laco):
+        self._receive = receive
+        self._laco = laco
+        self._parte = b''
+        self._fim = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._parte and not self._fim:
+            mensagem = asyncio.run_coroutine_threadsafe(self._receive(), self._laco).result()
+            if mensagem['type'] == 'http.disconnect':
+                self._fim = True
+                raise ClientDisconnected()
+            self._parte = mensagem.get('body', b'')
+            self._fim = not mensagem.get('more_body')
+        quantidade = min(len(destino), len(self._parte))
+        destino[:quantidade] = self._parte[:quantidade]
+        self._parte = self._parte[quantidade:]
+        return quantidade
+
+
+def ambiente_wsgi(escopo, entrada, tamanho=None):
+    """
+    Ambiente WSGI (PEP 3333) equivalente ao escopo HTTP do ASGI. `entrada` é
+    o wsgi.input; `tamanho`, o do corpo quando ele já foi lido por inteiro.
+    """
+    servidor = escopo.get('server') or ('localhost', 80)
+    cliente = escopo.get('client') or ('', 0)
+    ambiente = {
+        'REQUEST_METHOD': escopo['method'],
+        'SCRIPT_NAME': escopo.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': escopo['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': escopo.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1] or 80),
+        'REMOTE_ADDR': cliente[0],
+        'SERVER_PROTOCOL': f"HTTP/{escopo.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': escopo.get('scheme', 'http'),
+        'wsgi.input': entrada,
+        # O corpo termina no fim da entrada (inclusive se veio em chunked)
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for nome, valor in escopo.get('headers', []):
+        nome = nome.decode('latin-1').upper().replace('-', '_')
+        valor = valor.decode('latin-1')
+        chave = nome if nome in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{nome}"
+        ambiente[chave] = f"{ambiente[chave]},{valor}" if chave in ambiente else valor
+    if tamanho is not None:
+        ambiente['CONTENT_LENGTH'] = str(tamanho)
+    return ambiente
+
+
+def iniciar_wsgi(ambiente):
+    """Chama a aplicação Flask; retorna (status e cabeçalhos, partes escritas, resultado iterável)."""
+    resposta = {}
+    escritas = []
+
+    def start_response(status, cabecalhos, exc_info=None):
+        resposta['status'] = int(status.split(' ', 1)[0])
+        resposta['cabecalhos'] = [(nome.lower().encode('latin-1'), valor.encode('latin-1')) for nome, valor in cabecalhos]
+        return escritas.append
+
+    resultado = index.app(ambiente, start_response)
+    return resposta, escritas, resultado
+
+
+async def ler_corpo(receive):
+    """Corpo completo da requisição, ou None se o cliente desconectou antes."""
+    partes = []
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'http.disconnect':
+            return None
+        partes.append(mensagem.get('body', b''))
+        if not mensagem.get('more_body'):
+            return b''.join(partes)
+
+
+async def servir_wsgi(ambiente, send, executor):
+    """
+    Executa a requisição na aplicação WSGI e transmite a resposta. Sem
+    executor, tudo roda no laço; com executor, cada passo (chamada e cada
+    parte do corpo) roda em uma thread. Todos os passos usam o mesmo
+    contexto, porque o Flask guarda o contexto da requisição em contextvars.
+    """
+    contexto = contextvars.copy_context()
+
+    async def executar(funcao, *args):
+        if executor is None:
+            return contexto.run(funcao, *args)
+        return await asyncio.get_running_loop().run_in_executor(executor, contexto.run, funcao, *args)
+
+    resposta, escritas, resultado = await executar(iniciar_wsgi, ambiente)
+    try:
+        iterador = await executar(iter, resultado)
+        parte = await executar(next, iterador, None)
+        await send({'type': 'http.response.start', 'status': resposta['status'], 'headers': resposta['cabecalhos']})
+        if escritas:
+            await send({'type': 'http.response.body', 'body': b''.join(escritas), 'more_body': True})
+        while parte is not None:
+            if parte:
+                await send({'type': 'http.response.body', 'body': bytes(parte), 'more_body': True})
+            parte = await executar(next, iterador, None)
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        # Fecha arquivos e geradores (e executa o teardown das respostas transmitidas)
+        if hasattr(resultado, 'close'):
+            await executar(resultado.close)
+
+
+async def responder_ocupado(send):
+    corpo = json.dumps({"error": "Muitos PDFs em geração; tente novamente em instantes."}, ensure_ascii=False).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': 503, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(corpo)).encode('latin-1')),
+        (b'retry-after', b'5'),
+    ]})
+    await send({'type': 'http.response.body', 'body': corpo, 'more_body': False})
+
+
+def preaquecer():
+    """
+    Constrói o que as rotas do laço montam sob demanda (índices de busca e
+    similaridade, catálogo pré-comprimido de cada formato), para que a
+    primeira requisição de cada uma não trave o laço. Com preload
+    (gunicorn_conf.py) já foi feito no mestre e aqui só confirma os caches.
+    """
+    index.aquecer(['indices', 'catalogo'])
+
+
+async def ciclo_de_vida(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'lifespan.startup':
+            try:
+                await asyncio.get_running_loop().run_in_executor(EXECUTOR_BLOQUEANTE, preaquecer)
+            except Exception as e:
+                print(f"AVISO: pré-aquecimento do modo ASGI falhou: {e}")
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensagem['type'] == 'lifespan.shutdown':
+            EXECUTOR_PDF.shutdown(wait=False, cancel_futures=True)
+            EXECUTOR_BLOQUEANTE.shutdown(wait=False, cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(escopo, receive, send):
+    """Aplicação ASGI 3."""
+    global _pdf_em_andamento
+    if escopo['type'] == 'lifespan':
+        return await ciclo_de_vida(receive, send)
+    if escopo['type'] != 'http':
+        return
+
+    modo = classificar(escopo['method'], escopo['path'], escopo.get('query_string', b'').decode('latin-1'))
+    if modo == 'laco':
+        corpo = await ler_corpo(receive)
+        if corpo is None:
+            return
+        return await servir_wsgi(ambiente_wsgi(escopo, io.BytesIO(corpo), len(corpo)), send, None)
+
+    ambiente = ambiente_wsgi(escopo, io.BufferedReader(CorpoEmFluxo(receive, asyncio.get_running_loop())))
+    if modo == 'bloqueante':
+        return await servir_wsgi(ambiente, send, EXECUTOR_BLOQUEANTE)
+
+    if _pdf_em_andamento >= THREADS_PDF + FILA_PDF_MAXIMA:
+        return await responder_ocupado(send)
+    _pdf_em_andamento += 1
+    try:
+        await servir_wsgi(ambiente, send, EXECUTOR_PDF)
+    finally:
+        _pdf_em_andamento -= 1
@@ -0,0 +1,287 @@
+# api/base_dados.py - Carga, validação e snapshot binário da base de riscos
+"""
+Carga da base de riscos em dois modos:
+
+- estrito: JSON inválido ou regras inconsistentes geram ErroBaseRiscos;
+- tolerante: corrige defeitos comuns de JSON (vírgulas finais, comentários,
+  BOM) e apenas avisa sobre inconsistências.
+
+A etapa de build (``python api/base_dados.py``) valida o JSON e gera um
+snapshot em formato ``marshal``, carregado via mmap sem parsing de JSON. O
+snapshot guarda o SHA-256 do JSON de origem e é ignorado se estiver
+desatualizado ou se a versão do formato marshal for diferente. Ele guarda
+também quantos defeitos (correções de JSON e inconsistências) a geração
+tolerou: no modo estrito, um snapshot com defeitos é ignorado e a carga
+segue pelo JSON, que falha com ErroBaseRiscos.
+"""
+import argparse
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+MAGICA = b'RISCOS2\n'
+# Mágica, versão do marshal, SHA-256 do JSON e número de defeitos tolerados na geração
+CABECALHO = struct.Struct('<8sI32sI')
+
+CAMPOS_TEXTO_RISCO = ('fase', 'categoria', 'evento', 'descricao', 'responsavel', 'mitigacao', 'correcao')
+CAMPOS_ESCALA_RISCO = ('probabilidade', 'impacto_nivel')
+TABELAS_REGRAS = (
+    'tipos_obra', 'regimes_execucao', 'tipos_intervencao', 'faixas_valor',
+    'caracteristicas_especiais', 'ajustes_porte', 'ajustes_unidade'
+)
+
+
+class ErroBaseRiscos(Exception):
+    """Base de riscos ausente, malformada ou inconsistente."""
+
+
+def corrigir_json(texto):
+    """
+    Remove defeitos comuns fora de strings: BOM, comentários // e /* */ e
+    vírgulas antes de '}' ou ']'. Retorna (texto corrigido, lista de correções).
+    """
+    correcoes = []
+    if texto.startswith('\ufeff'):
+        texto = texto[1:]
+        correcoes.append("BOM removido")
+
+    saida = []
+    i, n = 0, len(texto)
+    em_string = False
+    virgula_pendente = None
+    while i < n:
+        c = texto[i]
+        if em_string:
+            saida.append(c)
+            if c == '\\':
+                saida.append(texto[i + 1:i + 2])
+                i += 2
+                continue
+            if c == '"':
+                em_string = False
+            i += 1
+            continue
+
+        if texto.startswith('//', i) or texto.startswith('/*', i):
+            if texto[i + 1] == '/':
+                fim = texto.find('\n', i)
+            else:
+                fim = texto.find('*/', i + 2)
+                fim = fim + 2 if fim != -1 else -1
+            fim = n if fim == -1 else fim
+            correcoes.append(f"comentário removido na linha {texto.count(chr(10), 0, i) + 1}")
+            i = fim
+            continue
+        if c in ' \t\r\n':
+            saida.append(c)
+            i += 1
+            continue
+
+        if virgula_pendente is not None:
+            if c in '}]':
+                correcoes.append(f"vírgula final removida na linha {texto.count(chr(10), 0, virgula_pendente) + 1}")
+            else:
+                saida.append(',')
+            virgula_pendente = None
+        if c == ',':
+            # Só decide se a vírgula fica ao ver o próximo caractere significativo
+            virgula_pendente = i
+        else:
+            saida.append(c)
+            em_string = c == '"'
+        i += 1
+
+    if virgula_pendente is not None:
+        saida.append(',')
+    return ''.join(saida), correcoes
+
+
+def ler_json(caminho, estrito=True):
+    """Lê o JSON da base; no modo tolerante tenta corrigir defeitos comuns."""
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            texto = f.read()
+    except FileNotFoundError:
+        raise ErroBaseRiscos(f"Arquivo JSON de riscos não encontrado em {caminho}")
+
+    try:
+        return json.loads(texto), []
+    except json.JSONDecodeError as e:
+        if estrito:
+            raise ErroBaseRiscos(f"JSON inválido em {caminho}: {e.msg} (linha {e.lineno}, coluna {e.colno})")
+        erro_original = e
+
+    texto_corrigido, correcoes = corrigir_json(texto)
+    try:
+        return json.loads(texto_corrigido), correcoes
+    except json.JSONDecodeError:
+        raise ErroBaseRiscos(
+            f"JSON inválido em {caminho}: {erro_original.msg} "
+            f"(linha {erro_original.lineno}, coluna {erro_original.colno}); correção automática falhou"
+        )
+
+
+def _ids_em_regras(tabela, caminho):
+    """Percorre uma tabela de regras e gera (caminho, lista de IDs) de cada entrada."""
+    if not isinstance(tabela, dict):
+        return
+    for campo in ('riscos_especificos', 'riscos_reduzidos'):
+        if campo in tabela:
+            yield f"{caminho}.{campo}", tabela[campo]
+    for chave, valor in tabela.items():
+        if isinstance(valor, dict):
+            yield from _ids_em_regras(valor, f"{caminho}.{chave}")
+
+
+def validar_base(base):
+    """Valida o esquema da base e as referências das regras. Retorna a lista de erros."""
+    erros = []
+    if not isinstance(base, dict):
+        return ["raiz 'base_riscos_cea' ausente ou não é um objeto"]
+
+    riscos = base.get('riscos')
+    if not isinstance(riscos, list) or not riscos:
+        return ["'riscos' ausente ou vazio"]
+
+    ids = set()
+    for posicao, risco in enumerate(riscos):
+        if not isinstance(risco, dict):
+            erros.append(f"riscos[{posicao}]: não é um objeto")
+            continue
+        risco_id = risco.get('id')
+        rotulo = f"risco {risco_id}" if risco_id is not None else f"riscos[{posicao}]"
+        if not isinstance(risco_id, int) or isinstance(risco_id, bool):
+            erros.append(f"{rotulo}: 'id' deve ser inteiro")
+        elif risco_id in ids:
+            erros.append(f"{rotulo}: 'id' duplicado")
+        else:
+            ids.add(risco_id)
+        for campo in CAMPOS_TEXTO_RISCO:
+            if not isinstance(risco.get(campo), str) or not risco.get(campo).strip():
+                erros.append(f"{rotulo}: '{campo}' ausente ou vazio")
+        for campo in CAMPOS_ESCALA_RISCO:
+            if risco.get(campo) not in (1, 2, 3, 4, 5):
+                erros.append(f"{rotulo}: '{campo}' deve estar entre 1 e 5")
+        nivel = risco.get('nivel_risco')
+        if not isinstance(nivel, int):
+            erros.append(f"{rotulo}: 'nivel_risco' deve ser inteiro")
+        elif all(isinstance(risco.get(c), int) for c in CAMPOS_ESCALA_RISCO):
+            if nivel != risco['probabilidade'] * risco['impacto_nivel']:
+                erros.append(f"{rotulo}: 'nivel_risco' ({nivel}) difere de probabilidade × impacto")
+
+    for tabela in TABELAS_REGRAS:
+        for caminho, lista in _ids_em_regras(base.get(tabela, {}), tabela):
+            if not isinstance(lista, list):
+                erros.append(f"{caminho}: deve ser uma lista de IDs")
+                continue
+            desconhecidos = [i for i in lista if i not in ids]
+            if desconhecidos:
+                erros.append(f"{caminho}: IDs inexistentes em 'riscos': {desconhecidos}")
+
+    faixas = base.get('faixas_valor', {})
+    sem_limite = [chave for chave, faixa in faixas.items() if faixa.get('limite_superior') is None]
+    if len(sem_limite) > 1:
+        erros.append(f"faixas_valor: mais de uma faixa sem 'limite_superior': {sem_limite}")
+    for chave, faixa in faixas.items():
+        limite = faixa.get('limite_superior')
+        if limite is not None and not isinstance(limite, (int, float)):
+            erros.append(f"faixas_valor.{chave}.limite_superior: deve ser número ou null")
+
+    total_declarado = base.get('metadata', {}).get('total_riscos')
+    if total_declarado is not None and total_declarado != len(riscos):
+        erros.append(f"metadata.total_riscos ({total_declarado}) difere do número de riscos ({len(riscos)})")
+    return erros
+
+
+def hash_arquivo(caminho):
+    with open(caminho, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def gerar_snapshot(caminho_json, caminho_snapshot, estrito=True):
+    """Valida o JSON e grava o snapshot binário. Retorna (base, correções, erros)."""
+    dados, correcoes = ler_json(caminho_json, estrito)
+    base = dados.get('base_riscos_cea') if isinstance(dados, dict) else None
+    erros = validar_base(base)
+    if erros and estrito:
+        raise ErroBaseRiscos("Base de riscos inconsistente:\n  " + "\n  ".join(erros))
+
+    cabecalho = CABECALHO.pack(MAGICA, marshal.version, hash_arquivo(caminho_json), len(correcoes) + len(erros))
+    temporario = caminho_snapshot + '.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(cabecalho)
+        f.write(marshal.dumps(base))
+    os.replace(temporario, caminho_snapshot)
+    return base, correcoes, erros
+
+
+def carregar_snapshot(caminho_snapshot, caminho_json=None):
+    """
+    Carrega o snapshot via mmap; retorna (base, defeitos tolerados na geração)
+    ou None se ausente, inválido ou desatualizado.
+    """
+    try:
+        with open(caminho_snapshot, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+            if len(dados) < CABECALHO.size:
+                return None
+            magica, versao_marshal, hash_origem, defeitos = CABECALHO.unpack_from(dados)
+            if magica != MAGICA or versao_marshal != marshal.version:
+                return None
+            if caminho_json and os.path.exists(caminho_json) and hash_arquivo(caminho_json) != hash_origem:
+                return None
+            with memoryview(dados) as visao:
+                return marshal.loads(visao[CABECALHO.size:]), defeitos
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+
+def carregar_base(caminho_json, caminho_snapshot=None, estrito=False):
+    """
+    Carrega a base (conteúdo de 'base_riscos_cea'): snapshot válido primeiro,
+    JSON em seguida. Retorna (base, origem, avisos); no modo estrito qualquer
+    defeito gera ErroBaseRiscos.
+    """
+    if caminho_snapshot:
+        snapshot = carregar_snapshot(caminho_snapshot, caminho_json)
+        if snapshot is not None:
+            base, defeitos = snapshot
+            if not defeitos:
+                return base, 'snapshot', []
+            if not estrito:
+                return base, 'snapshot', [f"snapshot gerado no modo tolerante com {defeitos} defeito(s)"]
+            # Estrito: o snapshot não foi validado; o JSON refaz a validação (e falha)
+
+    dados, avisos = ler_json(caminho_json, estrito)
+    base = dados.get('base_riscos_cea') if isinstance(dados, dict) else None
+    erros = validar_base(base)
+    if erros and estrito:
+        raise ErroBaseRiscos("Base de riscos inconsistente:\n  " + "\n  ".join(erros))
+    return base or {}, 'json', avisos + erros
+
+
+def main(argv=None):
+    diretorio = os.path.abspath(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description="Valida a base de riscos e gera o snapshot binário.")
+    parser.add_argument('--json', default=os.path.join(diretorio, 'base_riscos_cea.json'))
+    parser.add_argument('--saida', default=os.path.join(diretorio, 'base_riscos_cea.snapshot'))
+    parser.add_argument('--tolerante', action='store_true', help="corrige defeitos comuns de JSON e só avisa inconsistências")
+    args = parser.parse_args(argv)
+
+    try:
+        base, correcoes, erros = gerar_snapshot(args.json, args.saida, estrito=not args.tolerante)
+    except ErroBaseRiscos as e:
+        print(f"ERRO: {e}", file=sys.stderr)
+        return 1
+    for aviso in correcoes + erros:
+        print(f"AVISO: {aviso}")
+    print(f"Snapshot gerado em {args.saida}: {len(base.get('riscos', []))} riscos, "
+          f"versão {base.get('metadata', {}).get('versao', 'desconhecida')}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
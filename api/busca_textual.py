@@ -0,0 +1,164 @@
+# api/busca_textual.py - Índice invertido para busca textual no catálogo de riscos
+"""
+Busca sem acentos e sem distinção de maiúsculas sobre os textos dos riscos.
+
+O texto é "dobrado" caractere a caractere (á → a, Ç → c), preservando as
+posições, de modo que os trechos destacados apontam para o texto original.
+Cada termo do índice guarda a lista de riscos em que aparece com um peso
+(frequência ponderada pelo campo); o vocabulário ordenado permite expandir
+prefixos com bisect. Todos os termos da consulta precisam casar (E lógico);
+cada termo casa como prefixo, com peso menor quanto mais longo for o termo
+do índice em relação ao da consulta. A pontuação soma peso × idf.
+"""
+import html
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+
+CAMPOS_BUSCA = {'evento': 3.0, 'descricao': 1.5, 'impacto': 1.0, 'mitigacao': 1.0, 'correcao': 1.0}
+PALAVRAS_VAZIAS = frozenset(
+    'a o e as os de da do das dos em na no nas nos um uma por para com sem ao aos que se ou '
+    'sua seu suas seus pela pelo pelas pelos entre sobre'.split()
+)
+PADRAO_TERMO = re.compile(r'\w+')
+CONTEXTO_ANTES = 60
+CONTEXTO_DEPOIS = 120
+
+
+def _dobrar_caractere(caractere):
+    decomposto = unicodedata.normalize('NFKD', caractere)
+    base = ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+    return base if len(base) == 1 else caractere.lower()[:1] or caractere
+
+
+_DOBRADOS = {}
+
+def dobrar(texto):
+    """Minúsculas sem acentos, com o mesmo comprimento do texto original."""
+    saida = []
+    for caractere in texto:
+        dobrado = _DOBRADOS.get(caractere)
+        if dobrado is None:
+            dobrado = _DOBRADOS[caractere] = _dobrar_caractere(caractere)
+        saida.append(dobrado)
+    return ''.join(saida)
+
+
+def termos(texto):
+    """Termos indexáveis de um texto já dobrado."""
+    return [t for t in PADRAO_TERMO.findall(texto) if t not in PALAVRAS_VAZIAS]
+
+
+class IndiceTextual:
+    """Índice invertido dos riscos (na ordem recebida, usada como desempate)."""
+
+    def __init__(self, riscos, campos=CAMPOS_BUSCA):
+        self.riscos = list(riscos)
+        self.campos = dict(campos)
+        self.textos_dobrados = []
+        postagens = {}
+        for posicao, risco in enumerate(self.riscos):
+            dobrados = {}
+            for campo, peso in self.campos.items():
+                texto = risco.get(campo)
+                if not isinstance(texto, str) or not texto:
+                    continue
+                dobrados[campo] = dobrar(texto)
+                for termo in termos(dobrados[campo]):
+                    pesos = postagens.setdefault(termo, {})
+                    pesos[posicao] = pesos.get(posicao, 0.0) + peso
+            self.textos_dobrados.append(dobrados)
+
+        total = len(self.riscos) or 1
+        self.vocabulario = sorted(postagens)
+        self.postagens = {
+            termo: (math.log(1 + total / len(pesos)), pesos) for termo, pesos in postagens.items()
+        }
+
+    def _expandir(self, prefixo):
+        """Termos do vocabulário que começam com o prefixo."""
+        inicio = bisect_left(self.vocabulario, prefixo)
+        fim = inicio
+        while fim < len(self.vocabulario) and self.vocabulario[fim].startswith(prefixo):
+            fim += 1
+        return self.vocabulario[inicio:fim]
+
+    def buscar(self, consulta, limite=20):
+        """
+        Retorna (total de resultados, [(posição do risco, pontuação, termos
+        casados)]) ordenados por pontuação e, no empate, pela ordem do índice.
+        """
+        consulta_termos = list(dict.fromkeys(termos(dobrar(consulta or ''))))
+        if not consulta_termos:
+            return 0, []
+
+        pontuacoes = None
+        casados = {}
+        for termo_consulta in consulta_termos:
+            parcial = {}
+            for termo in self._expandir(termo_consulta):
+                idf, pesos = self.postagens[termo]
+                fator = idf * len(termo_consulta) / len(termo)
+                for posicao, peso in pesos.items():
+                    parcial[posicao] = parcial.get(posicao, 0.0) + peso * fator
+                    casados.setdefault(posicao, set()).add(termo)
+            if pontuacoes is None:
+                pontuacoes = parcial
+            else:
+                pontuacoes = {p: s + parcial[p] for p, s in pontuacoes.items() if p in parcial}
+            if not pontuacoes:
+                return 0, []
+
+        ordenados = sorted(pontuacoes.items(), key=lambda item: (-item[1], item[0]))
+        return len(ordenados), [
+            (posicao, round(pontuacao, 4), casados[posicao]) for posicao, pontuacao in ordenados[:limite]
+        ]
+
+    def trechos(self, posicao, termos_casados, maximo=2):
+        """
+        Trechos dos campos com ocorrências, na ordem de peso dos campos: texto
+        original ao redor da primeira ocorrência, posições destacadas (relativas
+        ao trecho) e versão HTML com <mark>.
+        """
+        padrao = re.compile(r'\b(?:' + '|'.join(map(re.escape, sorted(termos_casados, key=len, reverse=True))) + r')\b')
+        risco = self.riscos[posicao]
+        resultado = []
+        for campo, dobrado in self.textos_dobrados[posicao].items():
+            ocorrencias = [(m.start(), m.end()) for m in padrao.finditer(dobrado)]
+            if not ocorrencias:
+                continue
+            texto = risco[campo]
+            if len(texto) <= CONTEXTO_ANTES + CONTEXTO_DEPOIS:
+                inicio, fim = 0, len(texto)
+            else:
+                inicio = max(0, ocorrencias[0][0] - CONTEXTO_ANTES)
+                fim = min(len(texto), ocorrencias[0][1] + CONTEXTO_DEPOIS)
+            # Ajusta as bordas para não cortar palavras
+            if inicio > 0:
+                espaco = texto.find(' ', inicio)
+                inicio = espaco + 1 if 0 <= espaco < ocorrencias[0][0] else inicio
+            if fim < len(texto):
+                espaco = texto.rfind(' ', ocorrencias[0][1], fim)
+                fim = espaco if espaco > 0 else fim
+            destaques = [(a - inicio, b - inicio) for a, b in ocorrencias if a >= inicio and b <= fim]
+
+            partes, cursor = [], inicio
+            for a, b in ocorrencias:
+                if a < inicio or b > fim:
+                    continue
+                partes.append(html.escape(texto[cursor:a]))
+                partes.append('<mark>' + html.escape(texto[a:b]) + '</mark>')
+                cursor = b
+            partes.append(html.escape(texto[cursor:fim]))
+            reticencias_antes = '…' if inicio > 0 else ''
+            reticencias_depois = '…' if fim < len(texto) else ''
+            resultado.append({
+                "campo": campo,
+                "trecho": reticencias_antes + texto[inicio:fim] + reticencias_depois,
+                "destaques": [[a + len(reticencias_antes), b + len(reticencias_antes)] for a, b in destaques],
+                "html": reticencias_antes + ''.join(partes) + reticencias_depois
+            })
+            if len(resultado) >= maximo:
+                break
+        return resultado
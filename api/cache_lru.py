@@ -0,0 +1,52 @@
+# api/cache_lru.py - Cache LRU limitado com contadores de acerto/falha
+from collections import OrderedDict
+from threading import Lock
+
+
+class CacheLRU:
+    """Cache LRU thread-safe com tamanho máximo e contadores de uso."""
+
+    def __init__(self, tamanho_maximo=512):
+        self.tamanho_maximo = tamanho_maximo
+        self._itens = OrderedDict()
+        self._lock = Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            try:
+                valor = self._itens[chave]
+            except KeyError:
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self.remocoes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            "tamanho": len(self._itens),
+            "tamanho_maximo": self.tamanho_maximo,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "remocoes": self.remocoes,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0
+        }
@@ -0,0 +1,209 @@
+# api/cache_pdf.py - Cache em disco de PDFs gerados, endereçado por conteúdo
+"""
+Cada PDF é gravado em ``<diretorio>/<chave>.pdf``, onde a chave é um hash do
+conteúdo que o determina (dados do projeto, riscos, versão da base e do
+renderizador). O tamanho total do diretório é limitado: após cada gravação
+os arquivos menos usados são removidos. A ordem de uso e os totais de bytes e
+arquivos ficam em memória, atualizados a cada gravação, acerto e remoção; o
+diretório só é varrido na inicialização (ordenado por mtime, que os acertos
+atualizam). Vários processos podem compartilhar o diretório; gravações são
+atômicas (arquivo temporário + rename). Cada processo contabiliza os arquivos
+da varredura inicial, os que grava e os que lê de outros processos.
+
+Requisições idênticas simultâneas no mesmo processo são coalescidas: só a
+primeira renderiza, as demais esperam e recebem o mesmo arquivo.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class _Voo:
+    """Renderização em andamento para uma chave."""
+
+    __slots__ = ('concluido', 'erro')
+
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.erro = None
+
+
+class CachePDF:
+    """Cache LRU de PDFs em disco, limitado em bytes, com single-flight por chave."""
+
+    def __init__(self, diretorio, tamanho_maximo_bytes):
+        self.diretorio = diretorio
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.coalescidas = 0
+        self.remocoes = 0
+        # chave → tamanho em bytes, do menos ao mais recentemente usado
+        self._tamanhos = OrderedDict()
+        self._bytes = 0
+        if self.ativo:
+            try:
+                os.makedirs(diretorio, exist_ok=True)
+                for _, tamanho, chave in sorted(self._arquivos()):
+                    self._tamanhos[chave] = tamanho
+                    self._bytes += tamanho
+            except OSError as e:
+                print(f"AVISO: cache de PDFs desativado, diretório {diretorio} indisponível: {e}")
+                self.tamanho_maximo_bytes = 0
+            else:
+                self._remover_excedentes()
+
+    @property
+    def ativo(self):
+        return self.tamanho_maximo_bytes > 0
+
+    def caminho(self, chave):
+        return os.path.join(self.diretorio, f"{chave}.pdf")
+
+    def abrir(self, chave):
+        """Abre o PDF em cache (marcando-o como usado) ou retorna None."""
+        caminho = self.caminho(chave)
+        try:
+            arquivo = open(caminho, 'rb')
+        except FileNotFoundError:
+            with self._lock:
+                self._descontar(chave)
+            return None
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        with self._lock:
+            if chave in self._tamanhos:
+                self._tamanhos.move_to_end(chave)
+            else:
+                # Gravado por outro processo
+                self._contabilizar(chave, os.fstat(arquivo.fileno()).st_size)
+        return arquivo
+
+    def obter_ou_gerar(self, chave, renderizar):
+        """
+        Retorna um arquivo binário aberto com o PDF da chave, renderizando-o
+        com ``renderizar()`` (que retorna um arquivo binário posicionado no
+        início) apenas se necessário.
+        """
+        if not self.ativo:
+            return renderizar()
+
+        arquivo = self.abrir(chave)
+        if arquivo is not None:
+            with self._lock:
+                self.acertos += 1
+            return arquivo
+
+        with self._lock:
+            voo = self._em_andamento.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_andamento[chave] = _Voo()
+                self.falhas += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            voo.concluido.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            arquivo = self.abrir(chave)
+            if arquivo is not None:
+                return arquivo
+            # Removido antes de ser lido (cache muito pequeno): renderiza sem coalescer
+            return renderizar()
+
+        try:
+            buffer = renderizar()
+            self.guardar(chave, buffer)
+        except Exception as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            voo.concluido.set()
+        buffer.seek(0)
+        return buffer
+
+    def guardar(self, chave, conteudo):
+        """Grava o PDF da chave (bytes ou arquivo binário); falhas de disco são ignoradas."""
+        if not self.ativo:
+            return
+        temporario = None
+        try:
+            descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+            with os.fdopen(descritor, 'wb') as f:
+                if hasattr(conteudo, 'read'):
+                    conteudo.seek(0)
+                    shutil.copyfileobj(conteudo, f)
+                else:
+                    f.write(conteudo)
+                tamanho = f.tell()
+            os.replace(temporario, self.caminho(chave))
+        except OSError:
+            # Falha de disco não impede a resposta: o buffer ainda é servido
+            if temporario:
+                try:
+                    os.unlink(temporario)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            self._descontar(chave)
+            self._contabilizar(chave, tamanho)
+        self._remover_excedentes()
+
+    def _arquivos(self):
+        """Varredura do diretório (só na inicialização): (mtime, tamanho, chave) de cada PDF."""
+        arquivos = []
+        with os.scandir(self.diretorio) as entradas:
+            for entrada in entradas:
+                if entrada.name.endswith('.pdf'):
+                    try:
+                        estado = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    arquivos.append((estado.st_mtime, estado.st_size, entrada.name[:-len('.pdf')]))
+        return arquivos
+
+    def _contabilizar(self, chave, tamanho):
+        self._tamanhos[chave] = tamanho
+        self._bytes += tamanho
+
+    def _descontar(self, chave):
+        self._bytes -= self._tamanhos.pop(chave, 0)
+
+    def _remover_excedentes(self):
+        with self._lock:
+            excedentes = []
+            while self._bytes > self.tamanho_maximo_bytes and self._tamanhos:
+                chave, tamanho = self._tamanhos.popitem(last=False)
+                self._bytes -= tamanho
+                excedentes.append(chave)
+            self.remocoes += len(excedentes)
+        for chave in excedentes:
+            try:
+                os.unlink(self.caminho(chave))
+            except FileNotFoundError:
+                pass
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            "ativo": self.ativo,
+            "arquivos": len(self._tamanhos),
+            "bytes": self._bytes,
+            "bytes_maximo": self.tamanho_maximo_bytes,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "coalescidas": self.coalescidas,
+            "remocoes": self.remocoes,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0
+        }
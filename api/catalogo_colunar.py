@@ -0,0 +1,103 @@
+# api/catalogo_colunar.py - Visão colunar do catálogo de riscos para agregações
+"""
+Armazena o catálogo em colunas: atributos categóricos (fase, categoria,
+responsável, faixa de nível) viram códigos inteiros em ``array`` e cada código
+ganha um mapa de bits com os riscos que o possuem. Os bits seguem a mesma
+ordem do MotorSelecao, então uma seleção (máscara) pode ser agregada
+diretamente: a distribuição de uma coluna é uma contagem de bits por código.
+"""
+from array import array
+
+try:
+    contar_bits = int.bit_count
+except AttributeError:  # Python < 3.10
+    def contar_bits(mascara):
+        return bin(mascara).count('1')
+
+
+class CatalogoColunar:
+    """Colunas codificadas e mapas de bits por código, na ordem de bits do motor."""
+
+    def __init__(self, total):
+        self.total = total
+        self.mascara_total = (1 << total) - 1
+        self.codigos = {}
+        self.rotulos = {}
+        self.mapas_bits = {}
+        self.numericas = {}
+
+    def adicionar_coluna(self, nome, valores, ordem_rotulos=()):
+        """Codifica uma coluna categórica; `ordem_rotulos` fixa a ordem dos primeiros códigos."""
+        rotulos = list(dict.fromkeys(ordem_rotulos))
+        codigo_por_rotulo = {rotulo: codigo for codigo, rotulo in enumerate(rotulos)}
+        codigos = array('h')
+        for valor in valores:
+            codigo = codigo_por_rotulo.get(valor)
+            if codigo is None:
+                codigo = codigo_por_rotulo[valor] = len(rotulos)
+                rotulos.append(valor)
+            codigos.append(codigo)
+
+        mapas = [0] * len(rotulos)
+        for bit, codigo in enumerate(codigos):
+            mapas[codigo] |= 1 << bit
+
+        self.codigos[nome] = codigos
+        self.rotulos[nome] = rotulos
+        self.mapas_bits[nome] = mapas
+
+    def adicionar_grupos(self, nome, coluna, grupos):
+        """
+        Cria uma coluna derivada de grupos (possivelmente sobrepostos) sobre os
+        rótulos de `coluna`; `grupos` mapeia nome do grupo → predicado do rótulo.
+        """
+        rotulos = self.rotulos[coluna]
+        mapas = self.mapas_bits[coluna]
+        self.rotulos[nome] = list(grupos)
+        self.mapas_bits[nome] = [
+            _unir(mapa for rotulo, mapa in zip(rotulos, mapas) if predicado(rotulo))
+            for predicado in grupos.values()
+        ]
+
+    def adicionar_numerica(self, nome, valores):
+        self.numericas[nome] = array('i', valores)
+
+    def mascara_rotulos(self, coluna, rotulos):
+        """Máscara dos riscos cujo valor na coluna está em `rotulos`."""
+        alvo = set(rotulos)
+        return _unir(mapa for rotulo, mapa in zip(self.rotulos[coluna], self.mapas_bits[coluna]) if rotulo in alvo)
+
+    def distribuicao(self, coluna, mascara=None, incluir_zeros=False):
+        """Contagem de riscos por rótulo da coluna, restrita à máscara (todos por padrão)."""
+        if mascara is None:
+            mascara = self.mascara_total
+        contagem = {}
+        for rotulo, mapa in zip(self.rotulos[coluna], self.mapas_bits[coluna]):
+            quantidade = contar_bits(mascara & mapa)
+            if quantidade or incluir_zeros:
+                contagem[rotulo] = quantidade
+        return contagem
+
+    def soma(self, numerica, coluna, mascara=None):
+        """Soma da coluna numérica por rótulo da coluna categórica, restrita à máscara."""
+        if mascara is None:
+            mascara = self.mascara_total
+        valores = self.numericas[numerica]
+        somas = {}
+        for rotulo, mapa in zip(self.rotulos[coluna], self.mapas_bits[coluna]):
+            restante = mascara & mapa
+            total = 0
+            while restante:
+                menor = restante & -restante
+                total += valores[menor.bit_length() - 1]
+                restante ^= menor
+            if total:
+                somas[rotulo] = total
+        return somas
+
+
+def _unir(mascaras):
+    resultado = 0
+    for mascara in mascaras:
+        resultado |= mascara
+    return resultado
@@ -0,0 +1,196 @@
+# api/fila_pdf.py - Fila assíncrona de geração de PDFs
+"""
+Pedidos de PDF entram em uma fila limitada e são renderizados por um pequeno
+conjunto de threads em segundo plano, fora das threads que atendem as
+requisições. O estado dos trabalhos fica em SQLite e os PDFs prontos em um
+diretório, de modo que qualquer processo do servidor consulta o estado e
+serve o download; a renderização acontece no processo que recebeu o pedido
+(um trabalho pendente se perde se esse processo terminar, e é descartado
+pela limpeza por TTL).
+
+Estados: pendente → processando → concluido | erro.
+"""
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabalhos (
+    id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    nome_arquivo TEXT,
+    total_riscos INTEGER,
+    criado REAL NOT NULL,
+    iniciado REAL,
+    finalizado REAL,
+    tamanho INTEGER,
+    erro TEXT
+)
+"""
+
+
+class FilaCheia(Exception):
+    """A fila de PDFs atingiu o tamanho máximo."""
+
+
+class FilaPDF:
+    """Fila limitada de trabalhos de PDF com estado em SQLite e limpeza por TTL."""
+
+    def __init__(self, diretorio, executar, trabalhadores=2, tamanho_maximo=100, ttl_segundos=3600):
+        self.diretorio = diretorio
+        self.banco = os.path.join(diretorio, 'fila.sqlite3')
+        self.executar = executar
+        self.trabalhadores = trabalhadores
+        self.ttl_segundos = ttl_segundos
+        self._fila = queue.Queue(maxsize=tamanho_maximo)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._ultima_limpeza = 0.0
+        self.processando = 0
+        self.concluidos = 0
+        self.falhas = 0
+        self.rejeitados = 0
+        self.removidos = 0
+        os.makedirs(diretorio, exist_ok=True)
+        with closing(self._conectar()) as conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute(ESQUEMA)
+            conexao.commit()
+
+    def _conectar(self):
+        return sqlite3.connect(self.banco, timeout=10)
+
+    def _atualizar(self, trabalho_id, **campos):
+        atribuicoes = ', '.join(f"{campo} = ?" for campo in campos)
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(f"UPDATE trabalhos SET {atribuicoes} WHERE id = ?", (*campos.values(), trabalho_id))
+
+    def caminho(self, trabalho_id):
+        return os.path.join(self.diretorio, f"{trabalho_id}.pdf")
+
+    def _iniciar_trabalhadores(self):
+        with self._lock:
+            while len(self._threads) < self.trabalhadores:
+                thread = threading.Thread(
+                    target=self._trabalhar, name=f"fila-pdf-{len(self._threads) + 1}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submeter(self, pedido, nome_arquivo, total_riscos):
+        """Registra e enfileira um trabalho; retorna seu ID ou levanta FilaCheia."""
+        self.limpar_expirados()
+        trabalho_id = uuid.uuid4().hex
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                "INSERT INTO trabalhos (id, estado, nome_arquivo, total_riscos, criado) VALUES (?, 'pendente', ?, ?, ?)",
+                (trabalho_id, nome_arquivo, total_riscos, time.time())
+            )
+        try:
+            self._fila.put_nowait((trabalho_id, pedido))
+        except queue.Full:
+            with closing(self._conectar()) as conexao, conexao:
+                conexao.execute("DELETE FROM trabalhos WHERE id = ?", (trabalho_id,))
+            with self._lock:
+                self.rejeitados += 1
+            raise FilaCheia(f"Fila de PDFs cheia ({self._fila.maxsize} trabalhos).")
+        self._iniciar_trabalhadores()
+        return trabalho_id
+
+    def _trabalhar(self):
+        while True:
+            trabalho_id, pedido = self._fila.get()
+            with self._lock:
+                self.processando += 1
+            self._atualizar(trabalho_id, estado='processando', iniciado=time.time())
+            try:
+                arquivo = self.executar(pedido)
+                temporario = self.caminho(trabalho_id) + '.tmp'
+                with arquivo, open(temporario, 'wb') as destino:
+                    shutil.copyfileobj(arquivo, destino)
+                os.replace(temporario, self.caminho(trabalho_id))
+                self._atualizar(
+                    trabalho_id, estado='concluido', finalizado=time.time(),
+                    tamanho=os.path.getsize(self.caminho(trabalho_id))
+                )
+                with self._lock:
+                    self.concluidos += 1
+            except Exception as e:
+                print(f"Erro no trabalho de PDF {trabalho_id}: {e}")
+                self._atualizar(trabalho_id, estado='erro', finalizado=time.time(), erro=str(e))
+                with self._lock:
+                    self.falhas += 1
+            finally:
+                with self._lock:
+                    self.processando -= 1
+                self._fila.task_done()
+            self.limpar_expirados()
+
+    def consultar(self, trabalho_id):
+        """Estado do trabalho (dict) com tempos de espera e de renderização, ou None."""
+        with closing(self._conectar()) as conexao:
+            conexao.row_factory = sqlite3.Row
+            linha = conexao.execute("SELECT * FROM trabalhos WHERE id = ?", (trabalho_id,)).fetchone()
+        if linha is None:
+            return None
+        trabalho = dict(linha)
+        agora = time.time()
+        inicio = trabalho['iniciado']
+        trabalho['espera_ms'] = round(((inicio or agora) - trabalho['criado']) * 1000, 1)
+        if inicio:
+            trabalho['renderizacao_ms'] = round(((trabalho['finalizado'] or agora) - inicio) * 1000, 1)
+        if trabalho['finalizado'] and self.ttl_segundos:
+            trabalho['expira_em'] = trabalho['finalizado'] + self.ttl_segundos
+        return trabalho
+
+    def limpar_expirados(self, forcar=False):
+        """
+        Remove trabalhos (e PDFs) finalizados há mais que o TTL e pendentes
+        abandonados há mais que o dobro dele; roda no máximo uma vez por minuto.
+        """
+        agora = time.time()
+        if not self.ttl_segundos:
+            return 0
+        with self._lock:
+            if not forcar and agora - self._ultima_limpeza < 60:
+                return 0
+            self._ultima_limpeza = agora
+        with closing(self._conectar()) as conexao, conexao:
+            expirados = [linha[0] for linha in conexao.execute(
+                "SELECT id FROM trabalhos WHERE finalizado < ? OR (finalizado IS NULL AND criado < ?)",
+                (agora - self.ttl_segundos, agora - 2 * self.ttl_segundos)
+            )]
+            conexao.executemany("DELETE FROM trabalhos WHERE id = ?", [(i,) for i in expirados])
+        for trabalho_id in expirados:
+            try:
+                os.unlink(self.caminho(trabalho_id))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self.removidos += len(expirados)
+        return len(expirados)
+
+    @property
+    def profundidade(self):
+        """Trabalhos enfileirados aguardando uma thread."""
+        return self._fila.qsize()
+
+    def estatisticas(self):
+        with closing(self._conectar()) as conexao:
+            por_estado = dict(conexao.execute("SELECT estado, COUNT(*) FROM trabalhos GROUP BY estado").fetchall())
+        return {
+            "profundidade_fila": self.profundidade,
+            "tamanho_maximo": self._fila.maxsize,
+            "trabalhadores": self.trabalhadores,
+            "processando": self.processando,
+            "concluidos": self.concluidos,
+            "falhas": self.falhas,
+            "rejeitados": self.rejeitados,
+            "removidos_ttl": self.removidos,
+            "trabalhos_por_estado": por_estado
+        }
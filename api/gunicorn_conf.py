@@ -0,0 +1,68 @@
+# api/gunicorn_conf.py - Perfil de produção do gunicorn com preload e aquecimento
+"""
+Carrega a aplicação uma vez no mestre (preload_app), executa o aquecimento
+(index.aquecer: índices, catálogo pré-comprimido, seleções pré-computadas,
+um PDF representativo e uma passada pelas rotas JSON) e congela os objetos
+resultantes no GC antes do fork. Os workers herdam tudo pronto: a primeira
+requisição de cada um já tem a latência de regime, e as páginas de memória
+da base, dos índices e do ReportLab ficam compartilhadas entre os processos
+(copy-on-write), em vez de duplicadas.
+
+O coletor fica desligado da carga da aplicação até o gc.freeze(): uma
+coleta nesse intervalo abriria lacunas nas páginas já alocadas, que os
+workers preencheriam (e copiariam). Logo após o congelamento ele é religado
+no mestre (que vive tanto quanto o servidor) e, por segurança, nos workers.
+
+Uso:
+    gunicorn -c api/gunicorn_conf.py
+    RISCOS_GUNICORN_WORKERS=4 RISCOS_AQUECIMENTO=indices,pdf gunicorn -c api/gunicorn_conf.py
+
+Variáveis (além das de index.py):
+- RISCOS_GUNICORN_BIND (padrão 0.0.0.0:8000), RISCOS_GUNICORN_WORKERS (núcleos),
+  RISCOS_GUNICORN_WORKER_CLASS (gthread), RISCOS_GUNICORN_THREADS (4);
+- RISCOS_AQUECIMENTO: etapas separadas por vírgula (ver index.ETAPAS_AQUECIMENTO)
+  ou ganchos 'modulo:funcao'; vazio desliga o aquecimento.
+
+Com RISCOS_GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker o perfil serve
+asgi.py (modo ASGI) com o mesmo preload.
+"""
+import gc
+import os
+import sys
+import time
+
+DIRETORIO_API = os.path.abspath(os.path.dirname(__file__))
+
+chdir = DIRETORIO_API
+bind = os.environ.get("RISCOS_GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("RISCOS_GUNICORN_WORKERS", os.cpu_count() or 1))
+worker_class = os.environ.get("RISCOS_GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("RISCOS_GUNICORN_THREADS", 4))
+wsgi_app = "asgi:app" if "uvicorn" in worker_class else "index:app"
+preload_app = True
+timeout = 120
+
+# Desde antes da carga da aplicação até o gc.freeze() em when_ready (ver docstring)
+gc.disable()
+
+
+def when_ready(server):
+    """No mestre, com a aplicação já carregada e antes de criar os workers."""
+    index = sys.modules.get('index')
+    if index is None:
+        sys.path.insert(0, DIRETORIO_API)
+        import index
+    try:
+        inicio = time.perf_counter()
+        tempos = index.aquecer()
+        etapas = {etapa: ms for etapa, ms in tempos.items() if etapa.startswith('aquecimento_')}
+        server.log.info(f"Aquecimento concluído em {(time.perf_counter() - inicio) * 1000:.0f} ms: {etapas}")
+        gc.freeze()
+        server.log.info(f"{gc.get_freeze_count()} objetos congelados antes do fork")
+    finally:
+        # O mestre vive tanto quanto o servidor: não pode ficar sem coletor
+        gc.enable()
+
+
+def post_fork(server, worker):
+    gc.enable()
@@ -1,50 +1,152 @@
 # api/index.py - Backend sem funcionalidade de sugestões
+import time
+INICIO_PROCESSO = time.perf_counter()
+
 import os
+import sys
+import threading
 import json
+import csv
+import math
+import re
+import hashlib
+import importlib
+import io
+import tempfile
+import zipfile
+from bisect import bisect_left
+from itertools import combinations
 from datetime import datetime
-from io import BytesIO
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
 from flask_cors import CORS
 
-# Importações para geração de PDF
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.colors import HexColor, black, white
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-    from reportlab.lib.units import mm, inch
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-    from reportlab.pdfgen import canvas
-    REPORTLAB_AVAILABLE = True
-    print("ReportLab carregado com sucesso!")
-except ImportError as e:
-    print(f"ERRO: ReportLab não está instalado ou há problema na importação: {e}")
-    REPORTLAB_AVAILABLE = False
+# Módulos auxiliares da API ficam ao lado deste arquivo
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+from analise_portfolio import AgregadorPortfolio
+from base_dados import ErroBaseRiscos, carregar_base, hash_arquivo
+from cache_lru import CacheLRU
+from cache_pdf import CachePDF
+from fila_pdf import FilaCheia, FilaPDF
+from matriz_riscos import montar_grade
+from busca_textual import IndiceTextual
+from catalogo_colunar import CatalogoColunar, contar_bits
+from metricas import RegistroMetricas
+from motor_selecao import MotorSelecao
+from rastreamento import RASTRO_INATIVO, iniciar_rastro
+from serializacao import SaidaFluxo, codificar, comprimir, escolher_codificacao, lista_json, montar_json, objeto_json
+
+# Orçamento da partida a frio: tempo de cada etapa da inicialização (exposto em /api/health)
+INICIALIZACAO = {"origem_base": None, "tempos_ms": {}}
+
+def registrar_etapa(etapa, inicio):
+    """Registra a duração da etapa iniciada em `inicio` e retorna o instante atual."""
+    agora = time.perf_counter()
+    INICIALIZACAO["tempos_ms"][etapa] = round((agora - inicio) * 1000, 2)
+    return agora
+
+_marco = registrar_etapa("importacoes", INICIO_PROCESSO)
 
 app = Flask(__name__)
 CORS(app)
 
+# Rastreamento por etapas, desligado por padrão (ver rastreamento.py)
+AMOSTRAGEM_RASTRO = float(os.environ.get("RISCOS_TRACE_AMOSTRAGEM", 0))
+VALORES_VERDADEIROS = ("1", "true", "sim")
+
+def parametro_ativo(nome, cabecalho):
+    """Flag ligada pela query (?nome=1) ou por cabeçalho."""
+    return (request.args.get(nome, "").lower() in VALORES_VERDADEIROS
+            or request.headers.get(cabecalho, "").lower() in VALORES_VERDADEIROS)
+
+# Métricas do processo, expostas em /api/metrics (ver metricas.py)
+METRICAS = RegistroMetricas()
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICA_REQUISICOES = METRICAS.contador(
+    "riscos_http_requisicoes_total", "Requisições atendidas por rota, método e status.", ("rota", "metodo", "status"))
+METRICA_LATENCIA = METRICAS.histograma(
+    "riscos_http_duracao_segundos", "Tempo até a resposta (cabeçalhos) por rota e método.", LIMITES_LATENCIA, ("rota", "metodo"))
+METRICA_EM_ANDAMENTO = METRICAS.medidor(
+    "riscos_http_em_andamento", "Requisições em andamento por rota.", ("rota",))
+METRICA_PDF_TEMPO = METRICAS.histograma(
+    "riscos_pdf_renderizacao_segundos", "Tempo de renderização dos PDFs gerados neste processo.",
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+METRICA_PDF_TAMANHO = METRICAS.histograma(
+    "riscos_pdf_tamanho_bytes", "Tamanho dos PDFs gerados neste processo.",
+    (10000, 25000, 50000, 100000, 250000, 500000, 1000000, 2500000, 5000000))
+METRICA_SELECAO_RISCOS = METRICAS.histograma(
+    "riscos_selecao_riscos", "Riscos por seleção servida, pela origem do resultado (precomputada, cache, calculada).",
+    (0, 5, 10, 15, 20, 25, 30, 40, 50, 60, 80, 100), ("origem",))
+
+def rota_requisicao():
+    """Regra da rota (cardinalidade limitada) ou 'nao_encontrada'."""
+    return request.url_rule.rule if request.url_rule else "nao_encontrada"
+
+@app.before_request
+def iniciar_metricas_requisicao():
+    g.inicio_requisicao = time.perf_counter()
+    g.rota_metricas = rota_requisicao()
+    METRICA_EM_ANDAMENTO.inc(g.rota_metricas)
+
+@app.after_request
+def registrar_metricas_requisicao(resposta):
+    rota = g.get("rota_metricas")
+    if rota is not None:
+        METRICA_REQUISICOES.inc(rota, request.method, resposta.status_code)
+        METRICA_LATENCIA.observar(time.perf_counter() - g.inicio_requisicao, rota, request.method)
+    return resposta
+
+@app.teardown_request
+def concluir_metricas_requisicao(erro=None):
+    # Em respostas transmitidas, roda quando o fluxo termina
+    rota = g.get("rota_metricas")
+    if rota is not None:
+        METRICA_EM_ANDAMENTO.dec(rota)
+
+@app.before_request
+def iniciar_rastro_requisicao():
+    g.rastro = iniciar_rastro(parametro_ativo("trace", "X-Riscos-Trace"), AMOSTRAGEM_RASTRO)
+
+@app.after_request
+def concluir_rastro_requisicao(resposta):
+    rastro = g.get("rastro", RASTRO_INATIVO)
+    if rastro.ativo:
+        resposta.headers["Server-Timing"] = rastro.server_timing()
+        rastro.registrar(metodo=request.method, rota=request.url_rule.rule if request.url_rule else request.path,
+                         status=resposta.status_code)
+    return resposta
+
 # Carregamento da Base de Dados JSON
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 JSON_FILE_PATH = os.path.join(BASE_DIR, 'base_riscos_cea.json')
+SNAPSHOT_FILE_PATH = os.path.join(BASE_DIR, 'base_riscos_cea.snapshot')
+
+# 'estrito' falha na carga diante de qualquer defeito; 'tolerante' corrige o que puder e avisa
+MODO_CARGA = os.environ.get("RISCOS_MODO_CARGA", "tolerante")
 
 def carregar_dados_riscos():
-    """Carrega os dados do arquivo JSON."""
+    """Carrega a base de riscos (snapshot binário validado ou JSON)."""
+    estrito = MODO_CARGA == 'estrito'
     try:
-        with open(JSON_FILE_PATH, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
-        return dados.get("base_riscos_cea", {})
-    except FileNotFoundError:
-        print(f"ERRO CRÍTICO: Arquivo JSON de riscos não encontrado em {JSON_FILE_PATH}")
-        return {}
-    except json.JSONDecodeError:
-        print(f"ERRO CRÍTICO: Falha ao decodificar o arquivo JSON em {JSON_FILE_PATH}")
+        dados, origem, avisos = carregar_base(JSON_FILE_PATH, SNAPSHOT_FILE_PATH, estrito=estrito)
+    except ErroBaseRiscos as e:
+        if estrito:
+            raise
+        print(f"ERRO CRÍTICO ao carregar dados de riscos: {e}")
         return {}
     except Exception as e:
+        if estrito:
+            raise
         print(f"ERRO CRÍTICO inesperado ao carregar dados de riscos: {e}")
         return {}
+    
+    for aviso in avisos:
+        print(f"AVISO (base de riscos): {aviso}")
+    print(f"Base de riscos carregada de {origem}: {len(dados.get('riscos', []))} riscos")
+    INICIALIZACAO["origem_base"] = origem
+    return dados
 
 RISK_DATABASE = carregar_dados_riscos()
+_marco = registrar_etapa("carga_base", _marco)
 
 if not RISK_DATABASE:
     print("AVISO: A base de dados de riscos está vazia. A API pode não funcionar como esperado.")
@@ -137,528 +239,565 @@ def obter_tamanho_info(tipo_unidade):
     """Obtém informações de tamanho e complexidade da unidade."""
     return TAMANHOS_POR_UNIDADE.get(tipo_unidade, {'categoria': 'medio', 'area': 0, 'complexidade': 'media'})
 
-def obter_cor_risco(nivel_risco):
-    """Retorna a cor correspondente ao nível de risco."""
+def classificar_nivel(nivel_risco):
+    """Retorna a faixa do nível de risco: extremo, alto, moderado ou baixo."""
     if nivel_risco >= 15:
-        return HexColor('#fef2f2'), HexColor('#dc2626')  # bg-red-50, text-red-600
+        return 'extremo'
     elif nivel_risco >= 8:
-        return HexColor('#fff7ed'), HexColor('#ea580c')  # bg-orange-50, text-orange-600
+        return 'alto'
     elif nivel_risco >= 3:
-        return HexColor('#fefce8'), HexColor('#ca8a04')  # bg-yellow-50, text-yellow-600
+        return 'moderado'
     else:
-        return HexColor('#eff6ff'), HexColor('#2563eb')  # bg-blue-50, text-blue-600
+        return 'baixo'
 
-def obter_texto_nivel_risco(nivel_risco, classificacao=None):
-    """Retorna o texto do nível de risco."""
-    if classificacao:
-        return f"{classificacao} ({nivel_risco})"
-    if nivel_risco >= 15:
-        return f"Extremo ({nivel_risco})"
-    elif nivel_risco >= 8:
-        return f"Alto ({nivel_risco})"
-    elif nivel_risco >= 3:
-        return f"Moderado ({nivel_risco})"
-    else:
-        return f"Baixo ({nivel_risco})"
+# O ReportLab custa mais que todo o resto da partida: só é importado no
+# primeiro PDF ou, com RISCOS_PREAQUECER_PDF=1, em segundo plano após a carga
+_lock_pdf = threading.Lock()
 
-def gerar_pdf_riscos(dados_projeto, riscos_selecionados, metadados_selecao):
-    """Gera o PDF com a matriz de riscos."""
-    
-    if not REPORTLAB_AVAILABLE:
-        raise Exception("ReportLab não está instalado. Instale com: pip install reportlab")
-    
-    # Criar buffer para o PDF
-    buffer = BytesIO()
-    
-    # Configurar o documento
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20*mm, leftMargin=20*mm, 
-                           topMargin=25*mm, bottomMargin=25*mm)
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    
-    # Estilos personalizados
-    titulo_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=12,
-        textColor=HexColor('#1e3a8a'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    subtitulo_style = ParagraphStyle(
-        'CustomSubtitle', 
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=10,
-        textColor=HexColor('#374151'),
-        alignment=TA_CENTER
-    )
-    
-    risco_titulo_style = ParagraphStyle(
-        'RiscoTitulo',
-        parent=styles['Heading3'],
-        fontSize=12,
-        spaceAfter=6,
-        textColor=black,
-        fontName='Helvetica-Bold'
-    )
-    
-    risco_texto_style = ParagraphStyle(
-        'RiscoTexto',
-        parent=styles['Normal'],
-        fontSize=9,
-        spaceAfter=4,
-        alignment=TA_JUSTIFY,
-        leading=11
+def modulo_pdf():
+    """Importa o módulo de PDF (e o ReportLab) somente no primeiro uso."""
+    with _lock_pdf:
+        if 'pdf_riscos' not in sys.modules:
+            inicio = time.perf_counter()
+            import pdf_riscos
+            registrar_etapa("importacao_pdf", inicio)
+    return sys.modules['pdf_riscos']
+
+def chaves_fragmentos(riscos_selecionados):
+    """
+    Chave de cache (ID, versão da base) dos fragmentos de PDF de cada risco; os
+    riscos dos pedidos sempre vêm da base carregada (ver ler_pedido_pdf).
+    """
+    versao = versao_base()
+    return [(risco['id'], versao) for risco in riscos_selecionados]
+
+# PDFs maiores que este limite vão da memória para um arquivo temporário em disco
+LIMITE_MEMORIA_PDF = int(os.environ.get("RISCOS_PDF_LIMITE_MEMORIA_KB", 512)) * 1024
+
+def grade_riscos(riscos):
+    """Grade 5×5 (matriz_riscos.montar_grade) dos riscos da base com os IDs informados."""
+    return montar_grade(
+        REGRAS_COMPILADAS['colunar'], REGRAS_COMPILADAS['ids_por_bit'],
+        REGRAS_COMPILADAS['motor'].mascara([risco.get('id') for risco in riscos])
     )
-    
-    mitigacao_style = ParagraphStyle(
-        'MitigacaoStyle',
-        parent=styles['Normal'],
-        fontSize=9,
-        spaceAfter=3,
-        alignment=TA_JUSTIFY,
-        leading=10
+
+def gerar_pdf_riscos(dados_projeto, riscos_selecionados, metadados_selecao, incluir_matriz=False):
+    """
+    Gera o PDF com a matriz de riscos (ver pdf_riscos.gerar_pdf_riscos) em um
+    SpooledTemporaryFile. Riscos idênticos aos da base carregada usam os
+    fragmentos em cache por (ID, versão). Com `incluir_matriz`, a figura da
+    matriz 5×5 dos riscos entra após a legenda. Com RISCOS_PDF_EM_PROCESSO=1,
+    a renderização vai para o pool de processos dos lotes.
+    """
+    destino = tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_PDF)
+    inicio = time.perf_counter()
+    matriz = grade_riscos(riscos_selecionados) if incluir_matriz else None
+    try:
+        pool = pool_pdf() if PDF_EM_PROCESSO else None
+        if pool is not None:
+            # A thread só espera o processo: não disputa o GIL com as demais requisições
+            destino.write(pool.submit(
+                modulo_pdf().renderizar_pdf_bytes, dados_projeto, riscos_selecionados, metadados_selecao,
+                chaves_fragmentos(riscos_selecionados), matriz
+            ).result())
+            pdf = destino
+        else:
+            pdf = modulo_pdf().gerar_pdf_riscos(
+                dados_projeto, riscos_selecionados, metadados_selecao,
+                chaves_fragmentos(riscos_selecionados), destino, matriz=matriz
+            )
+    except Exception:
+        destino.close()
+        raise
+    pdf.seek(0, os.SEEK_END)
+    observar_pdf(time.perf_counter() - inicio, pdf.tell())
+    pdf.seek(0)
+    return pdf
+
+def observar_pdf(segundos, tamanho):
+    """Registra tempo de renderização e tamanho de um PDF nas métricas."""
+    METRICA_PDF_TEMPO.observar(segundos)
+    METRICA_PDF_TAMANHO.observar(tamanho)
+
+def nome_arquivo_pdf(project_data, timestamp):
+    """Nome do arquivo da matriz: força abreviada, unidade e instante da geração."""
+    forca_abrev = FORCE_MAPPING.get(project_data.get('forca', ''), 'SESP')
+    tipo_unidade = project_data.get('tipoUnidade', 'Unidade').replace(' ', '_').replace('(', '').replace(')', '').replace(',', '')
+    return f"Matriz_Risco_{forca_abrev}_{tipo_unidade}_{timestamp}.pdf"
+
+# PDFs já gerados, em disco; a versão do renderizador é o hash do código de
+# pdf_riscos.py, então qualquer mudança no layout invalida o cache sozinha
+VERSAO_RENDERIZADOR_PDF = hash_arquivo(os.path.join(BASE_DIR, 'pdf_riscos.py')).hex()[:16]
+CACHE_PDF = CachePDF(
+    os.environ.get("RISCOS_CACHE_PDF_DIR", os.path.join(tempfile.gettempdir(), "riscos_cea_pdf")),
+    int(float(os.environ.get("RISCOS_CACHE_PDF_MB", 256)) * 1024 * 1024)
+)
+
+def normalizar_para_chave(valor):
+    """Remove espaços das pontas e valores vazios, para que variações irrelevantes gerem a mesma chave."""
+    if isinstance(valor, str):
+        return valor.strip()
+    if isinstance(valor, dict):
+        normalizado = {chave: normalizar_para_chave(v) for chave, v in valor.items()}
+        return {chave: v for chave, v in normalizado.items() if v not in (None, '', [], {})}
+    if isinstance(valor, list):
+        return [normalizar_para_chave(item) for item in valor]
+    return valor
+
+def chave_pdf(dados_projeto, riscos_selecionados, incluir_matriz=False):
+    """Hash de (projeto normalizado, IDs dos riscos em ordem, figura da matriz, versão da base, versão do renderizador)."""
+    riscos = [risco['id'] for risco in riscos_selecionados]
+    conteudo = json.dumps(
+        [normalizar_para_chave(dados_projeto), riscos, bool(incluir_matriz), versao_base(), VERSAO_RENDERIZADOR_PDF],
+        sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str
     )
-    
-    # Conteúdo do documento
-    story = []
-    
-    # Cabeçalho
-    story.append(Paragraph("MATRIZ DE RISCO - SESP/PR", titulo_style))
-    story.append(Paragraph("Centro de Engenharia e Arquitetura", subtitulo_style))
-    story.append(Spacer(1, 10*mm))
-    
-    # Legenda dos níveis de risco
-    legenda_data = [
-        ['Nível de Risco', 'Pontuação', 'Descrição'],
-        ['Extremo', '15-25', 'Impacto máximo nos objetivos, sem possibilidade de recuperação'],
-        ['Alto', '8-14', 'Impacto significativo, com possibilidade mínima de recuperação'],
-        ['Moderado', '3-7', 'Impacto moderado, com plena possibilidade de recuperação'],
-        ['Baixo', '1-2', 'Impacto mínimo nos objetivos']
-    ]
-    
-    legenda_table = Table(legenda_data, colWidths=[30*mm, 20*mm, 120*mm])
-    legenda_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f3f4f6')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), white),
-        ('GRID', (0, 0), (-1, -1), 1, black)
-    ]))
-    
-    story.append(Paragraph("<b>Legenda dos Níveis de Risco:</b>", risco_titulo_style))
-    story.append(legenda_table)
-    story.append(Spacer(1, 8*mm))
-    
-    # Lista de riscos
-    story.append(Paragraph("<b>RISCOS IDENTIFICADOS</b>", titulo_style))
-    story.append(Spacer(1, 6*mm))
-    
-    for i, risco in enumerate(riscos_selecionados):
-        if i > 0:
-            story.append(Spacer(1, 6*mm))
-        
-        # Cabeçalho do risco
-        bg_color, text_color = obter_cor_risco(risco.get('nivel_risco', 0))
-        nivel_texto = obter_texto_nivel_risco(risco.get('nivel_risco', 0), risco.get('classificacao'))
-        
-        # Informações do cabeçalho
-        cabecalho_data = [[
-            f"#{risco.get('id', 'N/A')}",
-            nivel_texto,
-            risco.get('fase', 'N/A'),
-            risco.get('responsavel', 'N/A')
-        ]]
-        
-        cabecalho_table = Table(cabecalho_data, colWidths=[20*mm, 40*mm, 60*mm, 50*mm])
-        cabecalho_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), bg_color),
-            ('TEXTCOLOR', (0, 0), (-1, -1), text_color),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, text_color)
-        ]))
-        
-        story.append(cabecalho_table)
-        
-        # NOVA POSIÇÃO: Probabilidade e Impacto logo após o cabeçalho
-        prob_impacto_data = [
-            ['Probabilidade', 'Impacto'],
-            [f"{risco.get('probabilidade', 0)}/5", f"{risco.get('impacto_nivel', 0)}/5"]
-        ]
-        
-        prob_impacto_table = Table(prob_impacto_data, colWidths=[85*mm, 85*mm])
-        prob_impacto_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f3f4f6')),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 1, HexColor('#d1d5db'))
-        ]))
-        
-        story.append(Spacer(1, 2*mm))
-        story.append(prob_impacto_table)
-        
-        # Título do evento
-        story.append(Spacer(1, 3*mm))
-        story.append(Paragraph(f"<b>{risco.get('evento', 'N/A')}</b>", risco_titulo_style))
-        
-        # Descrição
-        story.append(Paragraph(f"<b>Descrição:</b> {risco.get('descricao', 'N/A')}", risco_texto_style))
-        
-        # Impacto
-        if risco.get('impacto'):
-            story.append(Paragraph(f"<b>Impacto:</b> {risco.get('impacto')}", risco_texto_style))
-        
-        # Mitigação e Correção (uma linha cada)
-        story.append(Spacer(1, 3*mm))
-        story.append(Paragraph(f"<b>Mitigação:</b> {risco.get('mitigacao', 'N/A')}", mitigacao_style))
-        story.append(Paragraph(f"<b>Correção:</b> {risco.get('correcao', 'N/A')}", mitigacao_style))
-        
-        # Adicionar quebra de página a cada 3 riscos para melhor legibilidade
-        if (i + 1) % 3 == 0 and i < len(riscos_selecionados) - 1:
-            story.append(PageBreak())
-    
-    # Gerar o PDF
-    doc.build(story)
-    
-    # Retornar o buffer
-    buffer.seek(0)
-    return buffer
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+# Lotes de PDFs são renderizados em processos (um SimpleDocTemplate.build por
+# núcleo). O pool é criado no primeiro lote, depois de importar o ReportLab,
+# para que processos criados por fork já o tenham carregado. Com
+# RISCOS_PDF_PROCESSOS=0, ou onde não houver multiprocessing (ex.: funções
+# serverless sem /dev/shm), o lote é renderizado na própria thread.
+PROCESSOS_PDF = int(os.environ.get("RISCOS_PDF_PROCESSOS", os.cpu_count() or 1))
+LOTE_PDF_MAXIMO = int(os.environ.get("RISCOS_LOTE_PDF_MAXIMO", 100))
+# PDFs avulsos também no pool (ex.: no modo ASGI, para não travar o laço de eventos)
+PDF_EM_PROCESSO = os.environ.get("RISCOS_PDF_EM_PROCESSO") == "1"
+_pool_pdf = None
+_lock_pool_pdf = threading.Lock()
+
+def pool_pdf():
+    """Pool de processos para lotes de PDF, ou None se indisponível."""
+    global _pool_pdf, PROCESSOS_PDF
+    with _lock_pool_pdf:
+        if _pool_pdf is None and PROCESSOS_PDF > 0:
+            modulo_pdf()
+            # Importado aqui: concurrent.futures custa ~20 ms na partida a frio
+            from concurrent.futures import ProcessPoolExecutor
+            try:
+                _pool_pdf = ProcessPoolExecutor(max_workers=PROCESSOS_PDF)
+            except (OSError, NotImplementedError, ImportError) as e:
+                print(f"AVISO: pool de processos indisponível, lotes de PDF serão renderizados em thread: {e}")
+                PROCESSOS_PDF = 0
+        return _pool_pdf
+
+# Ordem cronológica das fases, usada como critério de desempate na ordenação
+FASE_ORDEM = {
+    'Preliminar à Licitação': 1,
+    'Planejamento da Contratação': 2,
+    'Externa da Licitação': 3,
+    'Contratual (Execução)': 4,
+    'Posterior à Contratação': 5
+}
+
+def ordenar_riscos(risco):
+    """Chave de ordenação: nível de risco (mais críticos primeiro) + fase."""
+    return (-risco.get('nivel_risco', 0), FASE_ORDEM.get(risco.get('fase', ''), 6))
 
 def mapear_tipo_obra(forca, tipo_unidade):
     """Mapeia a combinação força + unidade para tipo de obra."""
-    if forca == 'Polícia Penal':
-        if tipo_unidade in ['Casa de Custódia', 'Penitenciária']:
-            return 'presidios'
-    elif forca == 'Polícia Civil':
-        if 'Delegacia' in tipo_unidade:
-            return 'delegacias'
-    elif forca in ['Corpo de Bombeiros Militar', 'Polícia Militar']:
-        if tipo_unidade in ['Pelotão', 'Companhia', 'Companhia Independente', 'Batalhão', 'Comando Regional']:
-            return 'quarteis'
-    elif forca == 'Polícia Científica':
-        if tipo_unidade in ['UETC Básica', 'Posto Avançado']:
-            return 'centros_treinamento'
-        elif tipo_unidade == 'UETC Intermediária':
-            return 'centrais_operacionais'
-    
-    return None
+    return REGRAS_COMPILADAS['tipo_obra_por_unidade'].get((forca, tipo_unidade))
 
-def ajustar_riscos_por_tamanho(riscos_ids, tamanho_info, debug_logic):
-    """Ajusta a lista de riscos baseado no tamanho e complexidade do empreendimento."""
-    categoria = tamanho_info.get('categoria', 'medio')
-    complexidade = tamanho_info.get('complexidade', 'media')
-    area = tamanho_info.get('area', 0)
-    
-    riscos_adicionar = set()
-    riscos_remover = set()
-    
-    # Ajustes por categoria de tamanho
-    if categoria == 'pequeno':
-        # Obras pequenas - reduzir complexidade
-        riscos_remover.update([1, 4, 23, 37, 46, 56, 73])
-        debug_logic.append(f"- Riscos de alta complexidade (obra pequena: {area} m²)")
-        
-    elif categoria == 'medio':
-        # Obras médias - complexidade moderada
-        riscos_adicionar.update([37])  # Fiscalização adequada
-        debug_logic.append(f"+ Fiscalização adequada (obra média: {area} m²)")
-        
-    elif categoria == 'grande':
-        # Obras grandes - mais complexidade
-        riscos_adicionar.update([1, 23, 37, 56])
-        debug_logic.append(f"+ Riscos de alta complexidade (obra grande: {area} m²)")
-        
-    elif categoria == 'muito_grande':
-        # Obras muito grandes - máxima complexidade
-        riscos_adicionar.update([1, 4, 9, 23, 37, 46, 56, 73, 78, 79])
-        debug_logic.append(f"+ Riscos de máxima complexidade (obra muito grande: {area} m²)")
-    
-    # Ajustes por complexidade específica
-    if complexidade == 'muito_alta':
-        riscos_adicionar.update([1, 9, 23, 37, 46])
-        debug_logic.append("+ Riscos de complexidade muito alta")
-    elif complexidade == 'alta':
-        riscos_adicionar.update([23, 37])
-        debug_logic.append("+ Riscos de alta complexidade")
-    elif complexidade == 'baixa':
-        riscos_remover.update([1, 4, 9, 23])
-        debug_logic.append("- Riscos desnecessários (baixa complexidade)")
-    
-    # Ajustes específicos para investimentos altos (Delegacias)
-    investimento = tamanho_info.get('investimento', 0)
-    if investimento > 10000000:  # Acima de 10 milhões
-        riscos_adicionar.update([56, 70, 73])  # Riscos financeiros e de custeio
-        debug_logic.append(f"+ Riscos financeiros (investimento: R$ {investimento:,.2f})")
-    
-    # Ajustes para obras com múltiplos pavimentos
-    pavimentos = tamanho_info.get('pavimentos', 1)
-    if pavimentos > 1:
-        riscos_adicionar.update([62, 77])  # Riscos estruturais e de compatibilização
-        debug_logic.append(f"+ Riscos estruturais ({pavimentos} pavimentos)")
-    
-    # Aplicar ajustes
-    riscos_ids.update(riscos_adicionar)
-    riscos_ids.difference_update(riscos_remover)
-    
-    return riscos_ids
+# Milhares separados por ponto sem parte decimal (ex.: 1.500.000)
+MILHARES_COM_PONTO = re.compile(r'\d{1,3}(\.\d{3})+')
 
-def ajustar_riscos_por_especialidade(riscos_ids, tipo_unidade, tamanho_info, debug_logic):
-    """Adiciona riscos específicos baseados no tipo de unidade e suas especialidades."""
+def interpretar_valor(valor):
+    """
+    Converte o valor estimado em reais. Aceita números, texto no formato
+    brasileiro ('R$ 1.500.000', '1.500.000,00') e as faixas do frontend
+    ('ate-50k', '500k-1.5m', 'acima-5m'): faixas fechadas usam o limite
+    superior e 'acima-' fica logo acima do limite informado. Valores
+    negativos, não finitos ou ilegíveis retornam None.
+    """
+    if isinstance(valor, bool) or valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+        return numero if math.isfinite(numero) and numero >= 0 else None
     
-    # Polícia Penal - riscos de segurança baseados no tipo
-    if tipo_unidade == 'Penitenciária':
-        riscos_ids.update([10, 12, 13, 15, 30, 49, 70, 71])  # Segurança máxima
-        debug_logic.append("+ Riscos de segurança máxima (Penitenciária)")
-    elif tipo_unidade == 'Casa de Custódia':
-        riscos_ids.update([10, 12, 25, 38])  # Segurança alta, funcionamento
-        debug_logic.append("+ Riscos de alta segurança (Casa de Custódia)")
+    texto = str(valor).strip().lower().replace('r$', '').replace(' ', '').replace('\xa0', '')
+    if not texto or texto.startswith('-'):
+        return None
+    if ',' in texto:
+        # Formato brasileiro: 1.500.000,00
+        texto = texto.replace('.', '').replace(',', '.')
+    elif MILHARES_COM_PONTO.fullmatch(texto):
+        texto = texto.replace('.', '')
+    acima = texto.startswith('acima')
+    partes = [p for p in texto.replace('acima', '').replace('até', '').replace('ate', '').split('-') if p]
+    if not partes:
+        return None
     
-    # Delegacias - riscos baseados no padrão
-    elif 'Padrão IA' in tipo_unidade:
-        # Menor complexidade
-        riscos_ids.difference_update([1, 4, 23, 37, 46])
-        debug_logic.append("- Complexidade reduzida (Padrão IA)")
-    elif 'Padrão I' in tipo_unidade and 'IA' not in tipo_unidade:
-        # Complexidade média
-        debug_logic.append("Padrão I - complexidade padrão")
-    elif 'Padrão II' in tipo_unidade:
-        # 2 pavimentos - mais complexidade
-        riscos_ids.update([23, 37, 62, 77])
-        debug_logic.append("+ Riscos de múltiplos pavimentos (Padrão II)")
-    elif 'Padrão III' in tipo_unidade:
-        # 3 pavimentos - alta complexidade
-        riscos_ids.update([1, 4, 23, 37, 46, 62, 77])
-        debug_logic.append("+ Alta complexidade (Padrão III - 3 pavimentos)")
+    limite = partes[-1]
+    multiplicador = 1
+    if limite.endswith('k'):
+        limite, multiplicador = limite[:-1], 1000
+    elif limite.endswith('m'):
+        limite, multiplicador = limite[:-1], 1000000
+    try:
+        numero = float(limite) * multiplicador
+    except ValueError:
+        return None
+    if not math.isfinite(numero) or numero < 0:
+        return None
+    return numero + 0.01 if acima else numero
+
+def compilar_tabela(motor, tabela, rotulo, indexar_por_nome=True):
+    """Compila uma tabela do JSON em {nome (ou chave): Regra}."""
+    regras = {}
+    for chave, entrada in tabela.items():
+        nome = entrada.get('nome', chave)
+        regras[nome if indexar_por_nome else chave] = compilar_entrada(motor, entrada, f"{rotulo} {nome}")
+    return regras
+
+def compilar_entrada(motor, entrada, rotulo, **formato):
+    """Compila uma entrada de tabela do JSON em uma Regra do motor."""
+    incluir = entrada.get('riscos_especificos', [])
+    remover = entrada.get('riscos_reduzidos', [])
+    mensagem = entrada.get('debug')
+    if mensagem:
+        mensagem = mensagem.format(**formato)
+    else:
+        partes = [f"+{len(incluir)} riscos"] if incluir else []
+        if remover:
+            partes.append(f"-{len(remover)} riscos")
+        mensagem = f"{rotulo}: {' / '.join(partes) or 'sem ajustes'}"
+    return motor.regra(incluir, remover, [mensagem])
+
+def compilar_regras_unidade(motor, database, tipo_unidade, tamanho_info):
+    """Compila porte + especialidade da unidade em uma única regra."""
+    ajustes_porte = database.get('ajustes_porte', {})
+    ajustes_unidade = database.get('ajustes_unidade', {})
+    formato = {
+        'area': tamanho_info.get('area', 0),
+        'investimento': tamanho_info.get('investimento', 0),
+        'pavimentos': tamanho_info.get('pavimentos', 1)
+    }
     
-    # CBMPR e PMPR - Comando Regional (só estrutura administrativa)
-    elif tipo_unidade == 'Comando Regional':
-        riscos_ids.difference_update([1, 4, 9, 23])  # Reduzir complexidade significativamente
-        debug_logic.append("- Complexidade reduzida (Comando Regional - estrutura administrativa)")
+    # Ajustes por porte: todas as inclusões antes de todas as reduções
+    entradas_porte = [
+        ajustes_porte.get('categoria', {}).get(tamanho_info.get('categoria', 'medio')),
+        ajustes_porte.get('complexidade', {}).get(tamanho_info.get('complexidade', 'media'))
+    ]
+    investimento_alto = ajustes_porte.get('investimento_alto')
+    if investimento_alto and formato['investimento'] > investimento_alto.get('limite_inferior', float('inf')):
+        entradas_porte.append(investimento_alto)
+    if formato['pavimentos'] > 1:
+        entradas_porte.append(ajustes_porte.get('multiplos_pavimentos'))
+    regra_porte = motor.unir(*[
+        compilar_entrada(motor, entrada, 'Porte', **formato) for entrada in entradas_porte if entrada
+    ])
     
-    # Polícia Científica - riscos técnicos
-    elif tipo_unidade == 'UETC Intermediária':
-        riscos_ids.update([2, 14, 18, 63])  # Sistemas especializados
-        debug_logic.append("+ Sistemas técnicos especializados (UETC Intermediária)")
-    elif tipo_unidade == 'UETC Básica':
-        riscos_ids.difference_update([1, 4])  # Menos complexidade
-        debug_logic.append("- Complexidade reduzida (UETC Básica)")
-    elif tipo_unidade == 'Posto Avançado':
-        riscos_ids.difference_update([1, 4, 9, 23])  # Muito simples
-        debug_logic.append("- Obra simples (Posto Avançado)")
+    # Ajustes por especialidade da unidade, aplicados em sequência
+    entradas_unidade = [
+        ajustes_unidade.get('especialidade', {}).get(tipo_unidade),
+        ajustes_unidade.get('complexidade_seguranca', {}).get(tamanho_info.get('complexidade_seguranca')),
+        ajustes_unidade.get('complexidade_tecnica', {}).get(tamanho_info.get('complexidade_tecnica'))
+    ]
+    return motor.compor(regra_porte, *[
+        compilar_entrada(motor, entrada, 'Unidade', **formato) for entrada in entradas_unidade if entrada
+    ])
+
+def indexar_colunas(motor, riscos):
+    """Visão colunar do catálogo na ordem de bits do motor (rótulos na ordem do JSON)."""
+    ordenados = motor.riscos_por_bit
+    colunar = CatalogoColunar(len(ordenados))
+    for coluna in ('fase', 'categoria', 'responsavel'):
+        colunar.adicionar_coluna(
+            coluna,
+            [r.get(coluna, 'Não informado') for r in ordenados],
+            ordem_rotulos=[r.get(coluna, 'Não informado') for r in riscos]
+        )
+    colunar.adicionar_coluna(
+        'nivel',
+        [classificar_nivel(r.get('nivel_risco', 0)) for r in ordenados],
+        ordem_rotulos=('extremo', 'alto', 'moderado', 'baixo')
+    )
+    colunar.adicionar_grupos('grupo_fase', 'fase', {
+        'preliminar': lambda fase: 'Preliminar' in fase,
+        'planejamento': lambda fase: 'Planejamento' in fase,
+        'licitacao': lambda fase: 'Licitação' in fase or 'Externa' in fase,
+        'execucao': lambda fase: 'Execução' in fase or 'Contratual' in fase,
+        'posterior': lambda fase: 'Posterior' in fase
+    })
+    # Célula (probabilidade, impacto) da matriz 5×5
+    colunar.adicionar_coluna(
+        'celula_matriz',
+        [(r.get('probabilidade', 0), r.get('impacto_nivel', 0)) for r in ordenados]
+    )
+    for coluna in ('nivel_risco', 'probabilidade', 'impacto_nivel'):
+        colunar.adicionar_numerica(coluna, [r.get(coluna, 0) for r in ordenados])
+    return colunar
+
+def compilar_regras(database):
+    """
+    Compila as tabelas de regras do JSON (tipos_obra, ajustes_porte, ajustes_unidade,
+    tipos_intervencao, regimes_execucao, faixas_valor e caracteristicas_especiais)
+    sobre o espaço de bits da base carregada.
+    """
+    motor = MotorSelecao(database.get('riscos', []), chave_ordenacao=ordenar_riscos, codificador=codificar)
     
-    # Complexidade por segurança
-    complexidade_seguranca = tamanho_info.get('complexidade_seguranca')
-    if complexidade_seguranca == 'maxima':
-        riscos_ids.update([10, 12, 13, 15, 30, 49, 70, 71])
-        debug_logic.append("+ Riscos de segurança máxima")
-    elif complexidade_seguranca == 'alta':
-        riscos_ids.update([10, 12, 25, 38])
-        debug_logic.append("+ Riscos de alta segurança")
+    tipo_obra_por_unidade = {}
+    for chave, info in database.get('tipos_obra', {}).items():
+        for forca, unidades in info.get('unidades', {}).items():
+            for tipo_unidade in unidades:
+                tipo_obra_por_unidade[(forca, tipo_unidade)] = chave
     
-    # Complexidade técnica
-    complexidade_tecnica = tamanho_info.get('complexidade_tecnica')
-    if complexidade_tecnica == 'media':
-        riscos_ids.update([2, 14, 18])
-        debug_logic.append("+ Riscos de sistemas técnicos")
+    # Faixas de valor ordenadas pelo limite superior (None = sem limite)
+    faixas = sorted(
+        database.get('faixas_valor', {}).items(),
+        key=lambda item: float('inf') if item[1].get('limite_superior') is None else item[1]['limite_superior']
+    )
     
-    return riscos_ids
+    return {
+        'motor': motor,
+        'colunar': indexar_colunas(motor, database.get('riscos', [])),
+        'campos': frozenset(campo for risco in database.get('riscos', []) for campo in risco),
+        'ids_por_bit': [risco.get('id') for risco in motor.riscos_por_bit],
+        'tipo_obra_por_unidade': tipo_obra_por_unidade,
+        'tipos_obra': {
+            chave: motor.mascara(info.get('riscos_especificos', []))
+            for chave, info in database.get('tipos_obra', {}).items()
+        },
+        'unidades': {
+            tipo_unidade: compilar_regras_unidade(motor, database, tipo_unidade, tamanho_info)
+            for tipo_unidade, tamanho_info in TAMANHOS_POR_UNIDADE.items()
+        },
+        'unidade_padrao': compilar_regras_unidade(motor, database, None, obter_tamanho_info(None)),
+        'intervencoes': compilar_tabela(motor, database.get('tipos_intervencao', {}), 'Intervenção'),
+        'regimes': compilar_tabela(motor, database.get('regimes_execucao', {}), 'Regime'),
+        'faixas_limites': [
+            float('inf') if info.get('limite_superior') is None else info['limite_superior']
+            for _, info in faixas
+        ],
+        'faixas_chaves': [chave for chave, _ in faixas],
+        'faixas': compilar_tabela(motor, dict(faixas), 'Faixa de valor', indexar_por_nome=False),
+        'caracteristicas': compilar_tabela(motor, database.get('caracteristicas_especiais', {}), 'Característica')
+    }
 
-# Função auxiliar para processar critérios avançados baseados nos dados do CEA + tamanhos
-def processar_criterios_cea(project_data):
+def resolver_faixa_valor(valor):
+    """Resolve o valor estimado para a chave da faixa em faixas_valor (busca binária nos limites)."""
+    numero = interpretar_valor(valor)
+    limites = REGRAS_COMPILADAS['faixas_limites']
+    if numero is None or not limites:
+        return None
+    indice = bisect_left(limites, numero)
+    return REGRAS_COMPILADAS['faixas_chaves'][min(indice, len(limites) - 1)]
+
+REGRAS_COMPILADAS = compilar_regras(RISK_DATABASE)
+_marco = registrar_etapa("construcao_indices", _marco)
+
+# Dados da análise CEA para contextualização
+CEA_STATS = {
+    'total_obras': 557,
+    'distribuicao_tipos': {
+        'Construção': 191,  # 34.3%
+        'Reparos': 172,     # 30.9% 
+        'Reforma': 167      # 30.0%
+    },
+    'distribuicao_forcas': {
+        'CBMPR': 161,       # 28.9%
+        'PCPR': 136,        # 24.4%
+        'DEPPEN': 106,      # 19.0%
+        'PMPR': 97,         # 17.4%
+        'PCP': 50           # 9.0%
+    }
+}
+
+# Cache de resultados por critérios canônicos (LRU) e tabela opcional pré-computada na carga
+CACHE_RESULTADOS = CacheLRU(int(os.environ.get("RISCOS_CACHE_TAMANHO", 512)))
+RESULTADOS_PRECOMPUTADOS = {}
+
+def normalizar_ids(ids):
+    """IDs inteiros conhecidos pela base, sem repetição e em ordem crescente."""
+    if not isinstance(ids, (list, tuple, set)):
+        return ()
+    bit_por_id = REGRAS_COMPILADAS['motor'].bit_por_id
+    return tuple(sorted({i for i in ids if isinstance(i, int) and not isinstance(i, bool) and i in bit_por_id}))
+
+def canonicalizar_criterios(project_data):
     """
-    Processa os critérios avançados baseados na análise real dos dados do CEA (557 obras)
-    e nas especificações de tamanho dos empreendimentos.
+    Reduz os critérios do projeto a uma tupla canônica: o valor vira a chave da
+    faixa, as características conhecidas são ordenadas e os IDs normalizados.
+    Critérios que não alteram a seleção geram a mesma chave.
     """
-    todos_os_riscos = RISK_DATABASE.get('riscos', [])
-    tipos_obra = RISK_DATABASE.get('tipos_obra', {})
+    def texto(campo):
+        valor = project_data.get(campo)
+        return valor if isinstance(valor, str) else None
     
-    # Extrair critérios do frontend
-    forca = project_data.get('forca')
-    tipo_unidade = project_data.get('tipoUnidade')
-    tipo_intervencao = project_data.get('tipoIntervencao')
-    regime_execucao = project_data.get('regimeExecucao')
-    valor = project_data.get('valor')
-    caracteristicas = project_data.get('caracteristicas', [])
-    additional_risks = project_data.get('additional_risks', [])
-    excluded_risks = project_data.get('excluded_risks', [])
-    debug_logic = project_data.get('debug_logic', [])
+    caracteristicas = project_data.get('caracteristicas') or []
+    conhecidas = REGRAS_COMPILADAS['caracteristicas']
+    return (
+        texto('forca'),
+        texto('tipoUnidade'),
+        texto('tipoIntervencao'),
+        texto('regimeExecucao'),
+        resolver_faixa_valor(project_data.get('valor')),
+        tuple(sorted({c for c in caracteristicas if isinstance(c, str) and c in conhecidas})),
+        normalizar_ids(project_data.get('additional_risks')),
+        normalizar_ids(project_data.get('excluded_risks'))
+    )
+
+def regras_aplicaveis(criterios):
+    """Etapas da seleção, em ordem: (nome da etapa, regra compilada ou None)."""
+    _, tipo_unidade, tipo_intervencao, regime_execucao, faixa_valor, caracteristicas, _, _ = criterios
+    regras = REGRAS_COMPILADAS
+    return (
+        # 2-3. Ajustar riscos por tamanho, complexidade e especialidade da unidade (compilados em uma regra)
+        ('porte_especialidade', regras['unidades'].get(tipo_unidade, regras['unidade_padrao'])),
+        # 4. Riscos por tipo de intervenção
+        ('intervencao', regras['intervencoes'].get(tipo_intervencao)),
+        # 5. Riscos por regime de execução
+        ('regime', regras['regimes'].get(regime_execucao)),
+        # 6. Riscos por faixa de valor
+        ('faixa_valor', regras['faixas'].get(faixa_valor)),
+        # 7. Riscos por características especiais (independentes da ordem informada)
+        ('caracteristicas', regras['motor'].unir(*[regras['caracteristicas'][c] for c in caracteristicas]))
+    )
+
+def montar_debug_logic(criterios):
+    """Explicação passo a passo da seleção (montada só quando o cliente pede debug)."""
+    forca, tipo_unidade = criterios[0], criterios[1]
+    tamanho_info = obter_tamanho_info(tipo_unidade)
+    debug_logic = [
+        f"Unidade: {tipo_unidade}",
+        f"Tamanho identificado: {tamanho_info.get('categoria')} ({tamanho_info.get('area', 'N/A')} m²)",
+        f"Mapeamento: {forca} + {tipo_unidade} → {mapear_tipo_obra(forca, tipo_unidade)}"
+    ]
+    for _, regra in regras_aplicaveis(criterios):
+        if regra is not None:
+            debug_logic.extend(regra.mensagens)
+    return debug_logic
+
+def calcular_selecao(criterios, rastro=RASTRO_INATIVO):
+    """Executa a seleção de riscos para uma tupla de critérios canônicos."""
+    forca, tipo_unidade, tipo_intervencao, regime_execucao, faixa_valor, caracteristicas, additional_risks, excluded_risks = criterios
+    regras = REGRAS_COMPILADAS
+    motor = regras['motor']
+    rastro.retomar()
     
     # Obter informações de tamanho
     tamanho_info = obter_tamanho_info(tipo_unidade)
-    debug_logic.append(f"Unidade: {tipo_unidade}")
-    debug_logic.append(f"Tamanho identificado: {tamanho_info.get('categoria')} ({tamanho_info.get('area', 'N/A')} m²)")
-    
-    # Dados da análise CEA para contextualização
-    cea_stats = {
-        'total_obras': 557,
-        'distribuicao_tipos': {
-            'Construção': 191,  # 34.3%
-            'Reparos': 172,     # 30.9% 
-            'Reforma': 167      # 30.0%
-        },
-        'distribuicao_forcas': {
-            'CBMPR': 161,       # 28.9%
-            'PCPR': 136,        # 24.4%
-            'DEPPEN': 106,      # 19.0%
-            'PMPR': 97,         # 17.4%
-            'PCP': 50           # 9.0%
-        }
-    }
-    
-    # Log detalhado para debug
-    print(f"=== PROCESSAMENTO BASEADO EM DADOS CEA + TAMANHOS ===")
-    print(f"Projeto: {forca} - {tipo_unidade}")
-    print(f"Tamanho: {tamanho_info.get('categoria')} ({tamanho_info.get('area')} m²)")
-    print(f"Complexidade: {tamanho_info.get('complexidade')}")
     
     # 1. Começar com riscos base do tipo de obra
-    riscos_selecionados_ids = set()
-    
-    # Mapear tipo de obra
     tipo_obra_chave = mapear_tipo_obra(forca, tipo_unidade)
-    debug_logic.append(f"Mapeamento: {forca} + {tipo_unidade} → {tipo_obra_chave}")
-    
-    if tipo_obra_chave and tipo_obra_chave in tipos_obra:
-        riscos_base = tipos_obra[tipo_obra_chave].get("riscos_especificos", [])
-        riscos_selecionados_ids.update(riscos_base)
-        print(f"Riscos base para {tipo_obra_chave}: {len(riscos_base)}")
-    
-    # 2. Ajustar riscos por tamanho e complexidade
-    riscos_selecionados_ids = ajustar_riscos_por_tamanho(riscos_selecionados_ids, tamanho_info, debug_logic)
-    
-    # 3. Ajustar riscos por especialidade da unidade
-    riscos_selecionados_ids = ajustar_riscos_por_especialidade(riscos_selecionados_ids, tipo_unidade, tamanho_info, debug_logic)
+    selecao = regras['tipos_obra'].get(tipo_obra_chave, 0)
+    rastro.marcar('mapeamento')
     
-    # 4. Adicionar riscos por tipo de intervenção
-    if tipo_intervencao == 'Construção':
-        riscos_selecionados_ids.update([1, 9, 21, 22, 54, 55, 58])
-        debug_logic.append('+ Riscos de construção nova (34.3% das obras CEA)')
-    elif tipo_intervencao == 'Reforma':
-        riscos_selecionados_ids.update([25, 29, 38, 44, 59, 68, 77])
-        debug_logic.append('+ Riscos de reforma (30% das obras CEA)')
-    elif tipo_intervencao == 'Reparos':
-        riscos_selecionados_ids.update([11, 28, 32, 60])
-        riscos_selecionados_ids.difference_update([1, 4, 9, 51])
-        debug_logic.append('+ Riscos de reparos (30.9% das obras CEA) / - Riscos de planejamento complexo')
+    # 2-7. Regras de porte/especialidade, intervenção, regime, faixa de valor e características
+    for etapa, regra in regras_aplicaveis(criterios):
+        if regra is not None:
+            selecao = regra.aplicar(selecao)
+        rastro.marcar(etapa)
     
-    # 5. Adicionar riscos por regime de execução
-    if regime_execucao == 'Empreitada por preço global':
-        riscos_selecionados_ids.update([3, 5, 8, 53, 67])
-        debug_logic.append('+ Riscos de preço global')
-    elif regime_execucao == 'Empreitada por preço unitário':
-        riscos_selecionados_ids.update([20, 40, 64, 72])
-        debug_logic.append('+ Riscos de preço unitário')
-    elif regime_execucao == 'Contratação integrada':
-        riscos_selecionados_ids.update([1, 2, 23, 37, 51, 52])
-        debug_logic.append('+ Riscos de contratação integrada')
-    elif regime_execucao == 'Contratação semi-integrada':
-        riscos_selecionados_ids.update([1, 23, 37, 51])
-        debug_logic.append('+ Riscos de contratação semi-integrada')
-    elif regime_execucao == 'Empreitada integral':
-        riscos_selecionados_ids.update([1, 9, 28, 42, 51, 76])
-        debug_logic.append('+ Riscos de empreitada integral')
-    elif regime_execucao == 'Contratação por tarefa':
-        riscos_selecionados_ids.difference_update([1, 4, 9, 51, 52])
-        debug_logic.append('- Riscos de alta complexidade (tarefa)')
+    # 8-9. Riscos adicionais e excluídos do frontend
+    selecao = (selecao | motor.mascara(additional_risks)) & ~motor.mascara(excluded_risks)
+    rastro.marcar('filtro')
     
-    # 6. Adicionar riscos por características especiais
-    for caracteristica in caracteristicas:
-        if caracteristica == 'Obra em unidade em funcionamento':
-            riscos_selecionados_ids.update([25, 38, 59, 68])
-            debug_logic.append('+ Riscos de obra em funcionamento')
-        elif caracteristica == 'Necessita licenciamento ambiental':
-            riscos_selecionados_ids.update([9, 36, 55, 69])
-            debug_logic.append('+ Riscos ambientais')
-        elif caracteristica == 'Área de segurança máxima':
-            riscos_selecionados_ids.update([10, 12, 13, 15, 58, 70, 71])
-            debug_logic.append('+ Riscos de segurança máxima')
-        elif caracteristica == 'Integração com sistemas existentes':
-            riscos_selecionados_ids.update([14, 29, 34, 44, 65, 77])
-            debug_logic.append('+ Riscos de integração')
-        elif caracteristica == 'Demolição de estruturas':
-            riscos_selecionados_ids.update([19, 36, 66, 75])
-            debug_logic.append('+ Riscos de demolição')
-        elif caracteristica == 'Obra em área urbana densamente povoada':
-            riscos_selecionados_ids.update([36, 47])
-            debug_logic.append('+ Riscos de obra em área urbana')
-        elif caracteristica == 'Necessita relocação temporária':
-            riscos_selecionados_ids.update([25, 38, 47])
-            debug_logic.append('+ Riscos de relocação temporária')
-    
-    # 7. Adicionar riscos adicionais do frontend
-    riscos_selecionados_ids.update(additional_risks)
-    
-    # 8. Remover riscos excluídos do frontend
-    riscos_selecionados_ids.difference_update(excluded_risks)
-    
-    # 9. Filtrar a lista de riscos pelos IDs selecionados
-    riscos_finais = [
-        risco for risco in todos_os_riscos 
-        if risco.get("id") in riscos_selecionados_ids
-    ]
-    
-    # 10. Ordenar por nível de risco (mais críticos primeiro) + fase
-    def ordenar_riscos(risco):
-        nivel = risco.get('nivel_risco', 0)
-        fase_ordem = {
-            'Preliminar à Licitação': 1, 
-            'Planejamento da Contratação': 2, 
-            'Externa da Licitação': 3, 
-            'Contratual (Execução)': 4, 
-            'Posterior à Contratação': 5
-        }
-        fase = fase_ordem.get(risco.get('fase', ''), 6)
-        return (-nivel, fase)
-    
-    riscos_finais.sort(key=ordenar_riscos)
+    # 10. Riscos selecionados, já na ordem de nível de risco (mais críticos primeiro) + fase
+    riscos_finais = motor.selecionar(selecao)
+    fragmentos = motor.fragmentos(selecao)
+    rastro.marcar('ordenacao')
     
     # 11. Preparar resposta com metadados CEA + tamanho
-    response_data = {
+    return {
         "selected_risks": riscos_finais,
+        "selected_risks_fragments": fragmentos,
+        "selected_mask": selecao,
         "selection_metadata": {
             "tipo_obra_base": tipo_obra_chave,
+            "faixa_valor": faixa_valor,
             "tamanho_info": tamanho_info,
             "total_risks_selected": len(riscos_finais),
             "additional_risks_count": len(additional_risks),
             "excluded_risks_count": len(excluded_risks),
-            "debug_logic": debug_logic,
             "cea_context": {
-                "total_obras_analisadas": cea_stats['total_obras'],
-                "relevancia_tipo": cea_stats['distribuicao_tipos'].get(tipo_intervencao, 0),
-                "relevancia_forca": cea_stats['distribuicao_forcas'].get(FORCE_MAPPING.get(forca, ''), 0)
-            },
-            "risk_distribution": {
-                "extremo": len([r for r in riscos_finais if r.get('nivel_risco', 0) >= 15]),
-                "alto": len([r for r in riscos_finais if 8 <= r.get('nivel_risco', 0) < 15]),
-                "moderado": len([r for r in riscos_finais if 3 <= r.get('nivel_risco', 0) < 8]),
-                "baixo": len([r for r in riscos_finais if r.get('nivel_risco', 0) < 3])
+                "total_obras_analisadas": CEA_STATS['total_obras'],
+                "relevancia_tipo": CEA_STATS['distribuicao_tipos'].get(tipo_intervencao, 0),
+                "relevancia_forca": CEA_STATS['distribuicao_forcas'].get(FORCE_MAPPING.get(forca, ''), 0)
             },
-            "phases_distribution": {
-                "preliminar": len([r for r in riscos_finais if 'Preliminar' in r.get('fase', '')]),
-                "planejamento": len([r for r in riscos_finais if 'Planejamento' in r.get('fase', '')]),
-                "licitacao": len([r for r in riscos_finais if 'Licitação' in r.get('fase', '') or 'Externa' in r.get('fase', '')]),
-                "execucao": len([r for r in riscos_finais if 'Execução' in r.get('fase', '') or 'Contratual' in r.get('fase', '')]),
-                "posterior": len([r for r in riscos_finais if 'Posterior' in r.get('fase', '')])
-            }
+            "risk_distribution": regras['colunar'].distribuicao('nivel', selecao, incluir_zeros=True),
+            "phases_distribution": regras['colunar'].distribuicao('grupo_fase', selecao, incluir_zeros=True)
         }
     }
+
+def obter_selecao(criterios, rastro=RASTRO_INATIVO):
+    """Resultado da seleção para critérios canônicos: tabela pré-computada, cache LRU ou cálculo."""
+    origem = 'precomputada'
+    resultado = RESULTADOS_PRECOMPUTADOS.get(criterios)
+    if resultado is None:
+        origem = 'cache'
+        resultado = CACHE_RESULTADOS.obter(criterios)
+        if resultado is None:
+            origem = 'calculada'
+            resultado = calcular_selecao(criterios, rastro)
+            CACHE_RESULTADOS.guardar(criterios, resultado)
+    rastro.anotar(selecao=origem)
+    METRICA_SELECAO_RISCOS.observar(len(resultado["selected_risks"]), origem)
+    return resultado
+
+def precomputar_resultados(max_caracteristicas=0):
+    """
+    Materializa o resultado de todas as combinações válidas de força/unidade,
+    intervenção, regime e faixa de valor, com subconjuntos de até
+    `max_caracteristicas` características especiais.
+    """
+    regras = REGRAS_COMPILADAS
+    subconjuntos = [
+        combinacao
+        for tamanho in range(max_caracteristicas + 1)
+        for combinacao in combinations(sorted(regras['caracteristicas']), tamanho)
+    ]
+    for forca, tipo_unidade in regras['tipo_obra_por_unidade']:
+        for tipo_intervencao in regras['intervencoes']:
+            for regime_execucao in regras['regimes']:
+                for faixa_valor in regras['faixas']:
+                    for caracteristicas in subconjuntos:
+                        criterios = (forca, tipo_unidade, tipo_intervencao, regime_execucao,
+                                     faixa_valor, caracteristicas, (), ())
+                        RESULTADOS_PRECOMPUTADOS[criterios] = calcular_selecao(criterios)
+    return len(RESULTADOS_PRECOMPUTADOS)
+
+if os.environ.get("RISCOS_PRECOMPUTAR") == "1" and RISK_DATABASE:
+    print(f"Resultados pré-computados: {precomputar_resultados(int(os.environ.get('RISCOS_PRECOMPUTAR_MAX_CARACTERISTICAS', 0)))}")
+    _marco = registrar_etapa("precomputacao", _marco)
+registrar_etapa("total", INICIO_PROCESSO)
+
+if os.environ.get("RISCOS_PREAQUECER_PDF") == "1":
+    threading.Thread(target=modulo_pdf, name="preaquecer-pdf", daemon=True).start()
+
+# Função auxiliar para processar critérios avançados baseados nos dados do CEA + tamanhos
+def processar_criterios_cea(project_data, debug=False, rastro=RASTRO_INATIVO):
+    """
+    Processa os critérios avançados baseados na análise real dos dados do CEA (557 obras)
+    e nas especificações de tamanho dos empreendimentos. Com `debug`, os
+    metadados trazem debug_logic: o recebido do frontend seguido do passo a
+    passo da seleção.
+    """
+    criterios = canonicalizar_criterios(project_data)
+    resultado = obter_selecao(criterios, rastro)
+    rastro.anotar(projeto=f"{criterios[0]} - {criterios[1]}", total_riscos=len(resultado["selected_risks"]))
+    if not debug:
+        return resultado
     
-    return response_data
+    # O resultado em cache é compartilhado: o debug vai em uma lista nova
+    debug_logic = project_data.get('debug_logic')
+    debug_logic = list(debug_logic) if isinstance(debug_logic, list) else []
+    debug_logic.extend(montar_debug_logic(criterios))
+    return {
+        **resultado,
+        "selection_metadata": {**resultado["selection_metadata"], "debug_logic": debug_logic}
+    }
+
+def fragmento_risco(risco):
+    """Fragmento JSON pré-codificado do risco (codifica na hora se não estiver indexado)."""
+    motor = REGRAS_COMPILADAS['motor']
+    if motor.risco_por_id.get(risco.get('id')) is risco:
+        return motor.fragmento_por_id[risco.get('id')]
+    return codificar(risco)
+
+def resposta_json(corpo, status=200):
+    """Resposta HTTP para um corpo JSON já codificado em bytes."""
+    return app.response_class(corpo, status=status, mimetype='application/json')
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -686,6 +825,24 @@ def health_check():
             "delegacia_patterns": 4,
             "data_base": "2025-05-29"
         },
+        "cache_resultados": {
+            **CACHE_RESULTADOS.estatisticas(),
+            "precomputados": len(RESULTADOS_PRECOMPUTADOS)
+        },
+        "cache_pdf": CACHE_PDF.estatisticas(),
+        "fila_pdf": _fila_pdf.estatisticas() if _fila_pdf is not None else None,
+        "indice_busca": {
+            versao: {"riscos": len(indice.riscos), "termos": len(indice.vocabulario)}
+            for versao, indice in INDICES_BUSCA.items()
+        },
+        "similaridade": {
+            versao: {"implementacao": similaridade.implementacao, "termos": similaridade.termos}
+            for versao, similaridade in SIMILARIDADES.items()
+        },
+        "inicializacao": {
+            **INICIALIZACAO,
+            "modulo_pdf_carregado": 'pdf_riscos' in sys.modules
+        },
         "delegacia_patterns": {
             "padrao_ia": "376.73 m² - R$ 2.8M",
             "padrao_i": "642.29 m² - R$ 4.7M", 
@@ -694,6 +851,43 @@ def health_check():
         }
     })
 
+# Métricas da base e da inicialização, lidas na coleta
+METRICAS.medidor_funcao(
+    "riscos_base_info", "Versão e origem da base de riscos carregada (valor sempre 1).",
+    lambda: [((versao_base(), INICIALIZACAO["origem_base"] or "nenhuma"), 1)], ("versao", "origem"))
+METRICAS.medidor_funcao(
+    "riscos_base_riscos", "Riscos na base carregada.", lambda: len(RISK_DATABASE.get('riscos', [])))
+METRICAS.medidor_funcao(
+    "riscos_inicializacao_segundos", "Duração de cada etapa da inicialização (carga_base, construcao_indices, ...).",
+    lambda: [((etapa,), ms / 1000) for etapa, ms in INICIALIZACAO["tempos_ms"].items()], ("etapa",))
+METRICAS.medidor_funcao(
+    "riscos_cache_resultados_itens", "Seleções no cache LRU de resultados.", lambda: len(CACHE_RESULTADOS))
+
+def consultas_caches():
+    """Contadores de acerto/falha dos caches, lidos na coleta."""
+    return [
+        ((nome, resultado), quantidade)
+        for nome, cache in (('resultados', CACHE_RESULTADOS), ('catalogo', CACHE_CATALOGO), ('pdf', CACHE_PDF))
+        for resultado, quantidade in (('acerto', cache.acertos), ('falha', cache.falhas))
+    ] + [(('pdf', 'coalescida'), CACHE_PDF.coalescidas)]
+
+METRICAS.contador_funcao(
+    "riscos_cache_consultas_total", "Consultas aos caches por resultado (acerto, falha; coalescida no de PDFs).",
+    consultas_caches, ("cache", "resultado"))
+METRICAS.contador_funcao(
+    "riscos_cache_remocoes_total", "Itens removidos dos caches por falta de espaço.",
+    lambda: [((nome,), cache.remocoes) for nome, cache in
+             (('resultados', CACHE_RESULTADOS), ('catalogo', CACHE_CATALOGO), ('pdf', CACHE_PDF))], ("cache",))
+METRICAS.medidor_funcao(
+    "riscos_cache_pdf_bytes", "Bytes de PDFs no cache em disco.", lambda: CACHE_PDF.estatisticas()["bytes"])
+METRICAS.medidor_funcao(
+    "riscos_cache_pdf_arquivos", "PDFs no cache em disco.", lambda: CACHE_PDF.estatisticas()["arquivos"])
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas do processo no formato de texto do Prometheus."""
+    return Response(METRICAS.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/risk-metadata', methods=['GET'])
 def get_risk_metadata():
     """Retorna metadados incluindo informações baseadas nos dados CEA e padrões de delegacias."""
@@ -756,6 +950,9 @@ def get_risk_metadata():
 def get_project_risks():
     """
     Endpoint melhorado que usa dados reais do CEA e considera tamanhos dos empreendimentos.
+    
+    selection_metadata.debug_logic só é montado com ?debug=1, cabeçalho
+    X-Riscos-Debug: 1 ou "debug": true no corpo.
     """
     if not RISK_DATABASE:
         return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
@@ -766,7 +963,9 @@ def get_project_risks():
 
     try:
         # Processar critérios baseados nos dados CEA + tamanhos
-        result = processar_criterios_cea(project_data)
+        rastro = g.rastro
+        debug = project_data.get('debug') is True or parametro_ativo("debug", "X-Riscos-Debug")
+        result = processar_criterios_cea(project_data, debug, rastro)
         
         # Verificar se algum risco foi selecionado
         if not result["selected_risks"]:
@@ -784,11 +983,13 @@ def get_project_risks():
             }), 200
         
         # Resposta de sucesso com contexto CEA + tamanho
+        # A lista de riscos já vem codificada do cache; só os metadados são codificados aqui
         tamanho_info = result["selection_metadata"]["tamanho_info"]
-        return jsonify({
+        rastro.retomar()
+        corpo = montar_json({
             "message": f"Riscos selecionados com base na análise de 557 obras do CEA, considerando porte {tamanho_info.get('categoria', 'indefinido')}.",
-            "selected_risks": result["selected_risks"],
             "selection_metadata": result["selection_metadata"],
+            "catalog_version": versao_base(),
             "project_data_received": {
                 "forca": project_data.get("forca"),
                 "tipoUnidade": project_data.get("tipoUnidade"),
@@ -801,7 +1002,9 @@ def get_project_risks():
             },
             "cea_context": f"Este projeto ({tamanho_info.get('categoria')}) se alinha com {result['selection_metadata']['cea_context']['relevancia_tipo']} obras similares do CEA.",
             "size_context": f"Área: {tamanho_info.get('area', 'N/A')} m² - Porte: {tamanho_info.get('categoria', 'indefinido')}"
-        })
+        }, selected_risks=lista_json(result["selected_risks_fragments"]))
+        rastro.marcar('serializacao')
+        return resposta_json(corpo)
     
     except Exception as e:
         print(f"Erro ao processar critérios de risco baseados no CEA + tamanhos: {e}")
@@ -810,6 +1013,251 @@ def get_project_risks():
             "details": str(e)
         }), 500
 
+# Seleção em lote: um portfólio inteiro em uma requisição, com resposta NDJSON
+# (uma linha por projeto). Critérios idênticos são calculados e codificados uma
+# vez; projetos em NDJSON são lidos do corpo à medida que a resposta é gerada.
+LOTE_SELECAO_MAXIMO = int(os.environ.get("RISCOS_LOTE_SELECAO_MAXIMO", 5000))
+TIPOS_NDJSON = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+def ler_projetos_ndjson(fluxo):
+    """Gera (projeto, erro) para cada linha não vazia de um corpo NDJSON."""
+    for linha in fluxo:
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            yield json.loads(linha), None
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            yield None, f"Linha NDJSON inválida: {e}"
+
+def linha_selecao(criterios, completo):
+    """Resultado codificado (sem a posição) da seleção para critérios canônicos."""
+    resultado = obter_selecao(criterios)
+    metadados = resultado["selection_metadata"]
+    fragmentos = {"selected_risks": lista_json(resultado["selected_risks_fragments"])} if completo else {}
+    return montar_json({
+        "total_riscos": len(resultado["selected_risks"]),
+        "selected_risk_ids": [risco.get('id') for risco in resultado["selected_risks"]],
+        "risk_distribution": metadados["risk_distribution"],
+        "phases_distribution": metadados["phases_distribution"],
+        "tipo_obra_base": metadados["tipo_obra_base"],
+        "faixa_valor": metadados["faixa_valor"],
+        "tamanho_categoria": metadados["tamanho_info"].get("categoria")
+    }, **fragmentos)
+
+def gerar_lote_selecao(projetos, completo):
+    """Linhas NDJSON do lote, terminando com uma linha 'summary'."""
+    inicio = time.perf_counter()
+    linhas_por_criterio = CacheLRU(1024)
+    total = erros = 0
+    for posicao, (projeto, erro) in enumerate(projetos):
+        if posicao >= LOTE_SELECAO_MAXIMO:
+            erros += 1
+            yield codificar({"error": f"Lote excede o máximo de {LOTE_SELECAO_MAXIMO} projetos; restante ignorado."}) + b'\n'
+            break
+        total += 1
+        prefixo = {"index": posicao}
+        if isinstance(projeto, dict) and "ref" in projeto:
+            prefixo["ref"] = projeto["ref"]
+        if erro is None and not isinstance(projeto, dict):
+            erro = "Projeto deve ser um objeto."
+        if erro is not None:
+            erros += 1
+            yield codificar({**prefixo, "error": erro}) + b'\n'
+            continue
+
+        try:
+            criterios = canonicalizar_criterios(projeto)
+            linha = linhas_por_criterio.obter(criterios)
+            if linha is None:
+                linha = linha_selecao(criterios, completo)
+                linhas_por_criterio.guardar(criterios, linha)
+        except Exception as e:
+            # Campos com tipos inesperados (ex.: 'caracteristicas' numérico) não interrompem o lote
+            erros += 1
+            yield codificar({**prefixo, "error": f"Projeto inválido: {e}"}) + b'\n'
+            continue
+        # O corpo codificado é compartilhado entre projetos iguais; só a posição muda
+        yield codificar(prefixo)[:-1] + b',' + linha[1:] + b'\n'
+
+    estatisticas = linhas_por_criterio.estatisticas()
+    yield codificar({"summary": {
+        "projetos": total,
+        "selecoes_calculadas": estatisticas["falhas"],
+        "erros": erros,
+        "catalog_version": versao_base(),
+        "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1)
+    }}) + b'\n'
+
+@app.route('/api/project-risks/batch', methods=['POST'])
+def get_project_risks_batch():
+    """
+    Seleção de riscos para muitos projetos de uma vez. Corpo: array JSON de
+    projetos (mesmos campos de /api/project-risks), {"projects": [...]} ou
+    NDJSON (Content-Type application/x-ndjson). Resposta NDJSON com IDs e
+    distribuições por projeto; ?full=1 inclui os riscos completos. Um campo
+    'ref' do projeto é devolvido na linha correspondente.
+    """
+    if not RISK_DATABASE:
+        return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
+
+    completo = request.args.get("full", "").lower() in ("1", "true", "sim")
+    if request.mimetype in TIPOS_NDJSON:
+        projetos = ler_projetos_ndjson(request.stream)
+    else:
+        dados = request.get_json(silent=True)
+        if isinstance(dados, dict):
+            dados = dados.get("projects")
+        if not isinstance(dados, list):
+            return jsonify({"error": "Envie um array JSON de projetos, {\"projects\": [...]} ou NDJSON."}), 400
+        if len(dados) > LOTE_SELECAO_MAXIMO:
+            return jsonify({"error": f"Lote excede o máximo de {LOTE_SELECAO_MAXIMO} projetos."}), 400
+        projetos = ((projeto, None) for projeto in dados)
+
+    return Response(
+        stream_with_context(gerar_lote_selecao(projetos, completo)),
+        mimetype='application/x-ndjson'
+    )
+
+def ler_projetos_csv(fluxo):
+    """
+    Gera (projeto, None) para cada linha de um CSV com cabeçalho (colunas com os
+    nomes dos campos de /api/project-risks); 'caracteristicas' separadas por ';' ou '|'.
+    """
+    texto = io.TextIOWrapper(fluxo, encoding='utf-8-sig', newline='')
+    for linha in csv.DictReader(texto):
+        projeto = {campo.strip(): valor.strip() for campo, valor in linha.items() if campo and valor and valor.strip()}
+        caracteristicas = projeto.get('caracteristicas')
+        if caracteristicas:
+            projeto['caracteristicas'] = [c.strip() for c in caracteristicas.replace('|', ';').split(';') if c.strip()]
+        yield projeto, None
+
+def investimento_projeto(projeto):
+    """Investimento do padrão da unidade (TAMANHOS_POR_UNIDADE) ou, na falta dele, o valor informado."""
+    investimento = obter_tamanho_info(projeto.get('tipoUnidade')).get('investimento')
+    if investimento is None and projeto.get('valor') not in (None, ''):
+        investimento = interpretar_valor(projeto.get('valor'))
+    return investimento
+
+@app.route('/api/portfolio-analytics', methods=['POST'])
+def portfolio_analytics():
+    """
+    Exposição agregada de um portfólio de obras. Corpo: CSV (text/csv), NDJSON
+    ou JSON (array ou {"projects": [...]}) com os critérios de cada projeto.
+    Cada projeto passa pela seleção de riscos e só alimenta os agregados
+    (contagens por nível, fase, responsável e categoria, matriz 5×5 e
+    exposição ponderada pelo investimento), no total e por força.
+    """
+    if not RISK_DATABASE:
+        return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
+
+    if request.mimetype in ('text/csv', 'application/csv'):
+        projetos = ler_projetos_csv(request.stream)
+    elif request.mimetype in TIPOS_NDJSON:
+        projetos = ler_projetos_ndjson(request.stream)
+    else:
+        dados = request.get_json(silent=True)
+        if isinstance(dados, dict):
+            dados = dados.get("projects")
+        if not isinstance(dados, list):
+            return jsonify({"error": "Envie os projetos em CSV, NDJSON, array JSON ou {\"projects\": [...]}."}), 400
+        projetos = ((projeto, None) for projeto in dados)
+
+    try:
+        inicio = time.perf_counter()
+        agregador = AgregadorPortfolio(REGRAS_COMPILADAS['colunar'])
+        for projeto, erro in projetos:
+            if erro is not None or not isinstance(projeto, dict):
+                agregador.registrar_erro()
+                continue
+            try:
+                resultado = obter_selecao(canonicalizar_criterios(projeto))
+                forca = projeto.get('forca')
+                investimento = investimento_projeto(projeto)
+            except Exception:
+                # Campos com tipos inesperados contam como erro do projeto, sem interromper o portfólio
+                agregador.registrar_erro()
+                continue
+            agregador.adicionar(
+                forca if isinstance(forca, str) and forca else 'Não informado',
+                resultado["selected_mask"],
+                investimento
+            )
+        return jsonify({
+            **agregador.resultado(),
+            "catalog_version": versao_base(),
+            "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1)
+        })
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"error": f"CSV inválido: {e}"}), 400
+    except Exception as e:
+        print(f"Erro na análise de portfólio: {str(e)}")
+        return jsonify({
+            "error": "Erro interno na análise de portfólio.",
+            "details": str(e)
+        }), 500
+
+def resolver_riscos_pdf(risk_ids):
+    """
+    Riscos da base para a lista ordenada de IDs (repetições ignoradas).
+    Retorna (riscos, IDs desconhecidos).
+    """
+    risco_por_id = REGRAS_COMPILADAS['motor'].risco_por_id
+    riscos, vistos, desconhecidos = [], set(), []
+    for risco_id in risk_ids:
+        if isinstance(risco_id, bool) or not isinstance(risco_id, int) or risco_id not in risco_por_id:
+            desconhecidos.append(risco_id)
+        elif risco_id not in vistos:
+            vistos.add(risco_id)
+            riscos.append(risco_por_id[risco_id])
+    return riscos, desconhecidos
+
+def projeto_completo(project_data):
+    """projectData traz 'forca' e 'tipoUnidade' (textos não vazios)."""
+    return all(isinstance(project_data.get(campo), str) and project_data[campo] for campo in ('forca', 'tipoUnidade'))
+
+def ler_pedido_pdf(dados_para_pdf):
+    """
+    Extrai (projectData, riscos, debugInfo) do corpo de um pedido de PDF.
+
+    O conteúdo dos riscos sempre vem da base carregada: o pedido traz
+    'riskIds' (lista ordenada) e 'catalogVersion'; clientes antigos que
+    enviam 'selectedRisks' completos têm apenas os IDs aproveitados.
+    Retorna também o erro de validação como (corpo, status HTTP), ou None.
+    """
+    if not dados_para_pdf:
+        return None, None, None, ({"error": "Nenhum dado recebido para geração do PDF."}, 400)
+    if not isinstance(dados_para_pdf, dict):
+        return None, None, None, ({"error": "O pedido deve ser um objeto."}, 400)
+    
+    # Extrair dados
+    project_data = dados_para_pdf.get("projectData") or {}
+    debug_info = dados_para_pdf.get("debugInfo") or {}
+    if not isinstance(project_data, dict) or not isinstance(debug_info, dict):
+        return None, None, None, ({"error": "'projectData' e 'debugInfo' devem ser objetos."}, 400)
+    risk_ids = dados_para_pdf.get("riskIds")
+    if risk_ids is None:
+        risk_ids = [risco.get("id") for risco in dados_para_pdf.get("selectedRisks") or [] if isinstance(risco, dict)]
+    
+    # Validar dados essenciais
+    if not isinstance(risk_ids, list) or not risk_ids:
+        return project_data, None, debug_info, ({"error": "Nenhum risco foi selecionado para o PDF."}, 400)
+    
+    if not projeto_completo(project_data):
+        return project_data, None, debug_info, ({"error": "Informações do projeto incompletas."}, 400)
+    
+    versao_cliente = dados_para_pdf.get("catalogVersion")
+    if versao_cliente is not None and versao_cliente != versao_base():
+        return project_data, None, debug_info, ({
+            "error": "A base de riscos foi atualizada; recarregue a seleção de riscos.",
+            "catalog_version": versao_base()
+        }, 409)
+    
+    riscos, desconhecidos = resolver_riscos_pdf(risk_ids)
+    if desconhecidos:
+        return project_data, None, debug_info, ({"error": f"IDs de risco inexistentes: {desconhecidos}"}, 400)
+    return project_data, riscos, debug_info, None
+
 @app.route('/api/generate-pdf', methods=['POST'])
 def generate_pdf_endpoint():
     """
@@ -817,50 +1265,45 @@ def generate_pdf_endpoint():
     """
     try:
         dados_para_pdf = request.get_json()
+        project_data, selected_risks, debug_info, erro = ler_pedido_pdf(dados_para_pdf)
+        if erro:
+            return jsonify(erro[0]), erro[1]
+        incluir_matriz = bool(dados_para_pdf.get('includeMatrix'))
+        rastro = g.rastro
+        rastro.anotar(
+            projeto=f"{project_data.get('forca')} - {project_data.get('tipoUnidade')}",
+            total_riscos=len(selected_risks)
+        )
         
-        if not dados_para_pdf:
-            return jsonify({"error": "Nenhum dado recebido para geração do PDF."}), 400
-        
-        # Extrair dados
-        project_data = dados_para_pdf.get("projectData", {})
-        selected_risks = dados_para_pdf.get("selectedRisks", [])
-        debug_info = dados_para_pdf.get("debugInfo", {})
-        
-        # Validar dados essenciais
-        if not selected_risks:
-            return jsonify({"error": "Nenhum risco foi selecionado para o PDF."}), 400
-        
-        if not project_data.get('forca') or not project_data.get('tipoUnidade'):
-            return jsonify({"error": "Informações do projeto incompletas."}), 400
-        
-        # Log para debug
-        print("=== GERANDO PDF REAL ===")
-        print(f"Projeto: {project_data.get('forca')} - {project_data.get('tipoUnidade')}")
-        print(f"Riscos: {len(selected_risks)}")
+        def renderizar():
+            rastro.retomar()
+            pdf = gerar_pdf_riscos(project_data, selected_risks, debug_info, incluir_matriz)
+            rastro.marcar('pdf')
+            return pdf
         
-        # Gerar o PDF
-        pdf_buffer = gerar_pdf_riscos(project_data, selected_risks, debug_info)
+        # Gerar o PDF (ou reaproveitar um idêntico já gerado)
+        chave = chave_pdf(project_data, selected_risks, incluir_matriz)
+        pdf_arquivo = CACHE_PDF.obter_ou_gerar(chave, renderizar)
+        if rastro.ativo:
+            rastro.anotar(pdf_cache='falha' if 'pdf' in rastro.etapas else 'acerto')
         
         # Criar nome do arquivo
-        forca_abrev = {
-            'Corpo de Bombeiros Militar': 'CBMPR',
-            'Polícia Militar': 'PMPR',
-            'Polícia Civil': 'PCPR', 
-            'Polícia Penal': 'DEPPEN',
-            'Polícia Científica': 'PCP'
-        }.get(project_data.get('forca', ''), 'SESP')
-        
-        tipo_unidade = project_data.get('tipoUnidade', 'Unidade').replace(' ', '_').replace('(', '').replace(')', '').replace(',', '')
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"Matriz_Risco_{forca_abrev}_{tipo_unidade}_{timestamp}.pdf"
+        filename = nome_arquivo_pdf(project_data, datetime.now().strftime('%Y%m%d_%H%M%S'))
         
-        # Retornar o arquivo PDF
-        return send_file(
-            pdf_buffer,
+        # Retornar o arquivo PDF, transmitido em partes a partir do disco ou do arquivo temporário
+        pdf_arquivo.seek(0, os.SEEK_END)
+        tamanho = pdf_arquivo.tell()
+        pdf_arquivo.seek(0)
+        resposta = send_file(
+            pdf_arquivo,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/pdf'
+            mimetype='application/pdf',
+            etag=chave
         )
+        if resposta.status_code == 200:
+            resposta.content_length = tamanho
+        return resposta
         
     except Exception as e:
         print(f"Erro ao gerar PDF: {str(e)}")
@@ -869,6 +1312,250 @@ def generate_pdf_endpoint():
             "details": str(e)
         }), 500
 
+# Fila assíncrona de PDFs: o POST só enfileira e responde com o ID do trabalho;
+# threads em segundo plano renderizam (reaproveitando o cache de PDFs). Criada
+# no primeiro uso para não pesar na partida a frio.
+_fila_pdf = None
+_lock_fila_pdf = threading.Lock()
+
+def executar_trabalho_pdf(pedido):
+    """Renderiza (ou obtém do cache) o PDF de um trabalho da fila."""
+    project_data, selected_risks, debug_info, incluir_matriz = pedido
+    return CACHE_PDF.obter_ou_gerar(
+        chave_pdf(project_data, selected_risks, incluir_matriz),
+        lambda: gerar_pdf_riscos(project_data, selected_risks, debug_info, incluir_matriz)
+    )
+
+def fila_pdf():
+    """Fila de trabalhos de PDF (criada sob demanda)."""
+    global _fila_pdf
+    with _lock_fila_pdf:
+        if _fila_pdf is None:
+            _fila_pdf = FilaPDF(
+                os.environ.get("RISCOS_FILA_PDF_DIR", os.path.join(tempfile.gettempdir(), "riscos_cea_trabalhos")),
+                executar_trabalho_pdf,
+                trabalhadores=int(os.environ.get("RISCOS_FILA_PDF_TRABALHADORES", 2)),
+                tamanho_maximo=int(os.environ.get("RISCOS_FILA_PDF_MAXIMO", 100)),
+                ttl_segundos=int(os.environ.get("RISCOS_FILA_PDF_TTL", 3600))
+            )
+        return _fila_pdf
+
+# Estado da fila lido na coleta, sem criá-la só para isso
+METRICAS.medidor_funcao(
+    "riscos_fila_pdf_profundidade", "Trabalhos de PDF enfileirados aguardando uma thread.",
+    lambda: _fila_pdf.profundidade if _fila_pdf is not None else 0)
+METRICAS.medidor_funcao(
+    "riscos_fila_pdf_processando", "Trabalhos de PDF em renderização.",
+    lambda: _fila_pdf.processando if _fila_pdf is not None else 0)
+METRICAS.contador_funcao(
+    "riscos_fila_pdf_trabalhos_total", "Trabalhos de PDF por resultado (concluido, falha, rejeitado).",
+    lambda: [((resultado,), getattr(_fila_pdf, atributo) if _fila_pdf is not None else 0)
+             for resultado, atributo in (('concluido', 'concluidos'), ('falha', 'falhas'), ('rejeitado', 'rejeitados'))],
+    ("resultado",))
+
+def urls_trabalho_pdf(trabalho_id):
+    return {
+        "status_url": f"/api/pdf-jobs/{trabalho_id}",
+        "download_url": f"/api/pdf-jobs/{trabalho_id}/download"
+    }
+
+@app.route('/api/pdf-jobs', methods=['POST'])
+def submit_pdf_job():
+    """Enfileira a geração de um PDF (mesmo corpo de /api/generate-pdf) e retorna o ID do trabalho."""
+    try:
+        dados_para_pdf = request.get_json(silent=True)
+        project_data, selected_risks, debug_info, erro = ler_pedido_pdf(dados_para_pdf)
+        if erro:
+            return jsonify(erro[0]), erro[1]
+        
+        filename = nome_arquivo_pdf(project_data, datetime.now().strftime('%Y%m%d_%H%M%S'))
+        pedido = (project_data, selected_risks, debug_info, bool(dados_para_pdf.get('includeMatrix')))
+        trabalho_id = fila_pdf().submeter(pedido, filename, len(selected_risks))
+        return jsonify({"job_id": trabalho_id, "status": "pendente", **urls_trabalho_pdf(trabalho_id)}), 202
+    except FilaCheia as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        print(f"Erro ao enfileirar PDF: {str(e)}")
+        return jsonify({
+            "error": "Erro interno ao enfileirar PDF.",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/pdf-jobs/<trabalho_id>', methods=['GET'])
+def get_pdf_job(trabalho_id):
+    """Estado de um trabalho de PDF, com tempos de espera e de renderização."""
+    trabalho = fila_pdf().consultar(trabalho_id)
+    if trabalho is None:
+        return jsonify({"error": "Trabalho não encontrado ou expirado."}), 404
+    return jsonify({**trabalho, **urls_trabalho_pdf(trabalho_id)})
+
+@app.route('/api/pdf-jobs/<trabalho_id>/download', methods=['GET'])
+def download_pdf_job(trabalho_id):
+    """Download do PDF de um trabalho concluído."""
+    fila = fila_pdf()
+    trabalho = fila.consultar(trabalho_id)
+    if trabalho is None:
+        return jsonify({"error": "Trabalho não encontrado ou expirado."}), 404
+    if trabalho["estado"] != "concluido":
+        return jsonify({"error": f"Trabalho ainda não concluído (estado: {trabalho['estado']}).", "status": trabalho["estado"]}), 409
+    try:
+        return send_file(
+            fila.caminho(trabalho_id),
+            as_attachment=True,
+            download_name=trabalho["nome_arquivo"],
+            mimetype='application/pdf'
+        )
+    except FileNotFoundError:
+        return jsonify({"error": "Trabalho não encontrado ou expirado."}), 404
+
+def preparar_item_lote(item):
+    """
+    Resolve um projeto do lote em (projectData, riscos, metadados). Com
+    'riskIds', o item é validado como um pedido de PDF avulso (ler_pedido_pdf:
+    ordem do cliente, IDs da base e 'catalogVersion'); sem eles, os riscos vêm
+    da seleção pelos critérios de projectData. Retorna uma mensagem de erro no
+    lugar dos riscos se o item for inválido.
+    """
+    if not isinstance(item, dict):
+        return {}, "Item do lote deve ser um objeto.", {}
+    project_data = item.get('projectData') or {}
+    if not isinstance(project_data, dict) or not projeto_completo(project_data):
+        return {}, "Informações do projeto incompletas.", {}
+
+    if item.get('riskIds') is not None:
+        _, riscos, metadados, erro = ler_pedido_pdf(item)
+        if erro:
+            return project_data, erro[0]["error"], {}
+        return project_data, riscos, metadados
+
+    resultado = obter_selecao(canonicalizar_criterios(project_data))
+    if not resultado["selected_risks"]:
+        return project_data, "Nenhum risco foi selecionado para o PDF.", {}
+    return project_data, resultado["selected_risks"], resultado["selection_metadata"]
+
+def gerar_lote_zip(itens, timestamp):
+    """
+    Gera o ZIP do lote em partes: cada PDF é escrito assim que fica pronto (em
+    cache, em um processo do pool ou na thread) e o 'relatorio_lote.json' com o
+    resultado de cada projeto fecha o arquivo.
+    """
+    from concurrent.futures import as_completed
+    pool = pool_pdf()
+    saida = SaidaFluxo()
+    relatorio = []
+    pendentes = {}
+    por_chave = {}
+    prontos = {}
+
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_STORED) as zf:
+        def escrever(posicao, pdf, origem, inicio):
+            entrada = relatorio[posicao]
+            entrada.update({"status": "ok", "origem": origem, "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1)})
+            zf.writestr(entrada["arquivo"], pdf)
+
+        try:
+            for posicao, item in enumerate(itens):
+                inicio = time.perf_counter()
+                entrada = {"posicao": posicao, "projeto": ""}
+                relatorio.append(entrada)
+                try:
+                    project_data, riscos, metadados = preparar_item_lote(item)
+                    entrada["projeto"] = f"{project_data.get('forca', '')} - {project_data.get('tipoUnidade', '')}"
+                    if isinstance(riscos, str):
+                        entrada.update({"status": "erro", "erro": riscos})
+                        continue
+                    entrada.update({
+                        "arquivo": f"{posicao + 1:03d}_{nome_arquivo_pdf(project_data, timestamp)}",
+                        "total_riscos": len(riscos)
+                    })
+                    chave = chave_pdf(project_data, riscos)
+                except Exception as e:
+                    # Um item malformado não interrompe o lote
+                    entrada.update({"status": "erro", "erro": f"Erro ao preparar o projeto: {e}"})
+                    continue
+
+                arquivo = CACHE_PDF.abrir(chave) if CACHE_PDF.ativo else None
+                if arquivo is not None:
+                    with arquivo:
+                        escrever(posicao, arquivo.read(), "cache", inicio)
+                    yield saida.esvaziar()
+                elif chave in prontos:
+                    # Mesmo conteúdo de um item anterior do lote: renderiza uma vez só
+                    escrever(posicao, prontos[chave], "duplicado", inicio)
+                    yield saida.esvaziar()
+                elif chave in por_chave:
+                    por_chave[chave].append((posicao, inicio))
+                elif pool is not None:
+                    futuro = pool.submit(
+                        modulo_pdf().renderizar_pdf_medido, project_data, riscos, metadados, chaves_fragmentos(riscos)
+                    )
+                    pendentes[futuro] = chave
+                    por_chave[chave] = [(posicao, inicio)]
+                else:
+                    try:
+                        pdf, segundos = modulo_pdf().renderizar_pdf_medido(
+                            project_data, riscos, metadados, chaves_fragmentos(riscos)
+                        )
+                    except Exception as e:
+                        entrada.update({"status": "erro", "erro": str(e)})
+                        continue
+                    observar_pdf(segundos, len(pdf))
+                    CACHE_PDF.guardar(chave, pdf)
+                    if not CACHE_PDF.ativo:
+                        prontos[chave] = pdf
+                    escrever(posicao, pdf, "renderizado", inicio)
+                    yield saida.esvaziar()
+
+            for futuro in as_completed(pendentes):
+                chave = pendentes[futuro]
+                try:
+                    pdf, segundos = futuro.result()
+                except Exception as e:
+                    for posicao, _ in por_chave[chave]:
+                        relatorio[posicao].update({"status": "erro", "erro": str(e)})
+                    continue
+                observar_pdf(segundos, len(pdf))
+                CACHE_PDF.guardar(chave, pdf)
+                for posicao, inicio in por_chave[chave]:
+                    escrever(posicao, pdf, "renderizado", inicio)
+                yield saida.esvaziar()
+        finally:
+            # Cliente desconectado ou erro: não renderiza o que ainda não começou
+            for futuro in pendentes:
+                futuro.cancel()
+
+        zf.writestr("relatorio_lote.json", json.dumps(relatorio, ensure_ascii=False, indent=2))
+    yield saida.esvaziar()
+
+@app.route('/api/generate-pdf/batch', methods=['POST'])
+def generate_pdf_batch_endpoint():
+    """
+    Gera as matrizes de vários projetos de uma vez e devolve um ZIP transmitido
+    à medida que cada PDF fica pronto. Corpo: {"projects": [{"projectData":
+    {...}, "riskIds": [...]}, ...]}; sem 'riskIds', os riscos são selecionados
+    pelos critérios de projectData.
+    """
+    try:
+        dados = request.get_json(silent=True) or {}
+        itens = dados.get("projects")
+        if not isinstance(itens, list) or not itens:
+            return jsonify({"error": "Informe a lista 'projects' com ao menos um projeto."}), 400
+        if len(itens) > LOTE_PDF_MAXIMO:
+            return jsonify({"error": f"Lote excede o máximo de {LOTE_PDF_MAXIMO} projetos."}), 400
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return Response(
+            stream_with_context(gerar_lote_zip(itens, timestamp)),
+            mimetype='application/zip',
+            headers={"Content-Disposition": f'attachment; filename="Matrizes_Risco_{timestamp}.zip"'}
+        )
+    except Exception as e:
+        print(f"Erro ao gerar lote de PDFs: {str(e)}")
+        return jsonify({
+            "error": "Erro interno ao gerar lote de PDFs.",
+            "details": str(e)
+        }), 500
+
 @app.route('/api/cea-insights', methods=['GET'])
 def get_cea_insights():
     """
@@ -936,61 +1623,425 @@ def get_cea_insights():
     
     return jsonify(insights)
 
+# Formatos de /api/all-risks: 'completo' (agrupado + lista, legado), 'grouped' e 'flat'
+FORMATOS_CATALOGO = ('completo', 'grouped', 'flat')
+
+# Corpos não filtrados pré-comprimidos por (versão da base, formato) e corpos filtrados em LRU
+VARIANTES_CATALOGO = {}
+CACHE_CATALOGO = CacheLRU(128)
+
+def versao_base():
+    """Versão da base de riscos carregada."""
+    return RISK_DATABASE.get('metadata', {}).get('versao', 'desconhecida')
+
+def agrupar_por_fase(riscos):
+    """Agrupa os riscos por fase, mais críticos primeiro dentro de cada fase."""
+    riscos_por_fase = {}
+    for risco in riscos:
+        riscos_por_fase.setdefault(risco.get('fase', 'Sem fase definida'), []).append(risco)
+    for fase in riscos_por_fase:
+        riscos_por_fase[fase].sort(key=lambda x: -x.get('nivel_risco', 0))
+    return riscos_por_fase
+
+def estatisticas_riscos(mascara):
+    """Estatísticas gerais dos riscos presentes na máscara."""
+    colunar = REGRAS_COMPILADAS['colunar']
+    return {
+        'total_riscos': contar_bits(mascara),
+        'por_nivel': colunar.distribuicao('nivel', mascara, incluir_zeros=True),
+        'por_fase': colunar.distribuicao('fase', mascara),
+        'por_responsavel': colunar.distribuicao('responsavel', mascara)
+    }
+
+def montar_catalogo(mascara, formato, campos=None):
+    """Corpo JSON de /api/all-risks; sem projeção de campos usa os fragmentos pré-codificados."""
+    bit_por_id = REGRAS_COMPILADAS['motor'].bit_por_id
+    riscos = [r for r in RISK_DATABASE.get('riscos', []) if mascara >> bit_por_id[r.get('id')] & 1]
+    if campos:
+        def fragmento(risco):
+            return codificar({campo: risco[campo] for campo in campos if campo in risco})
+    else:
+        fragmento = fragmento_risco
+    
+    riscos_por_fase = agrupar_por_fase(riscos)
+    fragmentos = {}
+    if formato in ('completo', 'grouped'):
+        fragmentos['riscos_por_fase'] = objeto_json(
+            (fase, lista_json([fragmento(r) for r in lista])) for fase, lista in riscos_por_fase.items()
+        )
+    if formato in ('completo', 'flat'):
+        fragmentos['todos_os_riscos'] = lista_json([fragmento(r) for r in riscos])
+    
+    return montar_json({
+        'estatisticas': estatisticas_riscos(mascara),
+        'metadata': RISK_DATABASE.get('metadata', {}),
+        'escalas': {
+            'probabilidade': RISK_DATABASE.get('escala_probabilidade', {}),
+            'impacto': RISK_DATABASE.get('escala_impacto', {}),
+            'nivel_risco': RISK_DATABASE.get('nivel_risco', {})
+        }
+    }, **fragmentos)
+
+def variantes_catalogo(formato):
+    """Corpo não filtrado do formato, construído e comprimido uma vez por versão da base."""
+    chave = (versao_base(), formato)
+    variantes = VARIANTES_CATALOGO.get(chave)
+    if variantes is None:
+        variantes = comprimir(montar_catalogo(REGRAS_COMPILADAS['motor'].mascara_total, formato))
+        variantes['etag'] = hashlib.sha1(variantes['identity']).hexdigest()
+        VARIANTES_CATALOGO[chave] = variantes
+    return variantes
+
+def parametro_lista(nome):
+    """Parâmetro de query separado por vírgulas (aceita também repetições)."""
+    valores = []
+    for valor in request.args.getlist(nome):
+        valores.extend(v.strip() for v in valor.split(',') if v.strip())
+    return tuple(valores)
+
 @app.route('/api/all-risks', methods=['GET'])
 def get_all_risks():
-    """Retorna todos os riscos disponíveis na base de dados."""
+    """
+    Retorna todos os riscos disponíveis na base de dados.
+    
+    Parâmetros opcionais de query:
+    - shape: 'grouped' (riscos_por_fase), 'flat' (todos_os_riscos) ou 'completo' (ambos, padrão)
+    - fields: projeção de campos dos riscos, ex.: fields=id,evento,nivel_risco
+    - fase, categoria, nivel: filtros (valores separados por vírgula; nivel em extremo/alto/moderado/baixo)
+    """
     if not RISK_DATABASE:
         return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
     
+    formato = request.args.get('shape', 'completo')
+    if formato not in FORMATOS_CATALOGO:
+        return jsonify({"error": f"Parâmetro 'shape' inválido. Use um de: {', '.join(FORMATOS_CATALOGO)}."}), 400
+    
+    campos = parametro_lista('fields')
+    if campos and 'id' not in campos:
+        campos = ('id',) + campos
+    fases = parametro_lista('fase')
+    categorias = parametro_lista('categoria')
+    niveis = parametro_lista('nivel')
+    
+    colunar = REGRAS_COMPILADAS['colunar']
+    desconhecidos = [campo for campo in campos if campo not in REGRAS_COMPILADAS['campos']]
+    if desconhecidos:
+        return jsonify({"error": f"Parâmetro 'fields' inválido: {', '.join(desconhecidos)}."}), 400
+    for coluna, rotulos in (('fase', fases), ('categoria', categorias), ('nivel', niveis)):
+        conhecidos = colunar.rotulos[coluna]
+        desconhecidos = [rotulo for rotulo in rotulos if rotulo not in conhecidos]
+        if desconhecidos:
+            return jsonify({
+                "error": f"Parâmetro '{coluna}' inválido: {', '.join(desconhecidos)}. Use um de: {', '.join(conhecidos)}."
+            }), 400
+    
     try:
-        todos_os_riscos = RISK_DATABASE.get('riscos', [])
+        # Catálogo completo: servido da memória, já comprimido
+        if not (campos or fases or categorias or niveis):
+            variantes = variantes_catalogo(formato)
+            codificacao = escolher_codificacao(request.accept_encodings, variantes)
+            resposta = resposta_json(variantes[codificacao])
+            if codificacao != 'identity':
+                resposta.headers['Content-Encoding'] = codificacao
+            resposta.headers['Vary'] = 'Accept-Encoding'
+            resposta.set_etag(f"{variantes['etag']}-{codificacao}")
+            return resposta.make_conditional(request)
         
-        # Organizar por fase
-        riscos_por_fase = {}
-        for risco in todos_os_riscos:
-            fase = risco.get('fase', 'Sem fase definida')
-            if fase not in riscos_por_fase:
-                riscos_por_fase[fase] = []
-            riscos_por_fase[fase].append(risco)
+        chave = (versao_base(), formato, campos, fases, categorias, niveis)
+        corpo = CACHE_CATALOGO.obter(chave)
+        if corpo is None:
+            # Filtros combinados como interseção dos mapas de bits das colunas
+            mascara = colunar.mascara_total
+            for coluna, rotulos in (('fase', fases), ('categoria', categorias), ('nivel', niveis)):
+                if rotulos:
+                    mascara &= colunar.mascara_rotulos(coluna, rotulos)
+            corpo = montar_catalogo(mascara, formato, campos)
+            CACHE_CATALOGO.guardar(chave, corpo)
+        return resposta_json(corpo)
         
-        # Ordenar riscos dentro de cada fase por nível (mais críticos primeiro)
-        for fase in riscos_por_fase:
-            riscos_por_fase[fase].sort(key=lambda x: -x.get('nivel_risco', 0))
-        
-        # Estatísticas gerais
-        stats = {
-            'total_riscos': len(todos_os_riscos),
-            'por_nivel': {
-                'extremo': len([r for r in todos_os_riscos if r.get('nivel_risco', 0) >= 15]),
-                'alto': len([r for r in todos_os_riscos if 8 <= r.get('nivel_risco', 0) < 15]),
-                'moderado': len([r for r in todos_os_riscos if 3 <= r.get('nivel_risco', 0) < 8]),
-                'baixo': len([r for r in todos_os_riscos if r.get('nivel_risco', 0) < 3])
-            },
-            'por_fase': {fase: len(riscos) for fase, riscos in riscos_por_fase.items()},
-            'por_responsavel': {}
-        }
+    except Exception as e:
+        print(f"Erro ao buscar todos os riscos: {e}")
+        return jsonify({
+            "error": "Erro interno ao buscar riscos da base de dados.",
+            "details": str(e)
+        }), 500
+
+# Índice de busca textual, construído na primeira busca de cada versão da base
+INDICES_BUSCA = {}
+BUSCA_LIMITE_MAXIMO = 100
+_lock_busca = threading.Lock()
+
+def indice_busca():
+    """Índice invertido dos riscos (na ordem de apresentação) da versão carregada."""
+    chave = versao_base()
+    indice = INDICES_BUSCA.get(chave)
+    if indice is None:
+        with _lock_busca:
+            indice = INDICES_BUSCA.get(chave)
+            if indice is None:
+                inicio = time.perf_counter()
+                indice = IndiceTextual(REGRAS_COMPILADAS['motor'].riscos_por_bit)
+                INDICES_BUSCA.clear()
+                INDICES_BUSCA[chave] = indice
+                registrar_etapa("indice_busca", inicio)
+    return indice
+
+@app.route('/api/risks/search', methods=['GET'])
+def search_risks():
+    """
+    Busca textual nos riscos, sem distinção de acentos ou maiúsculas.
+    
+    Parâmetros de query:
+    - q: termos da busca; todos precisam ocorrer, cada um como palavra ou início de palavra
+    - limit: número máximo de resultados (padrão 20, máximo 100)
+    
+    Campos pesquisados: evento (maior peso), descricao, impacto, mitigacao e correcao.
+    """
+    if not RISK_DATABASE:
+        return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
+    
+    consulta = request.args.get('q', '').strip()
+    if not consulta:
+        return jsonify({"error": "Informe o parâmetro 'q' com os termos da busca."}), 400
+    try:
+        limite = min(max(int(request.args.get('limit', 20)), 1), BUSCA_LIMITE_MAXIMO)
+    except ValueError:
+        return jsonify({"error": "Parâmetro 'limit' deve ser um número inteiro."}), 400
+    
+    try:
+        inicio = time.perf_counter()
+        indice = indice_busca()
+        total, encontrados = indice.buscar(consulta, limite)
+        resultados = []
+        for posicao, pontuacao, termos_casados in encontrados:
+            risco = indice.riscos[posicao]
+            resultados.append({
+                "id": risco.get('id'),
+                "pontuacao": pontuacao,
+                "evento": risco.get('evento'),
+                "fase": risco.get('fase'),
+                "nivel_risco": risco.get('nivel_risco'),
+                "classificacao": risco.get('classificacao'),
+                "trechos": indice.trechos(posicao, termos_casados)
+            })
+        return jsonify({
+            "query": consulta,
+            "total": total,
+            "ids": [resultado["id"] for resultado in resultados],
+            "resultados": resultados,
+            "catalog_version": versao_base(),
+            "tempo_ms": round((time.perf_counter() - inicio) * 1000, 3)
+        })
         
-        # Contar por responsável
-        for risco in todos_os_riscos:
-            resp = risco.get('responsavel', 'Não informado')
-            stats['por_responsavel'][resp] = stats['por_responsavel'].get(resp, 0) + 1
+    except Exception as e:
+        print(f"Erro na busca de riscos: {e}")
+        return jsonify({
+            "error": "Erro interno ao buscar riscos.",
+            "details": str(e)
+        }), 500
+
+# Vizinhos por similaridade, calculados uma vez por versão da base (importa NumPy só quando usado)
+SIMILARIDADES = {}
+SIMILARES_K_MAXIMO = int(os.environ.get("RISCOS_SIMILARES_K_MAXIMO", 20))
+_lock_similaridade = threading.Lock()
+
+def similaridade_riscos():
+    """Vizinhos mais próximos dos riscos da versão carregada."""
+    chave = versao_base()
+    similaridade = SIMILARIDADES.get(chave)
+    if similaridade is None:
+        with _lock_similaridade:
+            similaridade = SIMILARIDADES.get(chave)
+            if similaridade is None:
+                inicio = time.perf_counter()
+                from similaridade import SimilaridadeRiscos
+                similaridade = SimilaridadeRiscos(REGRAS_COMPILADAS['motor'].riscos_por_bit, SIMILARES_K_MAXIMO)
+                SIMILARIDADES.clear()
+                SIMILARIDADES[chave] = similaridade
+                registrar_etapa("similaridade", inicio)
+    return similaridade
+
+def resumo_similar(risco, valor, **extras):
+    return {
+        "id": risco.get('id'),
+        "similaridade": round(valor, 4),
+        "evento": risco.get('evento'),
+        "fase": risco.get('fase'),
+        "categoria": risco.get('categoria'),
+        "nivel_risco": risco.get('nivel_risco'),
+        **extras
+    }
+
+def parametro_k(valor, padrao=5):
+    """Quantidade de vizinhos pedida, limitada a SIMILARES_K_MAXIMO (ValueError se inválida)."""
+    return min(max(int(valor if valor is not None else padrao), 1), SIMILARES_K_MAXIMO)
+
+@app.route('/api/risks/<int:risk_id>/similar', methods=['GET'])
+def get_similar_risks(risk_id):
+    """
+    Riscos mais relacionados a um risco (similaridade de cosseno TF-IDF dos
+    textos e da categoria). Parâmetro opcional: k (padrão 5).
+    """
+    if not RISK_DATABASE:
+        return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
+    try:
+        k = parametro_k(request.args.get('k'))
+    except ValueError:
+        return jsonify({"error": "Parâmetro 'k' deve ser um número inteiro."}), 400
+    
+    try:
+        vizinhos = similaridade_riscos().similares(risk_id, k)
+        if vizinhos is None:
+            return jsonify({"error": f"Risco {risk_id} não encontrado."}), 404
+        return jsonify({
+            "id": risk_id,
+            "similares": [resumo_similar(risco, valor) for risco, valor in vizinhos],
+            "catalog_version": versao_base()
+        })
         
+    except Exception as e:
+        print(f"Erro ao buscar riscos similares: {e}")
         return jsonify({
-            'riscos_por_fase': riscos_por_fase,
-            'todos_os_riscos': todos_os_riscos,
-            'estatisticas': stats,
-            'metadata': RISK_DATABASE.get('metadata', {}),
-            'escalas': {
-                'probabilidade': RISK_DATABASE.get('escala_probabilidade', {}),
-                'impacto': RISK_DATABASE.get('escala_impacto', {}),
-                'nivel_risco': RISK_DATABASE.get('nivel_risco', {})
-            }
+            "error": "Erro interno ao buscar riscos similares.",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/risks/similar', methods=['POST'])
+def get_similar_risks_batch():
+    """
+    Riscos relacionados a uma seleção inteira.
+    
+    Corpo: {"ids": [...], "k": 5, "suggestions": 10}
+    - por_risco: os k vizinhos de cada ID (incluindo os que já estão na seleção)
+    - sugestoes: riscos fora da seleção, ordenados pela soma das similaridades com ela
+    """
+    if not RISK_DATABASE:
+        return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
+    
+    dados = request.get_json(silent=True) or {}
+    if not isinstance(dados, dict):
+        return jsonify({"error": "O corpo deve ser um objeto com 'ids'."}), 400
+    ids = dados.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "Informe 'ids' com a lista de IDs dos riscos."}), 400
+    # Inteiros JSON apenas (como em resolver_riscos_pdf): 1.9 ou "3" não são truncados nem convertidos
+    opcionais = {campo: dados.get(campo) for campo in ('k', 'suggestions') if dados.get(campo) is not None}
+    if any(isinstance(valor, bool) or not isinstance(valor, int) for valor in [*ids, *opcionais.values()]):
+        return jsonify({"error": "'ids', 'k' e 'suggestions' devem ser números inteiros."}), 400
+    ids = list(dict.fromkeys(ids))
+    k = parametro_k(opcionais.get('k'))
+    quantidade_sugestoes = min(max(opcionais.get('suggestions', 10), 0), BUSCA_LIMITE_MAXIMO)
+    
+    try:
+        similaridade = similaridade_riscos()
+        por_risco = {}
+        nao_encontrados = []
+        selecionados = set(ids)
+        for risk_id in ids:
+            vizinhos = similaridade.similares(risk_id, k)
+            if vizinhos is None:
+                nao_encontrados.append(risk_id)
+                continue
+            por_risco[str(risk_id)] = [
+                resumo_similar(risco, valor, selecionado=risco.get('id') in selecionados)
+                for risco, valor in vizinhos
+            ]
+        return jsonify({
+            "por_risco": por_risco,
+            "sugestoes": [
+                resumo_similar(risco, valor, relacionado_a=origens)
+                for risco, valor, origens in similaridade.sugestoes(ids, quantidade_sugestoes)
+            ],
+            "nao_encontrados": nao_encontrados,
+            "catalog_version": versao_base()
         })
         
     except Exception as e:
-        print(f"Erro ao buscar todos os riscos: {e}")
+        print(f"Erro ao buscar riscos similares: {e}")
         return jsonify({
-            "error": "Erro interno ao buscar riscos da base de dados.",
+            "error": "Erro interno ao buscar riscos similares.",
+            "details": str(e)
+        }), 500
+
+# Figuras da matriz 5×5 por (hash do conjunto de IDs, versão da base, formato)
+CACHE_MATRIZ = CacheLRU(int(os.environ.get("RISCOS_CACHE_MATRIZ", 64)))
+FORMATOS_MATRIZ = {'json': None, 'svg': 'image/svg+xml', 'png': 'image/png'}
+
+@app.route('/api/risk-matrix', methods=['GET'])
+def get_risk_matrix():
+    """
+    Matriz 5×5 de probabilidade × impacto com a contagem e os IDs dos riscos
+    de cada célula (índices [probabilidade-1][impacto-1]).
+    
+    Parâmetros opcionais de query (no máximo um escopo; sem escopo, o catálogo inteiro):
+    - tipo_obra: riscos específicos de um tipo de obra (ex.: delegacias)
+    - ids: conjunto arbitrário de IDs separados por vírgula
+    - format: 'json' (padrão), 'svg' ou 'png' (figura igual à embutida no PDF com includeMatrix)
+    """
+    if not RISK_DATABASE:
+        return jsonify({"error": "A base de dados de riscos não pôde ser carregada."}), 500
+    
+    formato = request.args.get('format', 'json')
+    if formato not in FORMATOS_MATRIZ:
+        return jsonify({"error": f"Parâmetro 'format' inválido. Use um de: {', '.join(FORMATOS_MATRIZ)}."}), 400
+    tipo_obra = request.args.get('tipo_obra')
+    ids = parametro_lista('ids')
+    if tipo_obra and ids:
+        return jsonify({"error": "Informe apenas um escopo: 'tipo_obra' ou 'ids'."}), 400
+    
+    motor = REGRAS_COMPILADAS['motor']
+    if tipo_obra:
+        if tipo_obra not in REGRAS_COMPILADAS['tipos_obra']:
+            return jsonify({
+                "error": f"Tipo de obra desconhecido: {tipo_obra}",
+                "tipos_obra_disponiveis": list(REGRAS_COMPILADAS['tipos_obra'])
+            }), 404
+        escopo = {"tipo": "tipo_obra", "valor": tipo_obra}
+        mascara = REGRAS_COMPILADAS['tipos_obra'][tipo_obra]
+    elif ids:
+        try:
+            ids = [int(i) for i in ids]
+        except ValueError:
+            return jsonify({"error": "'ids' deve conter apenas números inteiros."}), 400
+        desconhecidos = [i for i in ids if i not in motor.bit_por_id]
+        if desconhecidos:
+            return jsonify({"error": f"IDs de risco inexistentes: {desconhecidos}"}), 400
+        escopo = {"tipo": "ids", "valor": sorted(set(ids))}
+        mascara = motor.mascara(ids)
+    else:
+        escopo = {"tipo": "catalogo", "valor": None}
+        mascara = motor.mascara_total
+    
+    try:
+        grade = montar_grade(REGRAS_COMPILADAS['colunar'], REGRAS_COMPILADAS['ids_por_bit'], mascara)
+        if formato == 'json':
+            return jsonify({"escopo": escopo, **grade, "catalog_version": versao_base()})
+        
+        # O mesmo conjunto de riscos gera a mesma figura, qualquer que seja o escopo pedido
+        conjunto = hashlib.sha1(','.join(map(str, sorted(
+            REGRAS_COMPILADAS['ids_por_bit'][bit] for bit in motor.bits(mascara)
+        ))).encode()).hexdigest()
+        chave = (conjunto, versao_base(), formato)
+        imagem = CACHE_MATRIZ.obter(chave)
+        if imagem is None:
+            try:
+                imagem = modulo_pdf().renderizar_matriz(grade, formato)
+            except Exception as e:
+                if formato == 'png':
+                    return jsonify({
+                        "error": "Exportação PNG indisponível neste servidor; use format=svg.",
+                        "details": str(e)
+                    }), 501
+                raise
+            CACHE_MATRIZ.guardar(chave, imagem)
+        resposta = app.response_class(imagem, mimetype=FORMATOS_MATRIZ[formato])
+        resposta.set_etag(f"{conjunto}-{versao_base()}-{VERSAO_RENDERIZADOR_PDF}-{formato}")
+        return resposta.make_conditional(request)
+        
+    except Exception as e:
+        print(f"Erro ao montar a matriz de riscos: {e}")
+        return jsonify({
+            "error": "Erro interno ao montar a matriz de riscos.",
             "details": str(e)
         }), 500
 
@@ -1004,6 +2055,7 @@ def get_statistics():
     riscos = RISK_DATABASE.get('riscos', [])
     tipos_obra = RISK_DATABASE.get('tipos_obra', {})
     
+    colunar = REGRAS_COMPILADAS['colunar']
     stats = {
         "database_info": RISK_DATABASE.get('metadata', {}),
         "total_risks": len(riscos),
@@ -1023,10 +2075,10 @@ def get_statistics():
             "muito_grande": len([k for k, v in TAMANHOS_POR_UNIDADE.items() if v.get('categoria') == 'muito_grande'])
         },
         "risk_distribution": {
-            "by_level": {},
-            "by_phase": {},
-            "by_responsible": {},
-            "by_category": {}
+            "by_level": colunar.distribuicao('nivel'),
+            "by_phase": colunar.distribuicao('fase'),
+            "by_responsible": colunar.distribuicao('responsavel'),
+            "by_category": colunar.distribuicao('categoria')
         },
         "obra_types": {
             name: {
@@ -1043,31 +2095,91 @@ def get_statistics():
         }
     }
     
-    # Calcular distribuições
-    for risco in riscos:
-        nivel = risco.get('nivel_risco', 0)
-        if nivel >= 15:
-            level = "extremo"
-        elif nivel >= 8:
-            level = "alto"
-        elif nivel >= 3:
-            level = "moderado"
-        else:
-            level = "baixo"
-        
-        stats["risk_distribution"]["by_level"][level] = stats["risk_distribution"]["by_level"].get(level, 0) + 1
-        
-        fase = risco.get('fase', 'Não informado')
-        stats["risk_distribution"]["by_phase"][fase] = stats["risk_distribution"]["by_phase"].get(fase, 0) + 1
-        
-        responsavel = risco.get('responsavel', 'Não informado')
-        stats["risk_distribution"]["by_responsible"][responsavel] = stats["risk_distribution"]["by_responsible"].get(responsavel, 0) + 1
-        
-        categoria = risco.get('categoria', 'Não informado')
-        stats["risk_distribution"]["by_category"][categoria] = stats["risk_distribution"]["by_category"].get(categoria, 0) + 1
-    
     return jsonify(stats)
 
+# Aquecimento antes do tráfego (ex.: no mestre do gunicorn com preload_app,
+# antes do fork; ver gunicorn_conf.py). Cada etapa deixa pronto o que seria
+# construído na primeira requisição; nomes 'modulo:funcao' chamam ganchos próprios.
+ETAPAS_AQUECIMENTO_PADRAO = "indices,catalogo,selecoes,pdf,http"
+
+def aquecer_indices():
+    indice_busca()
+    similaridade_riscos()
+
+def aquecer_catalogo():
+    for formato in FORMATOS_CATALOGO:
+        variantes_catalogo(formato)
+
+def aquecer_selecoes():
+    if not RESULTADOS_PRECOMPUTADOS:
+        precomputar_resultados(int(os.environ.get('RISCOS_PRECOMPUTAR_MAX_CARACTERISTICAS', 0)))
+
+def aquecer_pdf():
+    """Renderiza um PDF com todos os riscos e a matriz: importa o ReportLab, monta os estilos e os fragmentos de cada risco."""
+    riscos = REGRAS_COMPILADAS['motor'].riscos_por_bit
+    forca, tipo_unidade = next(iter(REGRAS_COMPILADAS['tipo_obra_por_unidade']))
+    # Direto no módulo de PDF: sem pool de processos nem métricas de renderização
+    modulo_pdf().renderizar_pdf_bytes(
+        {"forca": forca, "tipoUnidade": tipo_unidade}, riscos, {},
+        chaves_fragmentos(riscos), matriz=grade_riscos(riscos)
+    )
+
+def aquecer_http():
+    """Uma requisição a cada rota JSON principal, pelo cliente de teste do Flask."""
+    forca, tipo_unidade = next(iter(REGRAS_COMPILADAS['tipo_obra_por_unidade']))
+    cliente = app.test_client()
+    for metodo, url, corpo in (
+        ('GET', '/api/health', None),
+        ('GET', '/api/risk-metadata', None),
+        ('POST', '/api/project-risks', {"forca": forca, "tipoUnidade": tipo_unidade}),
+        ('GET', '/api/all-risks', None),
+        ('GET', '/api/all-risks?shape=flat&fields=id,evento&nivel=alto', None),
+        ('GET', '/api/risks/search?q=obra', None),
+        ('GET', f"/api/risks/{REGRAS_COMPILADAS['motor'].riscos_por_bit[0]['id']}/similar", None),
+        ('GET', '/api/risk-matrix', None),
+        ('GET', '/api/metrics', None),
+    ):
+        cliente.open(url, method=metodo, json=corpo).close()
+
+ETAPAS_AQUECIMENTO = {
+    "indices": aquecer_indices,
+    "catalogo": aquecer_catalogo,
+    "selecoes": aquecer_selecoes,
+    "pdf": aquecer_pdf,
+    "http": aquecer_http,
+}
+
+def aquecer(etapas=None):
+    """
+    Executa as etapas de aquecimento (padrão: RISCOS_AQUECIMENTO ou
+    ETAPAS_AQUECIMENTO_PADRAO), registrando a duração de cada uma em
+    INICIALIZACAO. Falhas são avisadas sem interromper as demais etapas. As
+    métricas gravadas durante o aquecimento são descartadas.
+    """
+    if etapas is None:
+        etapas = os.environ.get("RISCOS_AQUECIMENTO", ETAPAS_AQUECIMENTO_PADRAO)
+    if isinstance(etapas, str):
+        etapas = [etapa.strip() for etapa in etapas.split(',') if etapa.strip()]
+    if not RISK_DATABASE:
+        return INICIALIZACAO["tempos_ms"]
+    for etapa in etapas:
+        if ':' not in etapa and etapa not in ETAPAS_AQUECIMENTO:
+            print(f"AVISO: etapa de aquecimento desconhecida: '{etapa}' (use {', '.join(ETAPAS_AQUECIMENTO)} ou 'modulo:funcao')")
+            continue
+        inicio = time.perf_counter()
+        try:
+            if ':' in etapa:
+                modulo, _, funcao = etapa.partition(':')
+                getattr(importlib.import_module(modulo), funcao)()
+            else:
+                ETAPAS_AQUECIMENTO[etapa]()
+        except Exception as e:
+            print(f"AVISO: etapa de aquecimento '{etapa}' falhou: {e}")
+            continue
+        registrar_etapa(f"aquecimento_{etapa}", inicio)
+    METRICAS.zerar()
+    return INICIALIZACAO["tempos_ms"]
+
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5001))
     print("=== INICIANDO API SEM FUNCIONALIDADE DE SUGESTÕES ===")
@@ -0,0 +1,75 @@
+# api/matriz_riscos.py - Matriz 5×5 de probabilidade × impacto
+"""
+A contagem por célula sai dos mapas de bits da coluna 'celula_matriz' do
+CatalogoColunar: cada célula (probabilidade, impacto) já tem o mapa dos
+riscos que caem nela, então agrupar uma seleção é um AND e uma contagem de
+bits por célula, sem percorrer os riscos. Só os IDs das células ocupadas
+são expandidos.
+
+As cores seguem as do frontend (getRiskColor, classes Tailwind 100/800/300),
+para que a figura, o PDF e a interface usem a mesma paleta.
+"""
+from catalogo_colunar import contar_bits
+
+ESCALA = (1, 2, 3, 4, 5)
+
+# Faixa do nível (probabilidade × impacto) → (rótulo, fundo, texto, borda)
+FAIXAS_NIVEL = (
+    (15, 'Extremo', '#fee2e2', '#991b1b', '#fca5a5'),
+    (8, 'Alto', '#ffedd5', '#9a3412', '#fdba74'),
+    (3, 'Moderado', '#fef9c3', '#854d0e', '#fde047'),
+    (0, 'Baixo', '#dbeafe', '#1e40af', '#93c5fd'),
+)
+
+
+def faixa_nivel(nivel):
+    """(rótulo, fundo, texto, borda) da faixa do nível de risco."""
+    for minimo, *faixa in FAIXAS_NIVEL:
+        if nivel >= minimo:
+            return tuple(faixa)
+    return tuple(FAIXAS_NIVEL[-1][1:])
+
+
+# Nível e classificação fixos de cada célula, indexados [probabilidade-1][impacto-1]
+NIVEIS_CELULA = [[p * i for i in ESCALA] for p in ESCALA]
+CLASSIFICACOES_CELULA = [[faixa_nivel(p * i)[0] for i in ESCALA] for p in ESCALA]
+CORES_CLASSIFICACAO = {
+    rotulo: {"fundo": fundo, "texto": texto, "borda": borda}
+    for _, rotulo, fundo, texto, borda in FAIXAS_NIVEL
+}
+
+
+def montar_grade(colunar, ids_por_bit, mascara):
+    """
+    Grade 5×5 dos riscos da máscara: contagens e IDs por célula, indexados
+    [probabilidade-1][impacto-1]. Riscos com probabilidade ou impacto fora de
+    1..5 vão para 'fora_da_matriz'.
+    """
+    contagens = [[0] * len(ESCALA) for _ in ESCALA]
+    ids = [[[] for _ in ESCALA] for _ in ESCALA]
+    fora = []
+    for (probabilidade, impacto), mapa in zip(colunar.rotulos['celula_matriz'], colunar.mapas_bits['celula_matriz']):
+        restante = mascara & mapa
+        if not restante:
+            continue
+        ids_celula = []
+        while restante:
+            menor = restante & -restante
+            ids_celula.append(ids_por_bit[menor.bit_length() - 1])
+            restante ^= menor
+        if probabilidade in ESCALA and impacto in ESCALA:
+            contagens[probabilidade - 1][impacto - 1] = len(ids_celula)
+            ids[probabilidade - 1][impacto - 1] = ids_celula
+        else:
+            fora.extend(ids_celula)
+
+    return {
+        "total": contar_bits(mascara),
+        "eixos": {"linhas": "probabilidade 1 a 5", "colunas": "impacto 1 a 5"},
+        "contagens": contagens,
+        "ids": ids,
+        "fora_da_matriz": sorted(fora),
+        "niveis": NIVEIS_CELULA,
+        "classificacoes": CLASSIFICACOES_CELULA,
+        "cores": CORES_CLASSIFICACAO
+    }
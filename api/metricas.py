@@ -0,0 +1,205 @@
+# api/metricas.py - Registro de métricas em memória no formato de texto do Prometheus
+"""
+Cada thread grava em um fragmento próprio (dict em threading.local), sem
+locks no caminho da requisição: um contador é um incremento em dict e um
+histograma é um bisect mais dois incrementos em lista. Na coleta, os
+fragmentos de todas as threads são somados; os de threads encerradas são
+incorporados a um acumulado e descartados, para que servidores com uma
+thread por requisição não acumulem fragmentos.
+
+O registro é por processo: com vários workers (gunicorn), cada coleta
+mostra o worker que a atendeu.
+"""
+import threading
+from bisect import bisect_left
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatar_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, registro, nome, ajuda, rotulos=()):
+        self.registro = registro
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+
+
+class Contador(_Metrica):
+    """Contador monotônico, somado entre threads."""
+
+    tipo = 'counter'
+
+    def inc(self, *rotulos, valor=1):
+        fragmento = self.registro.fragmento()
+        chave = (self.nome, rotulos)
+        fragmento[chave] = fragmento.get(chave, 0) + valor
+
+
+class Medidor(Contador):
+    """Valor que sobe e desce (ex.: requisições em andamento), somado entre threads."""
+
+    tipo = 'gauge'
+
+    def dec(self, *rotulos, valor=1):
+        self.inc(*rotulos, valor=-valor)
+
+
+class Histograma(_Metrica):
+    """Distribuição em baldes com limites superiores fixos (mais +Inf), soma e contagem."""
+
+    tipo = 'histogram'
+
+    def __init__(self, registro, nome, ajuda, limites, rotulos=()):
+        super().__init__(registro, nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor, *rotulos):
+        fragmento = self.registro.fragmento()
+        chave = (self.nome, rotulos)
+        baldes = fragmento.get(chave)
+        if baldes is None:
+            # Um balde por limite, um para +Inf e a soma no final
+            baldes = fragmento[chave] = [0] * (len(self.limites) + 2)
+        baldes[bisect_left(self.limites, valor)] += 1
+        baldes[-1] += valor
+
+
+class MedidorFuncao(_Metrica):
+    """Medidor calculado na coleta: a função retorna um número ou [(valores dos rótulos, número)]."""
+
+    tipo = 'gauge'
+
+    def __init__(self, registro, nome, ajuda, funcao, rotulos=()):
+        super().__init__(registro, nome, ajuda, rotulos)
+        self.funcao = funcao
+
+
+class ContadorFuncao(MedidorFuncao):
+    """Contador mantido por outro componente (ex.: acertos de um cache), lido na coleta."""
+
+    tipo = 'counter'
+
+
+class RegistroMetricas:
+    """Métricas do processo, gravadas por thread e somadas na coleta."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fragmentos = []
+        self._acumulado = {}
+        self._metricas = {}
+
+    def fragmento(self):
+        """Fragmento da thread atual (criado e registrado no primeiro uso)."""
+        try:
+            return self._local.fragmento
+        except AttributeError:
+            fragmento = self._local.fragmento = {}
+            with self._lock:
+                self._fragmentos.append((threading.current_thread(), fragmento))
+            return fragmento
+
+    def _registrar(self, metrica):
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador(self, nome, ajuda, rotulos))
+
+    def medidor(self, nome, ajuda, rotulos=()):
+        return self._registrar(Medidor(self, nome, ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, limites, rotulos=()):
+        return self._registrar(Histograma(self, nome, ajuda, limites, rotulos))
+
+    def medidor_funcao(self, nome, ajuda, funcao, rotulos=()):
+        return self._registrar(MedidorFuncao(self, nome, ajuda, funcao, rotulos))
+
+    def contador_funcao(self, nome, ajuda, funcao, rotulos=()):
+        return self._registrar(ContadorFuncao(self, nome, ajuda, funcao, rotulos))
+
+    @staticmethod
+    def _somar(destino, fragmento):
+        for chave, valor in fragmento.items():
+            atual = destino.get(chave)
+            if atual is None:
+                destino[chave] = list(valor) if isinstance(valor, list) else valor
+            elif isinstance(valor, list):
+                destino[chave] = [a + b for a, b in zip(atual, valor)]
+            else:
+                destino[chave] = atual + valor
+
+    def coletar(self):
+        """Valores somados de todas as threads: {(nome, valores dos rótulos): valor ou baldes}."""
+        with self._lock:
+            vivos = []
+            for thread, fragmento in self._fragmentos:
+                if thread.is_alive():
+                    vivos.append((thread, fragmento))
+                else:
+                    # Thread encerrada não grava mais: o fragmento vai para o acumulado
+                    self._somar(self._acumulado, fragmento)
+            self._fragmentos = vivos
+            total = {}
+            self._somar(total, self._acumulado)
+        for _, fragmento in vivos:
+            # dict.copy é atômico sob o GIL; a thread dona pode continuar gravando
+            self._somar(total, fragmento.copy())
+        return total
+
+    def zerar(self):
+        """Descarta os valores gravados até aqui (ex.: tráfego de aquecimento antes do fork)."""
+        with self._lock:
+            for _, fragmento in self._fragmentos:
+                fragmento.clear()
+            self._acumulado = {}
+
+    def exportar(self):
+        """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+        valores = {}
+        for (nome, rotulos), valor in self.coletar().items():
+            valores.setdefault(nome, []).append((rotulos, valor))
+
+        linhas = []
+        for nome, metrica in self._metricas.items():
+            linhas.append(f"# HELP {nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {nome} {metrica.tipo}")
+            if isinstance(metrica, MedidorFuncao):
+                resultado = metrica.funcao()
+                if not isinstance(resultado, list):
+                    resultado = [((), resultado)]
+                for rotulos, valor in resultado:
+                    if valor is not None:
+                        linhas.append(f"{nome}{_formatar_rotulos(metrica.rotulos, rotulos)} {_formatar_numero(valor)}")
+                continue
+            for rotulos, valor in sorted(valores.get(nome, []), key=lambda item: item[0]):
+                if isinstance(metrica, Histograma):
+                    acumulado = 0
+                    for limite, quantidade in zip(metrica.limites + (float('inf'),), valor[:-1]):
+                        acumulado += quantidade
+                        linhas.append(f"{nome}_bucket{_formatar_rotulos(metrica.rotulos, rotulos, ('le', _formatar_numero(float(limite))))} {acumulado}")
+                    linhas.append(f"{nome}_sum{_formatar_rotulos(metrica.rotulos, rotulos)} {_formatar_numero(valor[-1])}")
+                    linhas.append(f"{nome}_count{_formatar_rotulos(metrica.rotulos, rotulos)} {acumulado}")
+                else:
+                    linhas.append(f"{nome}{_formatar_rotulos(metrica.rotulos, rotulos)} {_formatar_numero(valor)}")
+        return '\n'.join(linhas) + '\n'
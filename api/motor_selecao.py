@@ -0,0 +1,105 @@
+# api/motor_selecao.py - Motor de seleção de riscos compilado em máscaras de bits
+"""
+Cada risco da base ocupa um bit de um inteiro. As regras de seleção são
+compiladas uma única vez (na carga da base) em pares de máscaras
+``(manter, incluir)``, de modo que aplicar uma regra a uma seleção é apenas
+``(selecao & manter) | incluir``. Regras aplicadas em sequência podem ser
+compostas em uma única regra equivalente.
+
+Os bits são atribuídos aos riscos já na ordem final de apresentação, então
+percorrer os bits ligados do menor para o maior devolve os riscos ordenados
+sem precisar de ``sort`` por requisição.
+"""
+
+
+class Regra:
+    """Regra compilada: ``selecao -> (selecao & manter) | incluir``."""
+
+    __slots__ = ('manter', 'incluir', 'mensagens')
+
+    def __init__(self, manter, incluir=0, mensagens=()):
+        self.manter = manter
+        self.incluir = incluir
+        self.mensagens = tuple(mensagens)
+
+    def aplicar(self, mascara):
+        return (mascara & self.manter) | self.incluir
+
+
+class MotorSelecao:
+    """Índice id → risco e compilação de regras sobre o espaço de bits dos riscos."""
+
+    def __init__(self, riscos, chave_ordenacao=None, codificador=None):
+        ordenados = sorted(riscos, key=chave_ordenacao) if chave_ordenacao else list(riscos)
+        self.riscos_por_bit = ordenados
+        self.bit_por_id = {}
+        for bit, risco in enumerate(ordenados):
+            self.bit_por_id.setdefault(risco.get('id'), bit)
+        self.risco_por_id = {risco.get('id'): risco for risco in ordenados}
+        # Fragmentos pré-codificados de cada risco (mesma ordem dos bits)
+        self.fragmentos_por_bit = [codificador(risco) for risco in ordenados] if codificador else []
+        self.fragmento_por_id = {
+            risco.get('id'): fragmento for risco, fragmento in zip(ordenados, self.fragmentos_por_bit)
+        }
+        self.mascara_total = (1 << len(ordenados)) - 1
+        self.identidade = Regra(self.mascara_total)
+
+    def mascara(self, ids):
+        """Converte uma coleção de IDs em máscara; IDs desconhecidos são ignorados."""
+        mascara = 0
+        bit_por_id = self.bit_por_id
+        for risco_id in ids or ():
+            bit = bit_por_id.get(risco_id)
+            if bit is not None:
+                mascara |= 1 << bit
+        return mascara
+
+    def regra(self, incluir=(), remover=(), mensagens=()):
+        """Compila "adicionar ``incluir`` e depois remover ``remover``" em uma Regra."""
+        manter = self.mascara_total & ~self.mascara(remover)
+        return Regra(manter, self.mascara(incluir) & manter, mensagens)
+
+    def compor(self, *regras):
+        """Compõe regras aplicadas em sequência (da esquerda para a direita) em uma só."""
+        manter, incluir, mensagens = self.mascara_total, 0, []
+        for regra in regras:
+            if regra is None:
+                continue
+            manter &= regra.manter
+            incluir = (incluir & regra.manter) | regra.incluir
+            mensagens.extend(regra.mensagens)
+        return Regra(manter, incluir, mensagens)
+
+    def unir(self, *regras):
+        """Une regras independentes: todas as inclusões antes de todas as remoções."""
+        manter, incluir, mensagens = self.mascara_total, 0, []
+        for regra in regras:
+            if regra is None:
+                continue
+            manter &= regra.manter
+            incluir |= regra.incluir
+            mensagens.extend(regra.mensagens)
+        return Regra(manter, incluir & manter, mensagens)
+
+    def ids(self, mascara):
+        """IDs dos riscos presentes na máscara, na ordem de apresentação."""
+        return [risco.get('id') for risco in self.selecionar(mascara)]
+
+    def bits(self, mascara):
+        """Posições dos bits ligados, do menor para o maior."""
+        posicoes = []
+        while mascara:
+            menor = mascara & -mascara
+            posicoes.append(menor.bit_length() - 1)
+            mascara ^= menor
+        return posicoes
+
+    def selecionar(self, mascara):
+        """Riscos presentes na máscara, na ordem de apresentação."""
+        riscos_por_bit = self.riscos_por_bit
+        return [riscos_por_bit[bit] for bit in self.bits(mascara)]
+
+    def fragmentos(self, mascara):
+        """Fragmentos pré-codificados dos riscos presentes na máscara, na ordem de apresentação."""
+        fragmentos_por_bit = self.fragmentos_por_bit
+        return [fragmentos_por_bit[bit] for bit in self.bits(mascara)]
@@ -0,0 +1,393 @@
+# api/pdf_riscos.py - Geração do PDF da matriz de riscos (ReportLab)
+"""
+Importado sob demanda por api/index.py: endpoints que não geram PDF não
+pagam a importação do ReportLab na partida a frio.
+
+Estilos, legenda e cabeçalho do relatório são construídos uma única vez. O
+conteúdo de cada risco (tabelas e parágrafos já interpretados) é guardado
+como modelo em cache, com chave (ID do risco, versão da base), e cada
+relatório usa cópias rasas desses modelos: montar um PDF passa a ser só
+composição e paginação. As quebras de linha dos parágrafos também são
+memorizadas por largura disponível e compartilhadas entre as cópias.
+"""
+import os
+import time
+from copy import copy
+from functools import lru_cache
+from io import BytesIO
+
+from cache_lru import CacheLRU
+from matriz_riscos import ESCALA, faixa_nivel
+
+# Importações para geração de PDF
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.colors import HexColor, black, white
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    from reportlab.lib.units import mm, inch
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+    from reportlab.pdfgen import canvas
+    from reportlab.graphics.shapes import Drawing, Group, Rect, String
+    REPORTLAB_AVAILABLE = True
+    print("ReportLab carregado com sucesso!")
+except ImportError as e:
+    print(f"ERRO: ReportLab não está instalado ou há problema na importação: {e}")
+    REPORTLAB_AVAILABLE = False
+
+# Modelos de conteúdo por (ID do risco, versão da base)
+FRAGMENTOS_RISCO = CacheLRU(int(os.environ.get("RISCOS_CACHE_FRAGMENTOS_PDF", 512)))
+
+def obter_cor_risco(nivel_risco):
+    """Retorna a cor correspondente ao nível de risco."""
+    if nivel_risco >= 15:
+        return HexColor('#fef2f2'), HexColor('#dc2626')  # bg-red-50, text-red-600
+    elif nivel_risco >= 8:
+        return HexColor('#fff7ed'), HexColor('#ea580c')  # bg-orange-50, text-orange-600
+    elif nivel_risco >= 3:
+        return HexColor('#fefce8'), HexColor('#ca8a04')  # bg-yellow-50, text-yellow-600
+    else:
+        return HexColor('#eff6ff'), HexColor('#2563eb')  # bg-blue-50, text-blue-600
+
+def obter_texto_nivel_risco(nivel_risco, classificacao=None):
+    """Retorna o texto do nível de risco."""
+    if classificacao:
+        return f"{classificacao} ({nivel_risco})"
+    if nivel_risco >= 15:
+        return f"Extremo ({nivel_risco})"
+    elif nivel_risco >= 8:
+        return f"Alto ({nivel_risco})"
+    elif nivel_risco >= 3:
+        return f"Moderado ({nivel_risco})"
+    else:
+        return f"Baixo ({nivel_risco})"
+
+if REPORTLAB_AVAILABLE:
+    class ParagrafoMemorizado(Paragraph):
+        """
+        Paragraph que memoriza a quebra de linhas por largura disponível. Cópias
+        rasas compartilham a memória; parágrafos novos (inclusive os criados
+        por split) começam com memória própria.
+        """
+
+        def __init__(self, *args, **kwargs):
+            Paragraph.__init__(self, *args, **kwargs)
+            self._quebras = {}
+
+        def wrap(self, availWidth, availHeight):
+            memorizado = self._quebras.get(availWidth)
+            if memorizado is None:
+                resultado = Paragraph.wrap(self, availWidth, availHeight)
+                if availWidth >= 1e-8:
+                    self._quebras[availWidth] = (self._wrapWidths, self.blPara, self.height)
+                return resultado
+            self.width = availWidth
+            self._wrapWidths, self.blPara, self.height = memorizado
+            return self.width, self.height
+
+def criar_estilos():
+    """Estilos de parágrafo e de tabela do relatório (construídos uma vez por processo)."""
+    styles = getSampleStyleSheet()
+    return {
+        'titulo': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=12,
+            textColor=HexColor('#1e3a8a'),
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'subtitulo': ParagraphStyle(
+            'CustomSubtitle',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceAfter=10,
+            textColor=HexColor('#374151'),
+            alignment=TA_CENTER
+        ),
+        'risco_titulo': ParagraphStyle(
+            'RiscoTitulo',
+            parent=styles['Heading3'],
+            fontSize=12,
+            spaceAfter=6,
+            textColor=black,
+            fontName='Helvetica-Bold'
+        ),
+        'risco_texto': ParagraphStyle(
+            'RiscoTexto',
+            parent=styles['Normal'],
+            fontSize=9,
+            spaceAfter=4,
+            alignment=TA_JUSTIFY,
+            leading=11
+        ),
+        'mitigacao': ParagraphStyle(
+            'MitigacaoStyle',
+            parent=styles['Normal'],
+            fontSize=9,
+            spaceAfter=3,
+            alignment=TA_JUSTIFY,
+            leading=10
+        ),
+        'legenda': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f3f4f6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), white),
+            ('GRID', (0, 0), (-1, -1), 1, black)
+        ]),
+        'prob_impacto': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), HexColor('#f3f4f6')),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('GRID', (0, 0), (-1, -1), 1, HexColor('#d1d5db'))
+        ])
+    }
+
+@lru_cache(maxsize=None)
+def estilo_cabecalho(nivel_risco):
+    """Estilo da tabela de cabeçalho de um risco, nas cores do seu nível."""
+    bg_color, text_color = obter_cor_risco(nivel_risco)
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), bg_color),
+        ('TEXTCOLOR', (0, 0), (-1, -1), text_color),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('GRID', (0, 0), (-1, -1), 1, text_color)
+    ])
+
+def criar_abertura():
+    """Cabeçalho do relatório e legenda dos níveis de risco (modelos, iguais em todo PDF)."""
+    legenda_data = [
+        ['Nível de Risco', 'Pontuação', 'Descrição'],
+        ['Extremo', '15-25', 'Impacto máximo nos objetivos, sem possibilidade de recuperação'],
+        ['Alto', '8-14', 'Impacto significativo, com possibilidade mínima de recuperação'],
+        ['Moderado', '3-7', 'Impacto moderado, com plena possibilidade de recuperação'],
+        ['Baixo', '1-2', 'Impacto mínimo nos objetivos']
+    ]
+    legenda_table = Table(legenda_data, colWidths=[30*mm, 20*mm, 120*mm])
+    legenda_table.setStyle(ESTILOS['legenda'])
+
+    return (
+        ParagrafoMemorizado("MATRIZ DE RISCO - SESP/PR", ESTILOS['titulo']),
+        ParagrafoMemorizado("Centro de Engenharia e Arquitetura", ESTILOS['subtitulo']),
+        Spacer(1, 10*mm),
+        ParagrafoMemorizado("<b>Legenda dos Níveis de Risco:</b>", ESTILOS['risco_titulo']),
+        legenda_table,
+        Spacer(1, 8*mm),
+        ParagrafoMemorizado("<b>RISCOS IDENTIFICADOS</b>", ESTILOS['titulo']),
+        Spacer(1, 6*mm)
+    )
+
+def montar_fragmentos_risco(risco):
+    """Flowables do bloco de um risco: cabeçalho, probabilidade/impacto e textos."""
+    nivel_texto = obter_texto_nivel_risco(risco.get('nivel_risco', 0), risco.get('classificacao'))
+
+    # Informações do cabeçalho
+    cabecalho_data = [[
+        f"#{risco.get('id', 'N/A')}",
+        nivel_texto,
+        risco.get('fase', 'N/A'),
+        risco.get('responsavel', 'N/A')
+    ]]
+    cabecalho_table = Table(cabecalho_data, colWidths=[20*mm, 40*mm, 60*mm, 50*mm])
+    cabecalho_table.setStyle(estilo_cabecalho(risco.get('nivel_risco', 0)))
+
+    # Probabilidade e Impacto logo após o cabeçalho
+    prob_impacto_data = [
+        ['Probabilidade', 'Impacto'],
+        [f"{risco.get('probabilidade', 0)}/5", f"{risco.get('impacto_nivel', 0)}/5"]
+    ]
+    prob_impacto_table = Table(prob_impacto_data, colWidths=[85*mm, 85*mm])
+    prob_impacto_table.setStyle(ESTILOS['prob_impacto'])
+
+    fragmentos = [
+        cabecalho_table,
+        Spacer(1, 2*mm),
+        prob_impacto_table,
+        Spacer(1, 3*mm),
+        ParagrafoMemorizado(f"<b>{risco.get('evento', 'N/A')}</b>", ESTILOS['risco_titulo']),
+        ParagrafoMemorizado(f"<b>Descrição:</b> {risco.get('descricao', 'N/A')}", ESTILOS['risco_texto'])
+    ]
+    if risco.get('impacto'):
+        fragmentos.append(ParagrafoMemorizado(f"<b>Impacto:</b> {risco.get('impacto')}", ESTILOS['risco_texto']))
+
+    # Mitigação e Correção (uma linha cada)
+    fragmentos.append(Spacer(1, 3*mm))
+    fragmentos.append(ParagrafoMemorizado(f"<b>Mitigação:</b> {risco.get('mitigacao', 'N/A')}", ESTILOS['mitigacao']))
+    fragmentos.append(ParagrafoMemorizado(f"<b>Correção:</b> {risco.get('correcao', 'N/A')}", ESTILOS['mitigacao']))
+    return tuple(fragmentos)
+
+def fragmentos_risco(risco, chave=None):
+    """
+    Flowables de um risco prontos para uma story. Com `chave` (ID, versão da
+    base) os modelos vêm do cache e são copiados; sem chave (risco que não
+    corresponde à base) são montados na hora.
+    """
+    if chave is None:
+        return montar_fragmentos_risco(risco)
+    modelos = FRAGMENTOS_RISCO.obter(chave)
+    if modelos is None:
+        modelos = montar_fragmentos_risco(risco)
+        FRAGMENTOS_RISCO.guardar(chave, modelos)
+    return [copy(modelo) for modelo in modelos]
+
+def desenho_matriz(grade, celula=None):
+    """
+    Figura da matriz 5×5 (matriz_riscos.montar_grade): probabilidade no eixo
+    vertical (5 no topo), impacto no horizontal, cada célula com a cor da sua
+    faixa, a quantidade de riscos e o nível. O mesmo Drawing vai para o PDF
+    (é um flowable) e é exportado como SVG/PNG.
+    """
+    celula = celula or 18*mm
+    margem_esquerda, margem_inferior, margem_superior = 16*mm, 14*mm, 4*mm
+    lado = celula * len(ESCALA)
+    desenho = Drawing(margem_esquerda + lado + 2*mm, margem_inferior + lado + margem_superior)
+
+    for linha, probabilidade in enumerate(ESCALA):
+        y = margem_inferior + linha * celula
+        desenho.add(String(margem_esquerda - 3*mm, y + celula / 2 - 3, str(probabilidade),
+                           fontName='Helvetica-Bold', fontSize=9, textAnchor='middle'))
+        for coluna, impacto in enumerate(ESCALA):
+            x = margem_esquerda + coluna * celula
+            nivel = probabilidade * impacto
+            _, fundo, texto, borda = faixa_nivel(nivel)
+            quantidade = grade["contagens"][probabilidade - 1][impacto - 1]
+            desenho.add(Rect(x, y, celula, celula, fillColor=HexColor(fundo),
+                             strokeColor=HexColor(borda), strokeWidth=1))
+            desenho.add(String(x + celula / 2, y + celula / 2 - 2, str(quantidade) if quantidade else '–',
+                               fontName='Helvetica-Bold', fontSize=14 if quantidade else 10,
+                               fillColor=HexColor(texto), textAnchor='middle'))
+            desenho.add(String(x + celula - 2*mm, y + 2*mm, str(nivel), fontName='Helvetica',
+                               fontSize=6, fillColor=HexColor(texto), textAnchor='end'))
+
+    for coluna, impacto in enumerate(ESCALA):
+        desenho.add(String(margem_esquerda + coluna * celula + celula / 2, margem_inferior - 4*mm, str(impacto),
+                           fontName='Helvetica-Bold', fontSize=9, textAnchor='middle'))
+    desenho.add(String(margem_esquerda + lado / 2, 2*mm, 'Impacto', fontName='Helvetica', fontSize=9,
+                       textAnchor='middle'))
+    rotulo_vertical = Group(String(0, 0, 'Probabilidade', fontName='Helvetica', fontSize=9, textAnchor='middle'))
+    rotulo_vertical.transform = (0, 1, -1, 0, 5*mm, margem_inferior + lado / 2)
+    desenho.add(rotulo_vertical)
+    return desenho
+
+def flowables_matriz(grade):
+    """Título e figura da matriz para a story do relatório."""
+    desenho = desenho_matriz(grade)
+    desenho.hAlign = 'CENTER'
+    return [
+        ParagrafoMemorizado("<b>Matriz de Probabilidade × Impacto:</b>", ESTILOS['risco_titulo']),
+        desenho,
+        Spacer(1, 8*mm)
+    ]
+
+def renderizar_matriz(grade, formato):
+    """
+    Bytes da figura da matriz em 'svg' ou 'png'. O PNG depende de um backend
+    do renderPM (rlPyCairo); sem ele, levanta a exceção do ReportLab.
+    """
+    if not REPORTLAB_AVAILABLE:
+        raise Exception("ReportLab não está instalado. Instale com: pip install reportlab")
+    desenho = desenho_matriz(grade)
+    if formato == 'svg':
+        from reportlab.graphics import renderSVG
+        return renderSVG.drawToString(desenho).encode('utf-8')
+    from reportlab.graphics import renderPM
+    return renderPM.drawToString(desenho, fmt='PNG', dpi=144)
+
+if REPORTLAB_AVAILABLE:
+    ESTILOS = criar_estilos()
+    ABERTURA = criar_abertura()
+
+class HistoriaIncremental(list):
+    """
+    Story do platypus alimentada por um gerador de blocos de flowables.
+
+    ``doc.build`` consome a story pela frente (``del story[0]``) e testa
+    ``len(story)`` a cada passo; aqui o próximo bloco só é materializado
+    quando os anteriores já foram desenhados, então a memória ocupada pela
+    story não cresce com o número de riscos. Encadeamentos keepWithNext
+    valem dentro de um bloco, que é sempre um risco inteiro.
+    """
+
+    def __init__(self, blocos):
+        list.__init__(self)
+        self._blocos = iter(blocos)
+
+    def __len__(self):
+        while not list.__len__(self) and self._blocos is not None:
+            bloco = next(self._blocos, None)
+            if bloco is None:
+                self._blocos = None
+            else:
+                self.extend(bloco)
+        return list.__len__(self)
+
+def blocos_historia(riscos_selecionados, chaves, matriz=None):
+    """Gera a story em blocos: abertura (com a matriz 5×5, se houver) e um bloco por risco."""
+    abertura = [copy(modelo) for modelo in ABERTURA]
+    if matriz is not None:
+        # Entre a legenda e o título "RISCOS IDENTIFICADOS" (os dois últimos modelos)
+        abertura[-2:-2] = flowables_matriz(matriz)
+    yield abertura
+
+    total = len(riscos_selecionados)
+    for i, (risco, chave) in enumerate(zip(riscos_selecionados, chaves)):
+        bloco = [Spacer(1, 6*mm)] if i > 0 else []
+        bloco.extend(fragmentos_risco(risco, chave))
+
+        # Adicionar quebra de página a cada 3 riscos para melhor legibilidade
+        if (i + 1) % 3 == 0 and i < total - 1:
+            bloco.append(PageBreak())
+        yield bloco
+
+def gerar_pdf_riscos(dados_projeto, riscos_selecionados, metadados_selecao, chaves=None, destino=None, matriz=None):
+    """
+    Gera o PDF com a matriz de riscos. `chaves`, se informado, traz para cada
+    risco a chave de cache (ID, versão da base) ou None; `matriz`, se
+    informada, é a grade 5×5 (matriz_riscos.montar_grade) desenhada após a
+    legenda. O PDF é escrito em
+    `destino` (arquivo binário, ex.: SpooledTemporaryFile) ou em um BytesIO,
+    que é retornado posicionado no início.
+    """
+
+    if not REPORTLAB_AVAILABLE:
+        raise Exception("ReportLab não está instalado. Instale com: pip install reportlab")
+
+    # Criar buffer para o PDF
+    buffer = destino if destino is not None else BytesIO()
+
+    # Configurar o documento
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=20*mm, leftMargin=20*mm,
+                           topMargin=25*mm, bottomMargin=25*mm)
+
+    if chaves is None:
+        chaves = [None] * len(riscos_selecionados)
+
+    # Gerar o PDF
+    doc.build(HistoriaIncremental(blocos_historia(riscos_selecionados, chaves, matriz)))
+
+    # Retornar o buffer
+    buffer.seek(0)
+    return buffer
+
+def renderizar_pdf_bytes(dados_projeto, riscos_selecionados, metadados_selecao, chaves=None, matriz=None):
+    """Como gerar_pdf_riscos, mas retorna os bytes (usado pelos processos do lote)."""
+    return gerar_pdf_riscos(dados_projeto, riscos_selecionados, metadados_selecao, chaves, matriz=matriz).getvalue()
+
+def renderizar_pdf_medido(dados_projeto, riscos_selecionados, metadados_selecao, chaves=None, matriz=None):
+    """Como renderizar_pdf_bytes, mas retorna (bytes, segundos de renderização) para as métricas do processo pai."""
+    inicio = time.perf_counter()
+    pdf = renderizar_pdf_bytes(dados_projeto, riscos_selecionados, metadados_selecao, chaves, matriz)
+    return pdf, time.perf_counter() - inicio
@@ -0,0 +1,92 @@
+# api/rastreamento.py - Rastreamento opcional de etapas por requisição
+"""
+Desligado por padrão: cada requisição recebe RASTRO_INATIVO, cujos métodos
+não fazem nada, então o caminho quente paga só chamadas vazias. O rastro é
+ativado por requisição (cabeçalho ``X-Riscos-Trace: 1`` ou ``?trace=1``) ou
+por amostragem (RISCOS_TRACE_AMOSTRAGEM, fração de 0 a 1).
+
+As etapas são medidas como voltas de cronômetro: ``marcar(etapa)`` soma à
+etapa o tempo desde a marca anterior, e ``retomar()`` descarta o intervalo
+que não pertence a nenhuma etapa. O rastro vira um cabeçalho Server-Timing e
+uma linha JSON no logger 'riscos.rastro'.
+"""
+import json
+import logging
+import random
+import sys
+import time
+
+LOGGER = logging.getLogger('riscos.rastro')
+if not LOGGER.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    LOGGER.addHandler(_handler)
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False
+
+
+class RastroInativo:
+    """Rastro desligado: todas as operações são vazias."""
+
+    ativo = False
+
+    def marcar(self, etapa):
+        pass
+
+    def retomar(self):
+        pass
+
+    def anotar(self, **atributos):
+        pass
+
+
+RASTRO_INATIVO = RastroInativo()
+
+
+class Rastro:
+    """Tempos por etapa e atributos de uma requisição rastreada."""
+
+    ativo = True
+
+    def __init__(self, motivo):
+        self.motivo = motivo
+        self.inicio = self._marco = time.perf_counter()
+        self.etapas = {}
+        self.atributos = {}
+
+    def marcar(self, etapa):
+        agora = time.perf_counter()
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + agora - self._marco
+        self._marco = agora
+
+    def retomar(self):
+        self._marco = time.perf_counter()
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing (durações em ms, mais o total)."""
+        metricas = [f"{etapa};dur={segundos * 1000:.3f}" for etapa, segundos in self.etapas.items()]
+        metricas.append(f"total;dur={(time.perf_counter() - self.inicio) * 1000:.3f}")
+        return ', '.join(metricas)
+
+    def registrar(self, **campos):
+        """Emite o rastro como uma linha JSON."""
+        LOGGER.info(json.dumps({
+            "evento": "rastro",
+            "motivo": self.motivo,
+            **campos,
+            "total_ms": round((time.perf_counter() - self.inicio) * 1000, 3),
+            "etapas_ms": {etapa: round(segundos * 1000, 3) for etapa, segundos in self.etapas.items()},
+            **self.atributos
+        }, ensure_ascii=False, default=str))
+
+
+def iniciar_rastro(solicitado, amostragem=0.0):
+    """Rastro da requisição: ativo se solicitado ou sorteado pela amostragem."""
+    if solicitado:
+        return Rastro('solicitado')
+    if amostragem > 0 and random.random() < amostragem:
+        return Rastro('amostragem')
+    return RASTRO_INATIVO
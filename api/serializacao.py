@@ -0,0 +1,76 @@
+# api/serializacao.py - Montagem de respostas JSON a partir de fragmentos pré-codificados
+import gzip
+import json
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+def codificar(dados):
+    """Codifica um objeto em JSON UTF-8 compacto."""
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def lista_json(fragmentos):
+    """Array JSON a partir de elementos já codificados."""
+    return b'[' + b','.join(fragmentos) + b']'
+
+
+def objeto_json(itens):
+    """Objeto JSON a partir de pares (chave, valor já codificado)."""
+    return b'{' + b','.join(codificar(chave) + b':' + valor for chave, valor in itens) + b'}'
+
+
+def montar_json(dados, **fragmentos):
+    """
+    Codifica ``dados`` e insere, como chaves adicionais do objeto raiz, os
+    ``fragmentos`` já codificados em bytes (que não são recodificados).
+    """
+    corpo = codificar(dados)
+    if not fragmentos:
+        return corpo
+    prefixo = objeto_json(fragmentos.items())
+    if corpo == b'{}':
+        return prefixo
+    return prefixo[:-1] + b',' + corpo[1:]
+
+
+class SaidaFluxo:
+    """
+    Destino de escrita não posicionável que acumula bytes até serem retirados
+    com ``esvaziar()``; permite gerar um ZIP (zipfile) em partes durante a resposta.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def comprimir(corpo):
+    """Variantes do corpo por Content-Encoding: identity, gzip e (se disponível) br."""
+    variantes = {'identity': corpo, 'gzip': gzip.compress(corpo, compresslevel=9, mtime=0)}
+    if BROTLI_AVAILABLE:
+        variantes['br'] = brotli.compress(corpo, quality=11)
+    return variantes
+
+
+def escolher_codificacao(accept_encodings, variantes):
+    """Escolhe a melhor variante aceita pelo cliente (br > gzip > identity)."""
+    for codificacao in ('br', 'gzip'):
+        if codificacao in variantes and accept_encodings[codificacao]:
+            return codificacao
+    return 'identity'
@@ -0,0 +1,134 @@
+# api/similaridade.py - Riscos relacionados por similaridade textual (TF-IDF)
+"""
+Cada risco vira um vetor TF-IDF dos seus textos (evento, descrição, impacto,
+mitigação, correção) e da categoria. Os termos passam pela mesma dobra da
+busca textual (sem acentos, minúsculas) e são reduzidos aos primeiros
+caracteres, o que aproxima plurais e flexões ("licitação"/"licitações"). A
+categoria entra também como um termo único, então riscos da mesma categoria
+ganham afinidade mesmo com vocabulário diferente.
+
+A similaridade de cosseno entre todos os pares é calculada uma vez: com NumPy
+(produto matricial denso) quando disponível, ou por produtos esparsos em
+Python puro. Só as listas dos k vizinhos mais próximos de cada risco ficam
+guardadas.
+"""
+import heapq
+import math
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from busca_textual import dobrar, termos
+
+CAMPOS_SIMILARIDADE = {'evento': 2.0, 'descricao': 1.0, 'impacto': 1.0, 'mitigacao': 0.5, 'correcao': 0.5}
+PESO_CATEGORIA = 2.0
+TAMANHO_RADICAL = 6
+
+
+def vetor_termos(risco):
+    """Frequências ponderadas dos termos do risco (antes do idf)."""
+    frequencias = {}
+    for campo, peso in CAMPOS_SIMILARIDADE.items():
+        texto = risco.get(campo)
+        if isinstance(texto, str):
+            for termo in termos(dobrar(texto)):
+                radical = termo[:TAMANHO_RADICAL]
+                frequencias[radical] = frequencias.get(radical, 0.0) + peso
+    categoria = risco.get('categoria')
+    if isinstance(categoria, str) and categoria:
+        chave = 'categoria:' + dobrar(categoria)
+        frequencias[chave] = frequencias.get(chave, 0.0) + PESO_CATEGORIA
+    # tf sublinear: termos repetidos não dominam o vetor
+    return {termo: 1.0 + math.log(frequencia) if frequencia >= 1 else frequencia
+            for termo, frequencia in frequencias.items()}
+
+
+class SimilaridadeRiscos:
+    """Vizinhos mais próximos de cada risco, calculados uma vez na construção."""
+
+    def __init__(self, riscos, k_maximo=20, usar_numpy=NUMPY_AVAILABLE):
+        self.riscos = list(riscos)
+        self.k_maximo = k_maximo
+        self.posicao_por_id = {risco.get('id'): posicao for posicao, risco in enumerate(self.riscos)}
+        self.implementacao = 'numpy' if usar_numpy else 'python'
+
+        vetores = [vetor_termos(risco) for risco in self.riscos]
+        documentos = {}
+        for vetor in vetores:
+            for termo in vetor:
+                documentos[termo] = documentos.get(termo, 0) + 1
+        total = len(vetores)
+        idf = {termo: math.log((1 + total) / (1 + quantidade)) + 1 for termo, quantidade in documentos.items()}
+        for vetor in vetores:
+            for termo in vetor:
+                vetor[termo] *= idf[termo]
+            norma = math.sqrt(sum(peso * peso for peso in vetor.values())) or 1.0
+            for termo in vetor:
+                vetor[termo] /= norma
+        self.termos = len(idf)
+
+        if usar_numpy:
+            self.vizinhos = self._vizinhos_numpy(vetores, sorted(idf))
+        else:
+            self.vizinhos = self._vizinhos_python(vetores)
+
+    def _vizinhos_numpy(self, vetores, vocabulario):
+        coluna = {termo: indice for indice, termo in enumerate(vocabulario)}
+        matriz = np.zeros((len(vetores), len(vocabulario)))
+        for linha, vetor in enumerate(vetores):
+            for termo, peso in vetor.items():
+                matriz[linha, coluna[termo]] = peso
+        similaridades = matriz @ matriz.T
+        np.fill_diagonal(similaridades, -1.0)
+
+        vizinhos = []
+        for linha in similaridades:
+            # Ordenação estável: no empate vence a posição menor
+            ordem = np.argsort(-linha, kind='stable')[:self.k_maximo]
+            vizinhos.append([(int(j), float(linha[j])) for j in ordem if linha[j] > 0])
+        return vizinhos
+
+    def _vizinhos_python(self, vetores):
+        postagens = {}
+        for posicao, vetor in enumerate(vetores):
+            for termo, peso in vetor.items():
+                postagens.setdefault(termo, []).append((posicao, peso))
+
+        vizinhos = []
+        for posicao, vetor in enumerate(vetores):
+            produtos = {}
+            for termo, peso in vetor.items():
+                for outra, outro_peso in postagens[termo]:
+                    if outra != posicao:
+                        produtos[outra] = produtos.get(outra, 0.0) + peso * outro_peso
+            melhores = heapq.nsmallest(self.k_maximo, produtos.items(), key=lambda item: (-item[1], item[0]))
+            vizinhos.append([(outra, valor) for outra, valor in melhores if valor > 0])
+        return vizinhos
+
+    def similares(self, risk_id, k=5):
+        """[(risco, similaridade)] dos k riscos mais próximos, ou None se o ID não existe."""
+        posicao = self.posicao_por_id.get(risk_id)
+        if posicao is None:
+            return None
+        return [(self.riscos[outra], valor) for outra, valor in self.vizinhos[posicao][:k]]
+
+    def sugestoes(self, risk_ids, k=10):
+        """
+        Riscos fora do conjunto mais relacionados a ele: soma das similaridades
+        com os riscos do conjunto (entre os vizinhos guardados de cada um).
+        Retorna [(risco, pontuação, [IDs do conjunto relacionados])].
+        """
+        conjunto = {self.posicao_por_id[i] for i in risk_ids if i in self.posicao_por_id}
+        pontuacoes = {}
+        origens = {}
+        for posicao in sorted(conjunto):
+            for outra, valor in self.vizinhos[posicao]:
+                if outra in conjunto:
+                    continue
+                pontuacoes[outra] = pontuacoes.get(outra, 0.0) + valor
+                origens.setdefault(outra, []).append(self.riscos[posicao].get('id'))
+        melhores = heapq.nsmallest(k, pontuacoes.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.riscos[outra], valor, origens[outra]) for outra, valor in melhores]
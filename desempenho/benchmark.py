@@ -0,0 +1,263 @@
+# desempenho/benchmark.py - Benchmarks em processo da API de riscos
+"""
+Mede, sem servidor e sem rede, os caminhos que mais pesam na API:
+
+- seleção de riscos sobre todo o espaço de critérios (cálculo puro, cache
+  e a requisição /api/project-risks completa);
+- montagem e serialização de /api/all-risks;
+- geração de PDF com 10, 30, 60 e 88 riscos;
+- carga da base a partir do disco (JSON e snapshot) e compilação das regras.
+
+Para cada benchmark: operações por segundo, latência p50/p99 e pico de
+memória alocada por operação (tracemalloc, medido em execuções separadas
+para não distorcer os tempos). Os resultados podem ser gravados como linha
+de base (--salvar) e comparados depois (--comparar): pioras de p50, ops/s ou
+alocação acima do limiar são marcadas como regressão e o processo termina
+com status 1.
+
+Uso:
+    python desempenho/benchmark.py
+    python desempenho/benchmark.py --filtro pdf --salvar base.json
+    python desempenho/benchmark.py --comparar base.json --limiar 0.15 --rodadas 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from itertools import combinations, product
+
+DIRETORIO_API = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, os.path.abspath(DIRETORIO_API))
+
+# Cache de PDFs em disco desligado: o benchmark mede a renderização
+os.environ.setdefault("RISCOS_CACHE_PDF_MB", "0")
+os.environ.setdefault("RISCOS_PRECOMPUTAR", "0")
+
+TAMANHOS_PDF = (10, 30, 60, 88)
+
+
+def percentil(ordenados, fracao):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(fracao * (len(ordenados) - 1))))]
+
+
+def medir(funcao, entradas, tempo_minimo, execucoes_minimas, amostras_alocacao=5):
+    """Executa `funcao` ciclando pelas entradas e retorna as estatísticas do benchmark."""
+    funcao(entradas[0])  # aquecimento
+    latencias = []
+    inicio = time.perf_counter()
+    while len(latencias) < execucoes_minimas or time.perf_counter() - inicio < tempo_minimo:
+        entrada = entradas[len(latencias) % len(entradas)]
+        antes = time.perf_counter()
+        funcao(entrada)
+        latencias.append(time.perf_counter() - antes)
+    decorrido = time.perf_counter() - inicio
+
+    picos = []
+    tracemalloc.start()
+    try:
+        for entrada in entradas[:amostras_alocacao]:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            funcao(entrada)
+            picos.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    latencias.sort()
+    picos.sort()
+    return {
+        "execucoes": len(latencias),
+        "ops_s": round(len(latencias) / decorrido, 2),
+        "p50_ms": round(percentil(latencias, 0.50) * 1000, 4),
+        "p99_ms": round(percentil(latencias, 0.99) * 1000, 4),
+        "alocacao_pico_kb": round(percentil(picos, 0.50) / 1024, 2)
+    }
+
+
+def carregar_api():
+    """Importa a API (silenciando os avisos da carga) e o módulo de PDF."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import index
+        index.modulo_pdf()
+    return index
+
+
+def espaco_criterios(index, max_caracteristicas=1):
+    """Critérios canônicos de todo o espaço: unidades × intervenções × regimes × faixas × características."""
+    regras = index.REGRAS_COMPILADAS
+    caracteristicas = [
+        combinacao
+        for tamanho in range(max_caracteristicas + 1)
+        for combinacao in combinations(sorted(regras['caracteristicas']), tamanho)
+    ]
+    return [
+        (forca, tipo_unidade, intervencao, regime, faixa, caracteristica, (), ())
+        for (forca, tipo_unidade), intervencao, regime, faixa, caracteristica in product(
+            regras['tipo_obra_por_unidade'], regras['intervencoes'], regras['regimes'],
+            regras['faixas_chaves'], caracteristicas
+        )
+    ]
+
+
+def projeto_de_criterios(index, criterios):
+    """Corpo de /api/project-risks equivalente aos critérios canônicos."""
+    forca, tipo_unidade, intervencao, regime, faixa, caracteristicas, _, _ = criterios
+    regras = index.REGRAS_COMPILADAS
+    limite = regras['faixas_limites'][regras['faixas_chaves'].index(faixa)]
+    return {
+        "forca": forca,
+        "tipoUnidade": tipo_unidade,
+        "tipoIntervencao": intervencao,
+        "regimeExecucao": regime,
+        "valor": regras['faixas_limites'][-2] * 2 if limite == float('inf') else limite,
+        "caracteristicas": list(caracteristicas)
+    }
+
+
+def definir_benchmarks(index):
+    """{nome: (função, entradas, tempo mínimo em s, execuções mínimas)}."""
+    import base_dados
+
+    criterios = espaco_criterios(index)
+    # Cabe no cache LRU de resultados: mede o caminho de acerto
+    projetos = [projeto_de_criterios(index, c) for c in criterios[::max(1, len(criterios) // 256)]][:256]
+    cliente = index.app.test_client()
+    riscos = index.REGRAS_COMPILADAS['motor'].riscos_por_bit
+    motor = index.REGRAS_COMPILADAS['motor']
+    dados_projeto = {"forca": "Polícia Civil", "tipoUnidade": "Delegacia Padrão I"}
+
+    def requisicao(metodo, url, **opcoes):
+        def executar(corpo):
+            resposta = cliente.open(url, method=metodo, json=corpo, **opcoes)
+            if resposta.status_code != 200:
+                raise RuntimeError(f"{url}: status {resposta.status_code}")
+            resposta.get_data()
+        return executar
+
+    def pdf(quantidade):
+        def executar(_):
+            index.gerar_pdf_riscos(dados_projeto, riscos[:quantidade], {}).close()
+        return executar
+
+    def carga(caminho_snapshot):
+        def executar(_):
+            base, _, _ = base_dados.carregar_base(index.JSON_FILE_PATH, caminho_snapshot)
+            if not base.get('riscos'):
+                raise RuntimeError("base vazia")
+        return executar
+
+    benchmarks = {
+        "selecao_calculada": (index.calcular_selecao, criterios, 1.0, len(criterios)),
+        "selecao_cache": (index.processar_criterios_cea, projetos, 1.0, 1000),
+        "http_project_risks": (requisicao('POST', '/api/project-risks'), projetos, 1.0, 500),
+        "http_all_risks": (requisicao('GET', '/api/all-risks'), [None], 1.0, 500),
+        "http_all_risks_filtrado": (
+            requisicao('GET', '/api/all-risks?shape=flat&fields=id,evento,nivel_risco&nivel=alto,extremo'), [None], 1.0, 500
+        ),
+        "catalogo_montagem": (lambda formato: index.montar_catalogo(motor.mascara_total, formato),
+                              ['completo', 'grouped', 'flat'], 1.0, 100),
+        **{f"pdf_{n}_riscos": (pdf(n), [None], 2.0, 5) for n in TAMANHOS_PDF if n <= len(riscos)},
+        "carga_base_json": (carga(None), [None], 1.0, 20),
+        "carga_base_snapshot": (carga(index.SNAPSHOT_FILE_PATH), [None], 1.0, 20),
+        "compilacao_regras": (lambda _: index.compilar_regras(index.RISK_DATABASE), [None], 1.0, 20),
+    }
+    return benchmarks
+
+
+def comparar(atual, linha_base, limiar):
+    """Lista de (benchmark, métrica, valor base, valor atual, variação, regressão?)."""
+    comparacoes = []
+    for nome, resultado in atual.items():
+        base = linha_base.get(nome)
+        if not base:
+            continue
+        for metrica, pior_se_maior in (("p50_ms", True), ("ops_s", False), ("alocacao_pico_kb", True)):
+            anterior, valor = base.get(metrica), resultado.get(metrica)
+            if not anterior or valor is None:
+                continue
+            variacao = valor / anterior - 1
+            piora = variacao if pior_se_maior else -variacao
+            # Alocações abaixo de 1 KB de diferença são ruído
+            relevante = metrica != "alocacao_pico_kb" or abs(valor - anterior) >= 1
+            comparacoes.append((nome, metrica, anterior, valor, variacao, relevante and piora > limiar))
+    return comparacoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks em processo da API de riscos.")
+    parser.add_argument('--filtro', action='append', default=[],
+                        help="executa só benchmarks cujo nome contém o texto (pode repetir)")
+    parser.add_argument('--tempo', type=float, default=None, help="tempo mínimo por benchmark, em segundos")
+    parser.add_argument('--rodadas', type=int, default=1,
+                        help="repete cada benchmark e fica com a rodada de menor p50 (reduz ruído)")
+    parser.add_argument('--salvar', metavar='ARQUIVO', help="grava os resultados como linha de base")
+    parser.add_argument('--comparar', metavar='ARQUIVO', help="compara com uma linha de base gravada")
+    parser.add_argument('--limiar', type=float, default=0.10, help="piora relativa considerada regressão (padrão 0.10)")
+    parser.add_argument('--listar', action='store_true', help="lista os benchmarks e sai")
+    args = parser.parse_args(argv)
+
+    index = carregar_api()
+    benchmarks = definir_benchmarks(index)
+    if args.listar:
+        print('\n'.join(benchmarks))
+        return 0
+    selecionados = {
+        nome: definicao for nome, definicao in benchmarks.items()
+        if not args.filtro or any(filtro in nome for filtro in args.filtro)
+    }
+
+    linha_base = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            linha_base = json.load(f)["resultados"]
+
+    resultados = {}
+    print(f"{'benchmark':<26} {'execuções':>9} {'ops/s':>11} {'p50 ms':>10} {'p99 ms':>10} {'aloc. KB':>10}")
+    for nome, (funcao, entradas, tempo_minimo, execucoes_minimas) in selecionados.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = min(
+                (medir(funcao, entradas, args.tempo if args.tempo is not None else tempo_minimo, execucoes_minimas)
+                 for _ in range(max(1, args.rodadas))),
+                key=lambda rodada: rodada["p50_ms"]
+            )
+        resultados[nome] = resultado
+        print(f"{nome:<26} {resultado['execucoes']:>9} {resultado['ops_s']:>11.1f} {resultado['p50_ms']:>10.3f} "
+              f"{resultado['p99_ms']:>10.3f} {resultado['alocacao_pico_kb']:>10.1f}")
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as f:
+            json.dump({
+                "ambiente": {
+                    "python": platform.python_version(),
+                    "plataforma": platform.platform(),
+                    "cpus": os.cpu_count(),
+                    "versao_base": index.versao_base(),
+                    "data": time.strftime('%Y-%m-%dT%H:%M:%S')
+                },
+                "resultados": resultados
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nLinha de base gravada em {args.salvar}")
+
+    if linha_base is not None:
+        regressoes = 0
+        print(f"\nComparação com {args.comparar} (limiar {args.limiar:.0%}):")
+        for nome, metrica, anterior, valor, variacao, regressao in comparar(resultados, linha_base, args.limiar):
+            regressoes += regressao
+            marca = "REGRESSÃO" if regressao else ""
+            print(f"  {nome:<26} {metrica:<17} {anterior:>11.3f} → {valor:>11.3f} ({variacao:+.1%}) {marca}")
+        if regressoes:
+            print(f"\n{regressoes} regressão(ões) acima do limiar.")
+            return 1
+        print("\nSem regressões acima do limiar.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
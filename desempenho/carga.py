@@ -0,0 +1,417 @@
+# desempenho/carga.py - Teste de carga da API sob perfis de gunicorn
+"""
+Sobe a API localmente com gunicorn em cada perfil pedido (modelo de worker,
+processos, threads), reproduz uma mistura realista de tráfego e compara os
+perfis: vazão, latência de cauda por endpoint e taxa de erros.
+
+Mistura padrão (pesos, ajustáveis com --mix):
+- selecao: POST /api/project-risks com critérios variados (formulário)
+- catalogo: GET /api/all-risks?shape=grouped (navegação no catálogo)
+- pdf: POST /api/generate-pdf de uma seleção já feita (download)
+
+Dois modos de geração:
+- concorrência fixa (padrão): N clientes em laço fechado, cada um envia a
+  próxima requisição assim que recebe a anterior;
+- taxa fixa (--rps): as requisições são agendadas em intervalos regulares,
+  independentemente das respostas; a latência conta a partir do instante
+  agendado, então a fila no cliente aparece nos números (sem omissão
+  coordenada).
+
+Só usa a biblioteca padrão no cliente; o servidor precisa do gunicorn (e,
+nos perfis asgi-*, do uvicorn, que serve api/asgi.py: pip install -r
+api/requirements-asgi.txt).
+
+Uso:
+    python desempenho/carga.py --perfil sync-2 --perfil gthread-2x4 --duracao 30
+    python desempenho/carga.py --perfil gthread-2x4 --rps 50 --mix selecao=70,catalogo=25,pdf=5
+    python desempenho/carga.py --perfil gthread-2x4 --preload --aquecimento 0   # perfil de produção
+    python desempenho/carga.py --url http://127.0.0.1:8000 --duracao 10   # servidor já em execução
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+DIRETORIO_API = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+sys.path.insert(0, DIRETORIO_API)
+
+from base_dados import carregar_base
+
+# Perfis de gunicorn: modelo de worker, processos e threads por processo
+PERFIS = {
+    'sync-1': {'worker_class': 'sync', 'workers': 1, 'threads': 1},
+    'sync-2': {'worker_class': 'sync', 'workers': 2, 'threads': 1},
+    'sync-4': {'worker_class': 'sync', 'workers': 4, 'threads': 1},
+    'gthread-1x8': {'worker_class': 'gthread', 'workers': 1, 'threads': 8},
+    'gthread-2x4': {'worker_class': 'gthread', 'workers': 2, 'threads': 4},
+    'gthread-4x4': {'worker_class': 'gthread', 'workers': 4, 'threads': 4},
+    # api/asgi.py sob o worker do uvicorn (precisa do uvicorn instalado)
+    'asgi-1': {'worker_class': 'asgi', 'workers': 1, 'threads': 1},
+    'asgi-2': {'worker_class': 'asgi', 'workers': 2, 'threads': 1},
+}
+MIX_PADRAO = {'selecao': 70, 'catalogo': 25, 'pdf': 5}
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def interpretar_perfil(texto):
+    """Perfil nomeado (PERFIS) ou '<classe>-<workers>[x<threads>]', ex.: gthread-3x2."""
+    if texto in PERFIS:
+        return PERFIS[texto]
+    try:
+        classe, tamanho = texto.rsplit('-', 1)
+        workers, _, threads = tamanho.partition('x')
+        return {'worker_class': classe, 'workers': int(workers), 'threads': int(threads or 1)}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"perfil inválido: {texto} (ex.: sync-2, gthread-2x4)")
+
+
+def interpretar_mix(texto):
+    mix = {}
+    for parte in texto.split(','):
+        nome, _, peso = parte.partition('=')
+        if nome.strip() not in MIX_PADRAO:
+            raise argparse.ArgumentTypeError(f"operação desconhecida no mix: {nome} (use {', '.join(MIX_PADRAO)})")
+        mix[nome.strip()] = float(peso)
+    return mix
+
+
+class Servidor:
+    """Processo gunicorn da API em um perfil, com caches em diretórios temporários próprios."""
+
+    def __init__(self, perfil, ambiente_extra=None, preload=False):
+        self.perfil = perfil
+        self.preload = preload
+        self.porta = porta_livre()
+        self.url = f"http://127.0.0.1:{self.porta}"
+        self.diretorio = tempfile.mkdtemp(prefix='riscos_carga_')
+        self.ambiente = {
+            **os.environ,
+            "RISCOS_CACHE_PDF_DIR": os.path.join(self.diretorio, 'pdf'),
+            "RISCOS_FILA_PDF_DIR": os.path.join(self.diretorio, 'fila'),
+            **(ambiente_extra or {})
+        }
+        self.processo = None
+
+    def __enter__(self):
+        asgi = self.perfil['worker_class'] == 'asgi'
+        comando = [
+            sys.executable, '-m', 'gunicorn',
+            '--chdir', DIRETORIO_API,
+            '--bind', f"127.0.0.1:{self.porta}",
+            '--worker-class', 'uvicorn.workers.UvicornWorker' if asgi else self.perfil['worker_class'],
+            '--workers', str(self.perfil['workers']),
+            '--threads', str(self.perfil['threads']),
+            '--timeout', '120',
+            '--log-level', 'warning',
+            'asgi:app' if asgi else 'index:app'
+        ]
+        if self.preload:
+            # Perfil de produção (preload, aquecimento e gc.freeze); as opções acima têm precedência
+            comando[3:3] = ['--config', os.path.join(DIRETORIO_API, 'gunicorn_conf.py')]
+        self.processo = subprocess.Popen(comando, env=self.ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        limite = time.monotonic() + 60
+        while time.monotonic() < limite:
+            if self.processo.poll() is not None:
+                raise RuntimeError(f"gunicorn terminou na partida: {self.processo.stderr.read().decode(errors='replace')}")
+            try:
+                status, _ = requisitar(self.url, 'GET', '/api/health')
+                if status == 200:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError("gunicorn não respondeu em 60s")
+
+    def memoria(self):
+        """RSS e PSS somados do mestre e dos workers, em MB (Linux; None se indisponível)."""
+        try:
+            with open(f"/proc/{self.processo.pid}/task/{self.processo.pid}/children") as f:
+                pids = [self.processo.pid] + [int(pid) for pid in f.read().split()]
+            totais = {'Rss': 0, 'Pss': 0}
+            for pid in pids:
+                with open(f"/proc/{pid}/smaps_rollup") as f:
+                    for linha in f:
+                        campo, _, valor = linha.partition(':')
+                        if campo in totais:
+                            totais[campo] += int(valor.split()[0])
+        except (OSError, ValueError):
+            return None
+        return {"processos": len(pids), "rss_mb": round(totais['Rss'] / 1024, 1), "pss_mb": round(totais['Pss'] / 1024, 1)}
+
+    def __exit__(self, *excecao):
+        if self.processo is not None and self.processo.poll() is None:
+            self.processo.terminate()
+            try:
+                self.processo.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+
+def requisitar(url, metodo, caminho, corpo=None, conexao=None):
+    """Envia uma requisição (reaproveitando a conexão, se dada) e lê a resposta inteira; retorna (status, bytes)."""
+    propria = conexao is None
+    if propria:
+        partes = urlsplit(url)
+        conexao = http.client.HTTPConnection(partes.hostname, partes.port, timeout=120)
+    try:
+        dados = json.dumps(corpo).encode() if corpo is not None else None
+        cabecalhos = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'} if dados else {'Accept-Encoding': 'gzip'}
+        conexao.request(metodo, caminho, body=dados, headers=cabecalhos)
+        resposta = conexao.getresponse()
+        return resposta.status, resposta.read()
+    finally:
+        if propria:
+            conexao.close()
+
+
+def projetos_de_exemplo(quantidade, semente):
+    """Corpos variados de /api/project-risks montados a partir da base empacotada."""
+    base, _, _ = carregar_base(os.path.join(DIRETORIO_API, 'base_riscos_cea.json'))
+    unidades = [
+        (forca, tipo_unidade)
+        for info in base.get('tipos_obra', {}).values()
+        for forca, lista in info.get('unidades', {}).items()
+        for tipo_unidade in lista
+    ]
+    intervencoes = [e.get('nome', c) for c, e in base.get('tipos_intervencao', {}).items()]
+    regimes = [e.get('nome', c) for c, e in base.get('regimes_execucao', {}).items()]
+    caracteristicas = [e.get('nome', c) for c, e in base.get('caracteristicas_especiais', {}).items()]
+    valores = [80000, 300000, 800000, 3000000, 12000000]
+    aleatorio = random.Random(semente)
+    return [
+        {
+            "forca": forca,
+            "tipoUnidade": tipo_unidade,
+            "tipoIntervencao": aleatorio.choice(intervencoes),
+            "regimeExecucao": aleatorio.choice(regimes),
+            "valor": aleatorio.choice(valores),
+            "caracteristicas": aleatorio.sample(caracteristicas, aleatorio.randint(0, min(3, len(caracteristicas))))
+        }
+        for forca, tipo_unidade in (aleatorio.choice(unidades) for _ in range(quantidade))
+    ]
+
+
+def preparar_operacoes(url, projetos, pedidos_pdf):
+    """Requisições de cada operação do mix; os PDFs usam seleções reais feitas no servidor."""
+    pdfs = []
+    for projeto in projetos[:pedidos_pdf]:
+        status, corpo = requisitar(url, 'POST', '/api/project-risks', projeto)
+        if status != 200:
+            continue
+        resposta = json.loads(corpo)
+        ids = [risco['id'] for risco in resposta.get('selected_risks', [])]
+        if ids:
+            pdfs.append({
+                "projectData": projeto, "riskIds": ids, "catalogVersion": resposta.get('catalog_version')
+            })
+    if not pdfs:
+        raise RuntimeError("nenhuma seleção disponível para os pedidos de PDF")
+    return {
+        'selecao': lambda aleatorio: ('POST', '/api/project-risks', aleatorio.choice(projetos)),
+        'catalogo': lambda aleatorio: ('GET', '/api/all-risks?shape=grouped', None),
+        'pdf': lambda aleatorio: ('POST', '/api/generate-pdf', aleatorio.choice(pdfs)),
+    }
+
+
+class Coletor:
+    """Latências e erros por operação (protegido por lock: o cliente não é o caminho medido)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.erros = {}
+
+    def registrar(self, operacao, latencia, erro):
+        with self._lock:
+            self.latencias.setdefault(operacao, []).append(latencia)
+            if erro:
+                self.erros[operacao] = self.erros.get(operacao, 0) + 1
+
+
+def executar_carga(url, operacoes, mix, duracao, concorrencia, rps, semente):
+    """Gera a carga por `duracao` segundos e retorna (coletor, segundos decorridos)."""
+    nomes = list(mix)
+    pesos = [mix[nome] for nome in nomes]
+    coletor = Coletor()
+    local = threading.local()
+    partes = urlsplit(url)
+
+    def enviar(aleatorio, agendado=None):
+        operacao = aleatorio.choices(nomes, pesos)[0]
+        metodo, caminho, corpo = operacoes[operacao](aleatorio)
+        inicio = agendado if agendado is not None else time.perf_counter()
+        erro = False
+        try:
+            conexao = getattr(local, 'conexao', None)
+            if conexao is None:
+                conexao = local.conexao = http.client.HTTPConnection(partes.hostname, partes.port, timeout=120)
+            status, _ = requisitar(url, metodo, caminho, corpo, conexao)
+            erro = status >= 400
+        except (OSError, http.client.HTTPException):
+            erro = True
+            local.conexao = None
+        coletor.registrar(operacao, time.perf_counter() - inicio, erro)
+
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    if rps:
+        # Taxa fixa: agenda pelo relógio e mede a partir do instante agendado
+        aleatorio = random.Random(semente)
+        intervalo = 1.0 / rps
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            agendado = inicio
+            while agendado < fim:
+                espera = agendado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                executor.submit(enviar, random.Random(aleatorio.random()), agendado)
+                agendado += intervalo
+    else:
+        def cliente(indice):
+            aleatorio = random.Random(semente * 1000 + indice)
+            while time.perf_counter() < fim:
+                enviar(aleatorio)
+
+        clientes = [threading.Thread(target=cliente, args=(i,), daemon=True) for i in range(concorrencia)]
+        for thread in clientes:
+            thread.start()
+        for thread in clientes:
+            thread.join()
+    return coletor, time.perf_counter() - inicio
+
+
+def percentil(ordenados, fracao):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(fracao * (len(ordenados) - 1))))]
+
+
+def resumir(coletor, decorrido):
+    """Vazão, latências (ms) e erros por operação e no total."""
+    resumo = {}
+    todas = []
+    for operacao, latencias in sorted(coletor.latencias.items()):
+        latencias.sort()
+        todas.extend(latencias)
+        resumo[operacao] = {
+            "requisicoes": len(latencias),
+            "erros": coletor.erros.get(operacao, 0),
+            "vazao_rps": round(len(latencias) / decorrido, 2),
+            "p50_ms": round(percentil(latencias, 0.50) * 1000, 2),
+            "p90_ms": round(percentil(latencias, 0.90) * 1000, 2),
+            "p99_ms": round(percentil(latencias, 0.99) * 1000, 2),
+            "max_ms": round(latencias[-1] * 1000, 2)
+        }
+    todas.sort()
+    erros = sum(coletor.erros.values())
+    resumo["total"] = {
+        "requisicoes": len(todas),
+        "erros": erros,
+        "taxa_erros": round(erros / len(todas), 4) if todas else 0.0,
+        "vazao_rps": round(len(todas) / decorrido, 2),
+        "p50_ms": round(percentil(todas, 0.50) * 1000, 2),
+        "p90_ms": round(percentil(todas, 0.90) * 1000, 2),
+        "p99_ms": round(percentil(todas, 0.99) * 1000, 2),
+        "max_ms": round(todas[-1] * 1000, 2) if todas else 0.0
+    }
+    return resumo
+
+
+def imprimir(nome, resumo):
+    print(f"\n== {nome} ==")
+    print(f"{'operação':<10} {'req':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for operacao, dados in resumo.items():
+        print(f"{operacao:<10} {dados['requisicoes']:>7} {dados['erros']:>6} {dados['vazao_rps']:>8.1f} "
+              f"{dados['p50_ms']:>9.1f} {dados['p90_ms']:>9.1f} {dados['p99_ms']:>9.1f} {dados['max_ms']:>9.1f}")
+
+
+def medir_servidor(url, args):
+    projetos = projetos_de_exemplo(args.projetos, args.semente)
+    operacoes = preparar_operacoes(url, projetos, args.pedidos_pdf)
+    if args.aquecimento:
+        executar_carga(url, operacoes, args.mix, args.aquecimento, args.concorrencia, args.rps, args.semente + 1)
+    coletor, decorrido = executar_carga(url, operacoes, args.mix, args.duracao, args.concorrencia, args.rps, args.semente)
+    return resumir(coletor, decorrido)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API de riscos sob perfis de gunicorn.")
+    parser.add_argument('--perfil', action='append', type=interpretar_perfil, default=[], metavar='PERFIL',
+                        help=f"perfil de gunicorn (pode repetir): {', '.join(PERFIS)} ou <classe>-<workers>x<threads>")
+    parser.add_argument('--url', help="usa um servidor já em execução em vez de subir o gunicorn")
+    parser.add_argument('--duracao', type=float, default=20, help="segundos de medição por perfil (padrão 20)")
+    parser.add_argument('--aquecimento', type=float, default=3, help="segundos de carga descartada antes da medição")
+    parser.add_argument('--concorrencia', type=int, default=16, help="clientes simultâneos (ou threads do agendador com --rps)")
+    parser.add_argument('--rps', type=float, default=0, help="taxa fixa de requisições por segundo (padrão: laço fechado)")
+    parser.add_argument('--mix', type=interpretar_mix, default=MIX_PADRAO, help="pesos, ex.: selecao=70,catalogo=25,pdf=5")
+    parser.add_argument('--projetos', type=int, default=200, help="projetos distintos no tráfego de seleção")
+    parser.add_argument('--pedidos-pdf', type=int, default=20, help="seleções distintas usadas nos pedidos de PDF")
+    parser.add_argument('--sem-cache-pdf', action='store_true', help="desliga o cache de PDFs em disco no servidor")
+    parser.add_argument('--preload', action='store_true',
+                        help="sobe com api/gunicorn_conf.py (preload, aquecimento no mestre e gc.freeze)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', metavar='ARQUIVO', help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+    if any(perfil['worker_class'] == 'asgi' for perfil in args.perfil) and importlib.util.find_spec('uvicorn') is None:
+        parser.error("os perfis asgi-* precisam do uvicorn: pip install -r api/requirements-asgi.txt")
+
+    resultados = {}
+    memorias = {}
+    if args.url:
+        resultados[args.url] = medir_servidor(args.url, args)
+        imprimir(args.url, resultados[args.url])
+    else:
+        perfis = args.perfil or [PERFIS['sync-2'], PERFIS['gthread-2x4']]
+        ambiente = {"RISCOS_CACHE_PDF_MB": "0"} if args.sem_cache_pdf else {}
+        for perfil in perfis:
+            nome = f"{perfil['worker_class']}-{perfil['workers']}x{perfil['threads']}" + ("-preload" if args.preload else "")
+            with Servidor(perfil, ambiente, args.preload) as servidor:
+                resultados[nome] = medir_servidor(servidor.url, args)
+                memorias[nome] = servidor.memoria()
+            imprimir(nome, resultados[nome])
+            if memorias[nome]:
+                print(f"memória: {memorias[nome]['processos']} processos, RSS {memorias[nome]['rss_mb']} MB, "
+                      f"PSS {memorias[nome]['pss_mb']} MB")
+
+    if len(resultados) > 1:
+        print(f"\n{'perfil':<24} {'req/s':>8} {'p99 ms':>9} {'erros':>7} {'PSS MB':>8}")
+        for nome, resumo in resultados.items():
+            total = resumo['total']
+            pss = (memorias.get(nome) or {}).get('pss_mb')
+            print(f"{nome:<24} {total['vazao_rps']:>8.1f} {total['p99_ms']:>9.1f} {total['taxa_erros']:>7.2%} "
+                  f"{pss if pss is not None else '-':>8}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({
+                "parametros": {
+                    "duracao": args.duracao, "concorrencia": args.concorrencia, "rps": args.rps,
+                    "mix": args.mix, "cache_pdf": not args.sem_cache_pdf, "preload": args.preload,
+                    "cpus": os.cpu_count()
+                },
+                "resultados": resultados,
+                "memoria": memorias
+            }, f, ensure_ascii=False, indent=2)
+    return 1 if any(resumo['total']['erros'] for resumo in resultados.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -161,6 +161,7 @@ const RiskMatrixApp = () => {
   const [isLoadingAllRisks, setIsLoadingAllRisks] = useState(false);
   const [error, setError] = useState(null);
   const [debugInfo, setDebugInfo] = useState(null);
+  const [catalogVersion, setCatalogVersion] = useState(null);
 
   // Componente para exibir risco expandido com mitigação e contingência
   const RiscoExpandido = ({ risco, getRiskColor, getRiskLevelText }) => {
@@ -569,6 +570,7 @@ const RiskMatrixApp = () => {
         setCurrentStep(2);
       } else {
         setSelectedRisks(data.selected_risks || []);
+        setCatalogVersion(data.catalog_version || null);
         // Inicializar todos como selecionados
         setSelectedRiskIds(new Set((data.selected_risks || []).map(risk => risk.id)));
         setCurrentStep(2);
@@ -605,10 +607,10 @@ const RiskMatrixApp = () => {
     try {
       setIsGenerating(true);
       
-      // Filtrar apenas os riscos selecionados
-      const riscosParaPDF = selectedRisks.filter(risk => selectedRiskIds.has(risk.id));
+      // Filtrar apenas os riscos selecionados; o servidor monta o PDF a partir dos IDs
+      const riskIds = selectedRisks.filter(risk => selectedRiskIds.has(risk.id)).map(risk => risk.id);
       
-      if (riscosParaPDF.length === 0) {
+      if (riskIds.length === 0) {
         setError('Nenhum risco foi selecionado para gerar o PDF.');
         return;
       }
@@ -618,7 +620,8 @@ const RiskMatrixApp = () => {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ 
           projectData, 
-          selectedRisks: riscosParaPDF, // Usar apenas os selecionados
+          riskIds, // Usar apenas os selecionados, na ordem exibida
+          catalogVersion,
           debugInfo 
         }),
       });
@@ -687,7 +690,7 @@ const RiskMatrixApp = () => {
     setError(null);
     
     try {
-      const response = await fetch(`${getApiUrl()}/api/all-risks`, {
+      const response = await fetch(`${getApiUrl()}/api/all-risks?shape=grouped`, {
         method: 'GET',
         headers: {
           'Content-Type': 'application/json',
@@ -0,0 +1,26 @@
+# tests/conftest.py - Configuração comum dos testes da API
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Caches em disco e fila de PDFs em diretórios próprios da sessão de testes,
+# definidos antes de importar a API (lidos na importação)
+_DIRETORIO_TESTES = tempfile.mkdtemp(prefix='riscos_testes_')
+os.environ.setdefault("RISCOS_CACHE_PDF_DIR", os.path.join(_DIRETORIO_TESTES, 'pdf'))
+os.environ.setdefault("RISCOS_FILA_PDF_DIR", os.path.join(_DIRETORIO_TESTES, 'fila'))
+os.environ.setdefault("RISCOS_PDF_PROCESSOS", "0")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'api')))
+
+
+@pytest.fixture(scope='session')
+def index():
+    import index as modulo
+    return modulo
+
+
+@pytest.fixture
+def cliente(index):
+    return index.app.test_client()
@@ -0,0 +1,254 @@
+# tests/test_api.py - Códigos de status e caminhos de erro dos endpoints
+import io
+import json
+import threading
+import time
+import zipfile
+
+import pytest
+
+PROJETO = {
+    "forca": "Polícia Civil",
+    "tipoUnidade": "Delegacia Cidadã Padrão I (642,29 m²)",
+    "tipoIntervencao": "Construção",
+    "regimeExecucao": "Empreitada por preço global",
+    "valor": 800000,
+    "caracteristicas": ["Demolição de estruturas"]
+}
+
+
+def linhas_ndjson(resposta):
+    return [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines() if linha]
+
+
+@pytest.fixture
+def ids_selecionados(cliente):
+    return [risco['id'] for risco in cliente.post('/api/project-risks', json=PROJETO).get_json()['selected_risks']]
+
+
+def test_health_e_metricas(cliente):
+    assert cliente.get('/api/health').get_json()['status'] == 'ok'
+    resposta = cliente.get('/api/metrics')
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'text/plain'
+    texto = resposta.get_data(as_text=True)
+    assert 'riscos_http_requisicoes_total' in texto
+    assert '# TYPE riscos_cache_consultas_total counter' in texto
+    for linha in ('riscos_cache_consultas_total{cache="resultados",resultado="acerto"}',
+                  'riscos_cache_remocoes_total{cache="pdf"}', 'riscos_cache_pdf_bytes',
+                  'riscos_fila_pdf_trabalhos_total{resultado="concluido"}'):
+        assert linha in texto
+
+
+@pytest.mark.parametrize("url", ['/api/risk-metadata', '/api/cea-insights', '/api/statistics'])
+def test_endpoints_informativos(cliente, url):
+    assert cliente.get(url).status_code == 200
+
+
+def test_project_risks(cliente, index):
+    resposta = cliente.post('/api/project-risks', json=PROJETO)
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert corpo['selected_risks']
+    assert corpo['catalog_version'] == index.versao_base()
+    assert 'debug_logic' not in corpo['selection_metadata']
+    assert 'debug_logic' in cliente.post('/api/project-risks?debug=1', json=PROJETO).get_json()['selection_metadata']
+
+
+def test_project_risks_sem_corpo(cliente):
+    assert cliente.post('/api/project-risks', json={}).status_code == 400
+
+
+def test_project_risks_batch(cliente):
+    resposta = cliente.post('/api/project-risks/batch', json=[PROJETO, {**PROJETO, "ref": "b"}, 7])
+    assert resposta.status_code == 200
+    linhas = linhas_ndjson(resposta)
+    assert [linha.get('index') for linha in linhas[:3]] == [0, 1, 2]
+    assert linhas[1]['ref'] == 'b'
+    assert linhas[0]['selected_risk_ids'] == linhas[1]['selected_risk_ids']
+    assert 'error' in linhas[2]
+    assert linhas[-1]['summary']['projetos'] == 3
+    assert linhas[-1]['summary']['erros'] == 1
+
+
+def test_project_risks_batch_campos_malformados(cliente):
+    resposta = cliente.post('/api/project-risks/batch', json=[
+        {**PROJETO, "caracteristicas": 5}, {**PROJETO, "caracteristicas": True}, PROJETO
+    ])
+    linhas = linhas_ndjson(resposta)
+    assert [linha['index'] for linha in linhas[:3]] == [0, 1, 2]
+    assert 'error' in linhas[0] and 'error' in linhas[1]
+    assert 'selected_risk_ids' in linhas[2]
+    assert linhas[-1]['summary']['erros'] == 2
+
+
+def test_project_risks_batch_ndjson(cliente):
+    corpo = json.dumps(PROJETO) + '\n{quebrado\n'
+    resposta = cliente.post('/api/project-risks/batch', data=corpo, content_type='application/x-ndjson')
+    linhas = linhas_ndjson(resposta)
+    assert 'selected_risk_ids' in linhas[0]
+    assert 'error' in linhas[1]
+    assert linhas[-1]['summary']['erros'] == 1
+
+
+def test_project_risks_batch_formato_invalido(cliente):
+    assert cliente.post('/api/project-risks/batch', json={"projetos": []}).status_code == 400
+
+
+def test_portfolio_analytics(cliente):
+    resposta = cliente.post('/api/portfolio-analytics', json={"projects": [PROJETO, PROJETO, "x"]})
+    assert resposta.status_code == 200
+    assert cliente.post('/api/portfolio-analytics', json={"x": 1}).status_code == 400
+    csv = "forca,tipoUnidade,caracteristicas\nPolícia Militar,Batalhão,Demolição de estruturas;Necessita relocação temporária\n"
+    assert cliente.post('/api/portfolio-analytics', data=csv, content_type='text/csv').status_code == 200
+
+
+def test_portfolio_analytics_campos_malformados(cliente):
+    resposta = cliente.post('/api/portfolio-analytics', json={"projects": [
+        {**PROJETO, "caracteristicas": 5}, {**PROJETO, "tipoUnidade": [1]}, {**PROJETO, "forca": ["x"]}, PROJETO
+    ]})
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert (corpo['projetos_analisados'], corpo['projetos_com_erro']) == (2, 2)
+    assert 'Não informado' in corpo['por_forca']
+    assert cliente.post('/api/portfolio-analytics', data=b'forca\n\xff\xfe', content_type='text/csv').status_code == 400
+
+
+def test_generate_pdf(cliente, ids_selecionados):
+    resposta = cliente.post('/api/generate-pdf', json={"projectData": PROJETO, "riskIds": ids_selecionados})
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'application/pdf'
+    assert resposta.get_data().startswith(b'%PDF')
+
+
+@pytest.mark.parametrize("corpo, status", [
+    ({"projectData": PROJETO}, 400),
+    ({"projectData": PROJETO, "riskIds": [1, 999999]}, 400),
+    ({"projectData": {"forca": "Polícia Civil"}, "riskIds": [1]}, 400),
+    ({"projectData": PROJETO, "riskIds": [1], "catalogVersion": "0.0"}, 409),
+    ([{"projectData": PROJETO, "riskIds": [1]}], 400),
+    ({"projectData": "Polícia Civil", "riskIds": [1]}, 400),
+    ({"projectData": {**PROJETO, "tipoUnidade": 7}, "riskIds": [1]}, 400),
+])
+def test_generate_pdf_pedidos_invalidos(cliente, corpo, status):
+    assert cliente.post('/api/generate-pdf', json=corpo).status_code == status
+    assert cliente.post('/api/pdf-jobs', json=corpo).status_code == status
+
+
+def test_generate_pdf_batch_mantem_ordem_e_versao(cliente, index):
+    resposta = cliente.post('/api/generate-pdf/batch', json={"projects": [
+        {"projectData": PROJETO, "riskIds": [5, 1, 5]},
+        {"projectData": PROJETO, "riskIds": [1], "catalogVersion": "0.0"}
+    ]})
+    with zipfile.ZipFile(io.BytesIO(resposta.get_data())) as arquivo:
+        relatorio = json.loads(arquivo.read('relatorio_lote.json'))
+    assert relatorio[0]['status'] == 'ok' and relatorio[0]['total_riscos'] == 2
+    assert relatorio[1]['status'] == 'erro' and 'atualizada' in relatorio[1]['erro']
+    riscos, _ = index.resolver_riscos_pdf([5, 1, 5])
+    assert [risco['id'] for risco in riscos] == [5, 1]
+
+
+def test_pdf_jobs(cliente, ids_selecionados):
+    resposta = cliente.post('/api/pdf-jobs', json={"projectData": PROJETO, "riskIds": ids_selecionados})
+    assert resposta.status_code == 202
+    trabalho = resposta.get_json()
+    limite = time.monotonic() + 30
+    while cliente.get(trabalho['status_url']).get_json()['estado'] not in ('concluido', 'falhou'):
+        assert time.monotonic() < limite
+        time.sleep(0.05)
+    download = cliente.get(trabalho['download_url'])
+    assert download.status_code == 200
+    assert download.get_data().startswith(b'%PDF')
+    assert cliente.get('/api/pdf-jobs/inexistente').status_code == 404
+    assert cliente.post('/api/pdf-jobs', json={"projectData": PROJETO}).status_code == 400
+    metricas = cliente.get('/api/metrics').get_data(as_text=True)
+    assert 'riscos_fila_pdf_profundidade 0' in metricas
+    assert 'riscos_fila_pdf_processando ' in metricas
+
+
+def test_generate_pdf_batch(cliente, ids_selecionados):
+    resposta = cliente.post('/api/generate-pdf/batch', json={"projects": [
+        {"projectData": PROJETO, "riskIds": ids_selecionados},
+        {"projectData": {"forca": "Polícia Militar", "tipoUnidade": "Batalhão"}},
+        {"projectData": {}}
+    ]})
+    assert resposta.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resposta.get_data())) as arquivo:
+        relatorio = json.loads(arquivo.read('relatorio_lote.json'))
+    assert [item['status'] for item in relatorio] == ['ok', 'ok', 'erro']
+    assert cliente.post('/api/generate-pdf/batch', json={}).status_code == 400
+
+
+def test_generate_pdf_batch_itens_malformados(cliente):
+    resposta = cliente.post('/api/generate-pdf/batch', json={"projects": [
+        {"projectData": PROJETO, "riskIds": [[1], 2.0, True]},
+        {"projectData": {**PROJETO, "caracteristicas": 5}},
+        {"projectData": {**PROJETO, "tipoUnidade": 7}},
+        {"projectData": PROJETO, "riskIds": [1, 2]}
+    ]})
+    assert resposta.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resposta.get_data())) as arquivo:
+        relatorio = json.loads(arquivo.read('relatorio_lote.json'))
+    assert [item['status'] for item in relatorio] == ['erro', 'erro', 'erro', 'ok']
+    assert 'riscos_pdf_tamanho_bytes_count' in cliente.get('/api/metrics').get_data(as_text=True)
+
+
+@pytest.mark.parametrize("consulta", ['', '?shape=grouped', '?shape=flat&fields=id,evento&nivel=alto'])
+def test_all_risks(cliente, consulta):
+    assert cliente.get(f'/api/all-risks{consulta}').status_code == 200
+
+
+@pytest.mark.parametrize("consulta", ['shape=tabela', 'nivel=altissimo', 'fase=Inexistente', 'categoria=x', 'fields=id,cor'])
+def test_all_risks_parametros_invalidos(cliente, consulta):
+    assert cliente.get(f'/api/all-risks?{consulta}').status_code == 400
+
+
+def test_busca(cliente):
+    corpo = cliente.get('/api/risks/search?q=chuva').get_json()
+    assert corpo['total'] == len(corpo['ids']) > 0
+    assert cliente.get('/api/risks/search').status_code == 400
+    assert cliente.get('/api/risks/search?q=chuva&limit=x').status_code == 400
+
+
+def test_indice_busca_construido_uma_vez(index, monkeypatch):
+    monkeypatch.setattr(index, 'INDICES_BUSCA', {})
+    construcoes = []
+    original = index.IndiceTextual
+
+    def contar(*args):
+        construcoes.append(1)
+        time.sleep(0.05)
+        return original(*args)
+
+    monkeypatch.setattr(index, 'IndiceTextual', contar)
+    threads = [threading.Thread(target=index.indice_busca) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(construcoes) == 1
+    assert 'indice_busca' in index.INICIALIZACAO['tempos_ms']
+
+
+def test_similares(cliente):
+    assert cliente.get('/api/risks/1/similar?k=3').status_code == 200
+    assert cliente.get('/api/risks/999999/similar').status_code == 404
+    assert cliente.get('/api/risks/1/similar?k=x').status_code == 400
+    resposta = cliente.post('/api/risks/similar', json={"ids": [1, 2, 999999], "k": 2})
+    assert resposta.status_code == 200
+    assert resposta.get_json()['nao_encontrados'] == [999999]
+    assert cliente.post('/api/risks/similar', json={"ids": []}).status_code == 400
+
+
+@pytest.mark.parametrize("corpo", [[1, 2], {"ids": [1.9]}, {"ids": ["3"]}, {"ids": [True]}, {"ids": [1], "k": 2.5}])
+def test_similares_lote_pedidos_invalidos(cliente, corpo):
+    assert cliente.post('/api/risks/similar', json=corpo).status_code == 400
+
+
+def test_matriz(cliente):
+    corpo = cliente.get('/api/risk-matrix').get_json()
+    assert sum(map(sum, corpo['contagens'])) + len(corpo['fora_da_matriz']) == corpo['total']
+    assert cliente.get('/api/risk-matrix?format=svg').mimetype == 'image/svg+xml'
+    assert cliente.get('/api/risk-matrix?format=gif').status_code == 400
+    assert cliente.get('/api/risk-matrix?tipo_obra=inexistente').status_code == 404
+    assert cliente.get('/api/risk-matrix?tipo_obra=delegacias&ids=1').status_code == 400
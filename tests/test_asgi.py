@@ -0,0 +1,88 @@
+# tests/test_asgi.py - Classificação das rotas e transmissão do corpo no modo ASGI
+import asyncio
+import json
+
+import pytest
+
+from test_api import PROJETO
+
+
+@pytest.fixture(scope='module')
+def asgi(index):
+    import asgi as modulo
+    return modulo
+
+
+@pytest.mark.parametrize("metodo, caminho, consulta, modo", [
+    ('POST', '/api/project-risks', '', 'laco'),
+    ('HEAD', '/api/risk-metadata', '', 'laco'),
+    ('OPTIONS', '/api/generate-pdf', '', 'laco'),
+    ('GET', '/api/health', '', 'bloqueante'),
+    ('HEAD', '/api/health', '', 'bloqueante'),
+    ('POST', '/api/pdf-jobs', '', 'bloqueante'),
+    ('GET', '/api/pdf-jobs/abc', '', 'bloqueante'),
+    ('HEAD', '/api/pdf-jobs/abc/download', '', 'bloqueante'),
+    ('POST', '/api/generate-pdf', '', 'pdf'),
+    ('HEAD', '/api/risk-matrix', 'format=svg', 'pdf'),
+    ('GET', '/api/risk-matrix', '', 'laco'),
+])
+def test_classificacao(asgi, metodo, caminho, consulta, modo):
+    assert asgi.classificar(metodo, caminho, consulta) == modo
+
+
+def chamar(asgi, metodo, caminho, partes, receber_parte=None, tipo=b'application/json'):
+    """Executa uma requisição na aplicação ASGI; `receber_parte(i)` pode atrasar a parte i."""
+    async def executar():
+        enviadas = []
+
+        async def receive():
+            i = len(entregues)
+            if i >= len(partes):
+                await asyncio.Event().wait()
+            if receber_parte is not None:
+                await receber_parte(i, enviadas)
+            entregues.append(i)
+            return {'type': 'http.request', 'body': partes[i], 'more_body': i < len(partes) - 1}
+
+        async def send(mensagem):
+            enviadas.append(mensagem)
+
+        entregues = []
+        escopo = {
+            'type': 'http', 'method': metodo, 'path': caminho, 'query_string': b'',
+            'headers': [(b'content-type', tipo)]
+        }
+        await asyncio.wait_for(asgi.app(escopo, receive, send), timeout=10)
+        return enviadas
+
+    return asyncio.run(executar())
+
+
+def test_lote_ndjson_transmitido_sem_ler_o_corpo_inteiro(asgi):
+    linha = json.dumps(PROJETO).encode('utf-8') + b'\n'
+    partes = [linha + linha[:10], linha[10:], linha]
+
+    async def receber_parte(i, enviadas):
+        # A última parte só chega depois que a primeira linha da resposta saiu
+        while i == 2 and not any(b'"index":0' in m.get('body', b'') for m in enviadas):
+            await asyncio.sleep(0.01)
+
+    enviadas = chamar(asgi, 'POST', '/api/project-risks/batch', partes, receber_parte, b'application/x-ndjson')
+    assert enviadas[0]['status'] == 200
+    linhas = [json.loads(l) for l in b''.join(m.get('body', b'') for m in enviadas[1:]).splitlines() if l]
+    assert [l['index'] for l in linhas[:3]] == [0, 1, 2]
+    assert linhas[-1]['summary']['erros'] == 0
+
+
+def test_corpo_lido_inteiro_nas_rotas_do_laco(asgi):
+    corpo = json.dumps(PROJETO).encode('utf-8')
+    enviadas = chamar(asgi, 'POST', '/api/project-risks', [corpo[:20], corpo[20:]])
+    assert enviadas[0]['status'] == 200
+
+
+def test_preaquecimento_monta_catalogo_fora_do_laco(asgi, index, monkeypatch):
+    monkeypatch.setattr(index, 'VARIANTES_CATALOGO', {})
+    monkeypatch.setattr(index, 'INDICES_BUSCA', {})
+    asgi.preaquecer()
+    assert {formato for _, formato in index.VARIANTES_CATALOGO} == set(index.FORMATOS_CATALOGO)
+    assert index.INDICES_BUSCA
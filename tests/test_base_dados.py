@@ -0,0 +1,52 @@
+# tests/test_base_dados.py - Carga da base: snapshot × modo estrito
+import json
+import os
+
+import pytest
+
+from base_dados import ErroBaseRiscos, carregar_base, gerar_snapshot
+
+ARQUIVO_BASE = os.path.join(os.path.dirname(__file__), '..', 'api', 'base_riscos_cea.json')
+
+
+@pytest.fixture
+def base_json():
+    with open(ARQUIVO_BASE, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def gravar(caminho, dados, sufixo=''):
+    caminho.write_text(json.dumps(dados, ensure_ascii=False) + sufixo, encoding='utf-8')
+    return str(caminho)
+
+
+def test_snapshot_validado_serve_o_modo_estrito(tmp_path, base_json):
+    caminho_json = gravar(tmp_path / 'base.json', base_json)
+    snapshot = str(tmp_path / 'base.snapshot')
+    gerar_snapshot(caminho_json, snapshot)
+    base, origem, avisos = carregar_base(caminho_json, snapshot, estrito=True)
+    assert (origem, avisos) == ('snapshot', [])
+    assert len(base['riscos']) == len(base_json['base_riscos_cea']['riscos'])
+
+
+def test_snapshot_tolerante_com_inconsistencias_falha_no_estrito(tmp_path, base_json):
+    base_json['base_riscos_cea']['tipos_intervencao']['construcao']['riscos_especificos'].append(999999)
+    caminho_json = gravar(tmp_path / 'base.json', base_json)
+    snapshot = str(tmp_path / 'base.snapshot')
+    _, _, erros = gerar_snapshot(caminho_json, snapshot, estrito=False)
+    assert erros
+    with pytest.raises(ErroBaseRiscos):
+        carregar_base(caminho_json, snapshot, estrito=True)
+    _, origem, avisos = carregar_base(caminho_json, snapshot, estrito=False)
+    assert origem == 'snapshot' and avisos
+
+
+def test_snapshot_tolerante_com_json_corrigido_falha_no_estrito(tmp_path, base_json):
+    texto = json.dumps(base_json, ensure_ascii=False)
+    caminho_json = tmp_path / 'base.json'
+    caminho_json.write_text(texto[:-1] + ',}', encoding='utf-8')
+    snapshot = str(tmp_path / 'base.snapshot')
+    _, correcoes, _ = gerar_snapshot(str(caminho_json), snapshot, estrito=False)
+    assert correcoes
+    with pytest.raises(ErroBaseRiscos):
+        carregar_base(str(caminho_json), snapshot, estrito=True)
@@ -0,0 +1,36 @@
+# tests/test_cache_pdf.py - Totais e remoção LRU do cache de PDFs em disco
+import io
+import os
+
+from cache_pdf import CachePDF
+
+
+def test_totais_e_remocao_do_menos_usado(tmp_path):
+    cache = CachePDF(str(tmp_path), 250)
+    for chave in ('a', 'b'):
+        cache.guardar(chave, b'x' * 100)
+    cache.abrir('a').close()
+    cache.guardar('c', io.BytesIO(b'x' * 100))
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['arquivos'], estatisticas['bytes'], estatisticas['remocoes']) == (2, 200, 1)
+    assert sorted(os.listdir(tmp_path)) == ['a.pdf', 'c.pdf']
+
+
+def test_regravacao_nao_duplica_bytes(tmp_path):
+    cache = CachePDF(str(tmp_path), 1000)
+    cache.guardar('a', b'x' * 100)
+    cache.guardar('a', b'x' * 40)
+    assert cache.estatisticas()['bytes'] == 40
+
+
+def test_varredura_inicial_e_arquivos_de_outros_processos(tmp_path):
+    CachePDF(str(tmp_path), 1000).guardar('a', b'x' * 100)
+    cache = CachePDF(str(tmp_path), 1000)
+    assert cache.estatisticas()['bytes'] == 100
+    # Gravado por outra instância depois da varredura: contabilizado no primeiro acerto
+    CachePDF(str(tmp_path), 1000).guardar('b', b'x' * 50)
+    cache.abrir('b').close()
+    assert cache.estatisticas()['bytes'] == 150
+    os.unlink(tmp_path / 'a.pdf')
+    assert cache.abrir('a') is None
+    assert cache.estatisticas()['arquivos'] == 1
@@ -0,0 +1,62 @@
+# tests/test_regras_base.py - Seleções de referência com as tabelas de regras de base_riscos_cea.json
+import json
+import os
+
+import pytest
+
+ARQUIVO_BASE = os.path.join(os.path.dirname(__file__), '..', 'api', 'base_riscos_cea.json')
+
+# IDs na ordem de apresentação; qualquer alteração nas tabelas do JSON que mude
+# uma destas seleções precisa ser revista (e a lista atualizada) conscientemente
+SELECOES_FIXADAS = [
+    (
+        {"forca": "Polícia Civil", "tipoUnidade": "Delegacia Cidadã Padrão I (642,29 m²)"},
+        [34, 50, 1, 43, 2, 11, 36, 37, 71, 84, 59, 75, 86, 65, 70, 72, 73, 74],
+    ),
+    (
+        {"forca": "Polícia Civil", "tipoUnidade": "Delegacia Cidadã Padrão III (1.791,23 m²)",
+         "tipoIntervencao": "Construção", "regimeExecucao": "Contratação integrada", "valor": 15000000},
+        [13, 29, 34, 50, 1, 15, 16, 80, 43, 56, 2, 4, 11, 22, 36, 37, 71, 84, 5, 7, 9, 79, 23, 25, 59, 62,
+         75, 82, 86, 88, 76, 77, 46, 65, 70, 72, 73, 74, 78],
+    ),
+    (
+        {"forca": "Polícia Militar", "tipoUnidade": "Batalhão", "tipoIntervencao": "Reparos",
+         "regimeExecucao": "Contratação por tarefa", "valor": 150000},
+        [50, 43, 56, 2, 36, 37, 44, 84, 18, 23, 31, 57, 60, 85, 77, 65, 72],
+    ),
+    (
+        {"forca": "Polícia Penal", "tipoUnidade": "Penitenciária", "tipoIntervencao": "Reforma",
+         "regimeExecucao": "Empreitada integral",
+         "caracteristicas": ["Área de segurança máxima", "Contratos com supervisão técnica especializada"]},
+        [13, 29, 30, 34, 51, 33, 35, 1, 32, 41, 45, 56, 4, 37, 44, 58, 71, 84, 7, 9, 10, 12, 79, 23, 49, 54,
+         59, 75, 82, 86, 87, 88, 46, 70, 72, 73, 78, 68],
+    ),
+    (
+        {"forca": "Corpo de Bombeiros Militar", "tipoUnidade": "Companhia", "tipoIntervencao": "Reparos",
+         "regimeExecucao": "Empreitada por preço unitário", "valor": 2000000,
+         "caracteristicas": ["Obra em unidade em funcionamento"]},
+        [50, 51, 80, 40, 41, 43, 53, 56, 2, 22, 36, 37, 44, 71, 84, 5, 17, 18, 31, 57, 59, 60, 62, 82, 64,
+         65, 72, 73, 74, 68],
+    ),
+    (
+        {"forca": "Polícia Científica", "tipoUnidade": "UETC Intermediária", "tipoIntervencao": "Construção",
+         "regimeExecucao": "Contratação semi-integrada", "valor": 600000,
+         "caracteristicas": ["Necessita licenciamento ambiental", "Demolição de estruturas"]},
+        [29, 34, 51, 1, 14, 45, 2, 4, 11, 36, 37, 39, 58, 84, 7, 8, 18, 23, 49, 52, 57, 63, 75, 82, 88, 77,
+         61, 65, 72, 73, 74, 28, 66],
+    ),
+]
+
+
+def test_json_da_base_e_valido():
+    """O arquivo precisa passar pelo parser estrito (sem vírgulas finais, comentários etc.)."""
+    with open(ARQUIVO_BASE, encoding='utf-8') as arquivo:
+        base = json.load(arquivo)['base_riscos_cea']
+    for tabela in ('tipos_intervencao', 'regimes_execucao', 'caracteristicas_especiais', 'faixas_valor'):
+        assert base[tabela]
+
+
+@pytest.mark.parametrize("projeto, esperado", SELECOES_FIXADAS)
+def test_selecoes_fixadas(index, projeto, esperado):
+    resultado = index.processar_criterios_cea(projeto)
+    assert [risco['id'] for risco in resultado["selected_risks"]] == esperado
@@ -0,0 +1,219 @@
+# tests/test_selecao.py - Seleção de riscos: motor de máscaras de bits × cadeia de regras original
+import copy
+from itertools import combinations, product
+
+import pytest
+
+# Tabelas que a cadeia de regras original tinha em literais Python
+INTERVENCOES_ORIGINAIS = {
+    'Construção': ([1, 9, 21, 22, 54, 55, 58], []),
+    'Reforma': ([25, 29, 38, 44, 59, 68, 77], []),
+    'Reparos': ([11, 28, 32, 60], [1, 4, 9, 51]),
+}
+REGIMES_ORIGINAIS = {
+    'Empreitada por preço global': ([3, 5, 8, 53, 67], []),
+    'Empreitada por preço unitário': ([20, 40, 64, 72], []),
+    'Contratação integrada': ([1, 2, 23, 37, 51, 52], []),
+    'Contratação semi-integrada': ([1, 23, 37, 51], []),
+    'Empreitada integral': ([1, 9, 28, 42, 51, 76], []),
+    'Contratação por tarefa': ([], [1, 4, 9, 51, 52]),
+}
+CARACTERISTICAS_ORIGINAIS = {
+    'Obra em unidade em funcionamento': [25, 38, 59, 68],
+    'Necessita licenciamento ambiental': [9, 36, 55, 69],
+    'Área de segurança máxima': [10, 12, 13, 15, 58, 70, 71],
+    'Integração com sistemas existentes': [14, 29, 34, 44, 65, 77],
+    'Demolição de estruturas': [19, 36, 66, 75],
+    'Obra em área urbana densamente povoada': [36, 47],
+    'Necessita relocação temporária': [25, 38, 47],
+}
+
+
+def ajustar_por_tamanho_original(ids, tamanho_info):
+    adicionar, remover = set(), set()
+    categoria = tamanho_info.get('categoria', 'medio')
+    if categoria == 'pequeno':
+        remover.update([1, 4, 23, 37, 46, 56, 73])
+    elif categoria == 'medio':
+        adicionar.update([37])
+    elif categoria == 'grande':
+        adicionar.update([1, 23, 37, 56])
+    elif categoria == 'muito_grande':
+        adicionar.update([1, 4, 9, 23, 37, 46, 56, 73, 78, 79])
+    complexidade = tamanho_info.get('complexidade', 'media')
+    if complexidade == 'muito_alta':
+        adicionar.update([1, 9, 23, 37, 46])
+    elif complexidade == 'alta':
+        adicionar.update([23, 37])
+    elif complexidade == 'baixa':
+        remover.update([1, 4, 9, 23])
+    if tamanho_info.get('investimento', 0) > 10000000:
+        adicionar.update([56, 70, 73])
+    if tamanho_info.get('pavimentos', 1) > 1:
+        adicionar.update([62, 77])
+    ids.update(adicionar)
+    ids.difference_update(remover)
+
+
+def ajustar_por_especialidade_original(ids, tipo_unidade, tamanho_info):
+    tipo_unidade = tipo_unidade or ''
+    if tipo_unidade == 'Penitenciária':
+        ids.update([10, 12, 13, 15, 30, 49, 70, 71])
+    elif tipo_unidade == 'Casa de Custódia':
+        ids.update([10, 12, 25, 38])
+    elif 'Padrão IA' in tipo_unidade:
+        ids.difference_update([1, 4, 23, 37, 46])
+    elif 'Padrão I (' in tipo_unidade:
+        # Única divergência intencional: o original testava 'Padrão I' in tipo_unidade,
+        # o que também capturava Padrão II/III e pulava os ramos abaixo
+        pass
+    elif 'Padrão II' in tipo_unidade:
+        ids.update([23, 37, 62, 77])
+    elif 'Padrão III' in tipo_unidade:
+        ids.update([1, 4, 23, 37, 46, 62, 77])
+    elif tipo_unidade == 'Comando Regional':
+        ids.difference_update([1, 4, 9, 23])
+    elif tipo_unidade == 'UETC Intermediária':
+        ids.update([2, 14, 18, 63])
+    elif tipo_unidade == 'UETC Básica':
+        ids.difference_update([1, 4])
+    elif tipo_unidade == 'Posto Avançado':
+        ids.difference_update([1, 4, 9, 23])
+    seguranca = tamanho_info.get('complexidade_seguranca')
+    if seguranca == 'maxima':
+        ids.update([10, 12, 13, 15, 30, 49, 70, 71])
+    elif seguranca == 'alta':
+        ids.update([10, 12, 25, 38])
+    if tamanho_info.get('complexidade_tecnica') == 'media':
+        ids.update([2, 14, 18])
+
+
+def selecao_original(index, forca, tipo_unidade, tipo_intervencao, regime_execucao, caracteristicas,
+                     adicionais=(), excluidos=()):
+    """Cadeia de regras procedural anterior ao motor compilado (IDs na ordem de apresentação)."""
+    database = index.RISK_DATABASE
+    tamanho_info = index.obter_tamanho_info(tipo_unidade)
+    ids = set()
+    tipo_obra = index.mapear_tipo_obra(forca, tipo_unidade)
+    if tipo_obra in database['tipos_obra']:
+        ids.update(database['tipos_obra'][tipo_obra]['riscos_especificos'])
+    ajustar_por_tamanho_original(ids, tamanho_info)
+    ajustar_por_especialidade_original(ids, tipo_unidade, tamanho_info)
+    for tabela, chave in ((INTERVENCOES_ORIGINAIS, tipo_intervencao), (REGIMES_ORIGINAIS, regime_execucao)):
+        if chave in tabela:
+            incluir, remover = tabela[chave]
+            ids.update(incluir)
+            ids.difference_update(remover)
+    for caracteristica in caracteristicas:
+        ids.update(CARACTERISTICAS_ORIGINAIS.get(caracteristica, []))
+    ids.update(adicionais)
+    ids.difference_update(excluidos)
+    riscos = [risco for risco in database['riscos'] if risco.get('id') in ids]
+    riscos.sort(key=index.ordenar_riscos)
+    return [risco['id'] for risco in riscos]
+
+
+def tabela_json(tabela):
+    return {
+        f"t{posicao}": {"nome": nome, "riscos_especificos": incluir, "riscos_reduzidos": remover}
+        for posicao, (nome, (incluir, remover)) in enumerate(tabela.items())
+    }
+
+
+@pytest.fixture
+def regras_originais(index, monkeypatch):
+    """Motor compilado a partir das tabelas originais (sem faixas de valor, que o original ignorava)."""
+    database = copy.deepcopy(index.RISK_DATABASE)
+    database['tipos_intervencao'] = tabela_json(INTERVENCOES_ORIGINAIS)
+    database['regimes_execucao'] = tabela_json(REGIMES_ORIGINAIS)
+    database['caracteristicas_especiais'] = tabela_json(
+        {nome: (ids, []) for nome, ids in CARACTERISTICAS_ORIGINAIS.items()}
+    )
+    database['faixas_valor'] = {}
+    regras = index.compilar_regras(database)
+    monkeypatch.setattr(index, 'REGRAS_COMPILADAS', regras)
+    return regras
+
+
+def test_motor_equivale_a_cadeia_original(index, regras_originais):
+    """Todo o espaço: unidades × intervenções × regimes × até duas características (15.428 combinações)."""
+    unidades = list(regras_originais['tipo_obra_por_unidade'])
+    intervencoes = [None, *INTERVENCOES_ORIGINAIS]
+    regimes = [None, *REGIMES_ORIGINAIS]
+    subconjuntos = [c for n in range(3) for c in combinations(sorted(CARACTERISTICAS_ORIGINAIS), n)]
+    motor = regras_originais['motor']
+    divergencias = []
+    total = 0
+    for (forca, tipo_unidade), intervencao, regime, caracteristicas in product(unidades, intervencoes, regimes, subconjuntos):
+        total += 1
+        criterios = (forca, tipo_unidade, intervencao, regime, None, caracteristicas, (), ())
+        obtido = motor.ids(index.calcular_selecao(criterios)["selected_mask"])
+        esperado = selecao_original(index, forca, tipo_unidade, intervencao, regime, caracteristicas)
+        if obtido != esperado:
+            divergencias.append(criterios)
+    assert total == 15428
+    assert divergencias == []
+
+
+@pytest.mark.parametrize("adicionais, excluidos", [
+    ((5, 88), ()),
+    ((), (1, 37, 72)),
+    ((10, 23), (23, 50)),
+])
+def test_motor_equivale_com_riscos_adicionais_e_excluidos(index, regras_originais, adicionais, excluidos):
+    for (forca, tipo_unidade), intervencao in product(regras_originais['tipo_obra_por_unidade'], INTERVENCOES_ORIGINAIS):
+        criterios = (forca, tipo_unidade, intervencao, 'Contratação integrada', None,
+                     ('Demolição de estruturas',), tuple(sorted(adicionais)), tuple(sorted(excluidos)))
+        obtido = regras_originais['motor'].ids(index.calcular_selecao(criterios)["selected_mask"])
+        assert obtido == selecao_original(
+            index, forca, tipo_unidade, intervencao, 'Contratação integrada', ('Demolição de estruturas',),
+            adicionais, excluidos
+        )
+
+
+def test_padrao_ii_e_iii_recebem_ajustes_proprios(index):
+    """'Padrão I' não captura mais Padrão II/III (despacho por chave exata)."""
+    regras = index.REGRAS_COMPILADAS
+    motor = regras['motor']
+    padrao_i = motor.ids(regras['unidades']['Delegacia Cidadã Padrão I (642,29 m²)'].aplicar(0))
+    padrao_iii = motor.ids(regras['unidades']['Delegacia Cidadã Padrão III (1.791,23 m²)'].aplicar(0))
+    assert padrao_i != padrao_iii
+    assert {62, 77} <= set(padrao_iii)
+
+
+def test_ordem_de_apresentacao(index):
+    resultado = index.processar_criterios_cea({"forca": "Polícia Civil", "tipoUnidade": "Delegacia Cidadã Padrão I (642,29 m²)"})
+    chaves = [index.ordenar_riscos(risco) for risco in resultado["selected_risks"]]
+    assert chaves == sorted(chaves)
+    assert [index.fragmento_risco(r) for r in resultado["selected_risks"]] == resultado["selected_risks_fragments"]
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (800000, 800000.0),
+    (1.5e6, 1500000.0),
+    ("1500000", 1500000.0),
+    ("1.500.000", 1500000.0),
+    ("R$ 1.500.000", 1500000.0),
+    ("1.500.000,00", 1500000.0),
+    ("R$ 2.750,50", 2750.5),
+    ("ate-50k", 50000.0),
+    ("500k-1.5m", 1500000.0),
+    ("acima-5m", 5000000.01),
+    (-5, None),
+    ("-5", None),
+    ("R$ -1.000", None),
+    (float('nan'), None),
+    (float('inf'), None),
+    ("nan", None),
+    ("1e400", None),
+    ("abc", None),
+    ("", None),
+    (True, None),
+    (None, None),
+])
+def test_interpretar_valor(index, valor, esperado):
+    assert index.interpretar_valor(valor) == esperado
+
+
+def test_valor_com_milhares_recebe_faixa(index):
+    assert index.resolver_faixa_valor("R$ 1.500.000") == index.resolver_faixa_valor(1500000) is not None